@@ -1,10 +1,13 @@
 import streamlit as st
-import cv2
-import numpy as np
-from tensorflow.keras.models import load_model
 
-from music_mapper import get_music_recommendation
-from youtube_player import play_on_youtube
+from emotion_client import EMOTION_SERVICE_URL, EmotionClient
+from emotion_predictor import LABELS, MODEL_PATH
+from feedback_store import FEEDBACK_DIR, FeedbackStore
+from metrics import METRICS_FILE, METRICS_PORT, Metrics, start_exporters
+from model_loader import ModelLoader
+from online_finetune import FineTuner, current_model_path, fine_tunable
+from result_cache import ResultCache, analyze_image, image_key
+from youtube_player import play_async
 
 
 # =========================
@@ -94,18 +97,51 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =========================
-# LOAD MODEL (DO NOT TOUCH)
+# LOAD MODEL
 # =========================
+@st.cache_resource
+def load_metrics():
+    # One registry + exporter per Streamlit process (METRICS_PORT / METRICS_FILE)
+    metrics = Metrics()
+    start_exporters(metrics, port=METRICS_PORT, path=METRICS_FILE)
+    return metrics
+
 @st.cache_resource
 def load_emotion_model():
-    return load_model("emotion_music_model.h5")
+    # Share one micro-batching model server (emotion_service.py) when configured
+    if EMOTION_SERVICE_URL:
+        return ModelLoader.loaded(EmotionClient(EMOTION_SERVICE_URL))
+    # TensorFlow import, model load and warm-up run in the background
+    # so the page renders immediately
+    # (the last accepted fine-tuned model when feedback is enabled)
+    return ModelLoader(current_model_path(MODEL_PATH), metrics=load_metrics()).start()
 
-model = load_emotion_model()
-labels = ['Angry', 'Happy', 'Neutral', 'Sad']
+@st.cache_resource
+def load_result_cache():
+    # Reruns (button clicks) reuse the analysis of an unchanged snapshot
+    return ResultCache(max_entries=64, ttl=600)
 
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-)
+@st.cache_resource
+def load_fine_tuner(_loader, _cache):
+    # Opt-in (EMOTION_FEEDBACK_DIR): confirmed captures fine-tune a copy of
+    # the model in the background; improved models are hot-swapped in
+    if not FEEDBACK_DIR or EMOTION_SERVICE_URL or not fine_tunable(MODEL_PATH):
+        return None
+
+    def on_improved(path):
+        _loader.swap(path)
+        _cache.clear()
+
+    return FineTuner(FeedbackStore(FEEDBACK_DIR), current_model_path(MODEL_PATH),
+                     on_improved=on_improved).start()
+
+metrics = load_metrics()
+model_loader = load_emotion_model()
+result_cache = load_result_cache()
+fine_tuner = load_fine_tuner(model_loader, result_cache)
+if FEEDBACK_DIR and not EMOTION_SERVICE_URL and not fine_tunable(MODEL_PATH):
+    st.warning(f"⚠️ Feedback is disabled: fine-tuning needs a Keras model (.h5 / .keras), "
+               f"but EMOTION_MODEL is {MODEL_PATH}")
 
 # =========================
 # SESSION STATE
@@ -127,6 +163,18 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+status_polling = not model_loader.ready
+
+@st.fragment(run_every=1.0 if status_polling else None)
+def model_status():
+    # Polls while the model loads; run_every is fixed for this script run,
+    # so a full rerun once the model is ready stops the polling
+    st.caption(model_loader.status())
+    if status_polling and model_loader.ready:
+        st.rerun()
+
+model_status()
+
 
 # =========================
 # PAGE 1 — CAPTURE
@@ -171,14 +219,15 @@ elif st.session_state.page == "result":
 
     img_file = st.session_state.image
 
-    bytes_data = img_file.getvalue()
-    np_img = np.frombuffer(bytes_data, np.uint8)
-    frame = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+    if not model_loader.ready:
+        with st.spinner("Loading emotion model..."):
+            model_loader.wait()
+    predictor = model_loader.get()
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    with st.spinner("Analyzing facial expression..."):
+        analysis = analyze_image(predictor, img_file.getvalue(), result_cache, metrics)
 
-    if len(faces) == 0:
+    if analysis.emotion is None:
         st.error("❌ No face detected. Please try again.")
 
         if st.button("🔁 Go Back"):
@@ -186,16 +235,7 @@ elif st.session_state.page == "result":
             st.rerun()
 
     else:
-        with st.spinner("Analyzing facial expression..."):
-            (x, y, w, h) = faces[0]
-            roi = gray[y:y+h, x:x+w]
-            roi = cv2.resize(roi, (48, 48))
-            roi = roi.astype("float32") / 255.0
-            roi = np.expand_dims(roi, axis=(0, -1))
-
-            preds = model.predict(roi, verbose=0)
-            emotion = labels[np.argmax(preds)]
-            confidence = float(np.max(preds))
+        emotion, confidence = analysis.emotion, analysis.confidence
 
         emoji = {
             "Angry": "😠",
@@ -214,7 +254,7 @@ elif st.session_state.page == "result":
 
         st.progress(confidence)
 
-        rec = get_music_recommendation(emotion)
+        rec = analysis.recommendation
 
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("### 🎶 Music Recommendation")
@@ -225,7 +265,23 @@ elif st.session_state.page == "result":
             st.markdown(f"<span class='genre-chip'>{k}</span>", unsafe_allow_html=True)
 
         if st.button("▶️ Play on YouTube"):
-            play_on_youtube(rec["keywords"][0])
+            # Launched in the background; repeat clicks are debounced
+            if not play_async(rec["keywords"][0]):
+                st.info("🎵 Already playing this recommendation")
+
+        if fine_tuner is not None:
+            with st.expander("📝 Was this right? Help improve the model"):
+                actual = st.radio("Your actual emotion", LABELS, index=LABELS.index(emotion), horizontal=True)
+                if st.button("✅ Confirm & Save"):
+                    key = image_key(img_file.getvalue())
+                    # One sample per snapshot, however often the button is clicked
+                    if st.session_state.get("feedback_saved") == key:
+                        st.info("Already saved for this capture")
+                    else:
+                        fine_tuner.store.append_image(img_file.getvalue(), analysis.boxes[0], actual)
+                        fine_tuner.notify()
+                        st.session_state.feedback_saved = key
+                        st.success(f"🙏 Thanks! {fine_tuner.status()}")
 
         if st.button("🔁 Try Another Expression"):
             st.session_state.page = "capture"
@@ -0,0 +1,266 @@
+# batch_score.py
+#
+# Headless, multi-process scoring of image archives. Walks a directory
+# tree, shards the files across a process pool and runs the same face
+# detection + CNN classification as app.py, with one batched inference
+# call per shard. Rows stream to CSV (or Parquet) as shards complete:
+#
+#   file, x, y, w, h, angry, happy, neutral, sad, top_emotion, confidence
+#
+# Files without a face get one row with empty box/probabilities, so that
+# re-running with the same output resumes where an interrupted run stopped.
+# CSV rows are flushed per shard. Parquet rows are buffered and written as
+# a new part file every --parquet-rows rows or --parquet-flush-s seconds,
+# whichever comes first. Smaller / more frequent parts lose less work on a
+# kill but leave more, smaller files to read back.
+#
+#   python batch_score.py Dataset --out scores.csv --workers 8 --fallback-full-image
+
+import argparse
+import csv
+import glob
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from dataset_pack import IMAGE_EXTENSIONS
+from emotion_predictor import LABELS, MODEL_PATH
+from face_detectors import FACE_DETECTOR
+
+COLUMNS = ["file", "x", "y", "w", "h"] + [l.lower() for l in LABELS] + ["top_emotion", "confidence"]
+
+# Per-process state, created once by _init_worker
+_predictor = None
+_root = None
+_fallback_full_image = False
+
+
+def list_images(root):
+    """
+    Returns sorted image paths under root, relative to root, with "/" separators
+    """
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for fname in filenames:
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                rel = os.path.relpath(os.path.join(dirpath, fname), root)
+                files.append(rel.replace(os.sep, "/"))
+    return sorted(files)
+
+
+def _init_worker(model_path, detector, root, threads, fallback_full_image):
+    global _predictor, _root, _fallback_full_image
+    import cv2
+
+    from emotion_predictor import EmotionPredictor
+
+    # One process per core scales better than many threads per process
+    cv2.setNumThreads(threads)
+    _predictor = EmotionPredictor(model_path, detector=detector, num_threads=threads)
+    _root = root
+    _fallback_full_image = fallback_full_image
+
+
+def _score_shard(files):
+    """
+    Detects faces in every file of a shard, classifies all faces with a
+    single batched call and returns the output rows
+    """
+    import cv2
+
+    from emotion_predictor import preprocess_faces, top_emotion
+
+    batches, owners, rows = [], [], []
+    for rel in files:
+        gray = cv2.imread(os.path.join(_root, rel), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            rows.append([rel] + [""] * (len(COLUMNS) - 1))
+            continue
+
+        boxes = _predictor.detect_faces(gray)
+        if len(boxes) == 0 and _fallback_full_image:
+            boxes = np.array([[0, 0, gray.shape[1], gray.shape[0]]], dtype=np.int32)
+        if len(boxes) == 0:
+            rows.append([rel] + [""] * (len(COLUMNS) - 1))
+            continue
+
+        batches.append(preprocess_faces(gray, boxes))
+        owners.extend((rel, box) for box in boxes)
+
+    if batches:
+        probs = _predictor.predict_batch(np.concatenate(batches))
+        for (rel, box), p in zip(owners, probs):
+            emotion, confidence = top_emotion(p)
+            rows.append([rel] + [int(v) for v in box] + [round(float(v), 6) for v in p]
+                        + [emotion, round(confidence, 6)])
+
+    return len(files), rows
+
+
+# ==========================
+# OUTPUT WRITERS
+# ==========================
+
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        resuming = os.path.exists(path) and os.path.getsize(path) > 0
+        if resuming:
+            _truncate_partial_line(path)
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if not resuming:
+            self._writer.writerow(COLUMNS)
+
+    @staticmethod
+    def done_files(path):
+        if not os.path.exists(path):
+            return set()
+        _truncate_partial_line(path)
+        with open(path, newline="", encoding="utf-8") as f:
+            return {row["file"] for row in csv.DictReader(f)}
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _truncate_partial_line(path):
+    """
+    Drops a half-written last line left behind by an interrupted run
+    """
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+class ParquetWriter:
+    """
+    Writes a directory of part files (one per flush) so completed work
+    survives an interruption. A part is written once rows_per_part rows
+    are buffered or flush_interval seconds have passed since the last one
+    """
+
+    def __init__(self, path, rows_per_part=2000, flush_interval=10.0):
+        import pyarrow  # noqa: F401  (fail early if missing)
+
+        self.path = path
+        self.rows_per_part = rows_per_part
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.perf_counter()
+        os.makedirs(path, exist_ok=True)
+        self._part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+
+    @staticmethod
+    def done_files(path):
+        import pyarrow.parquet as pq
+
+        done = set()
+        for part in glob.glob(os.path.join(path, "part-*.parquet")):
+            done.update(pq.read_table(part, columns=["file"]).column("file").to_pylist())
+        return done
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.rows_per_part \
+                or time.perf_counter() - self._last_flush >= self.flush_interval:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.perf_counter()
+        if not self._buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = list(zip(*self._buffer))
+        table = pa.table({
+            name: [None if v == "" else v for v in values]
+            for name, values in zip(COLUMNS, columns)
+        })
+        part_path = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        # A kill mid-write must not leave a truncated part for done_files()
+        pq.write_table(table, part_path + ".tmp")
+        os.replace(part_path + ".tmp", part_path)
+        self._part += 1
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a directory tree of images offline")
+    parser.add_argument("input_dir")
+    parser.add_argument("--out", default="scores.csv",
+                        help="Output .csv file or .parquet directory")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--detector", default=FACE_DETECTOR,
+                        help="Face detector backend (default: FACE_DETECTOR)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--shard-size", type=int, default=128, help="Files per task / inference batch")
+    parser.add_argument("--fallback-full-image", action="store_true",
+                        help="Classify the whole image when no face is detected (pre-cropped faces)")
+    parser.add_argument("--parquet-rows", type=int, default=2000,
+                        help="Rows per Parquet part file (at most this many are lost on a kill)")
+    parser.add_argument("--parquet-flush-s", type=float, default=10.0,
+                        help="Also write a Parquet part at least this often (seconds)")
+    args = parser.parse_args()
+
+    writer_cls = ParquetWriter if args.out.endswith(".parquet") else CsvWriter
+
+    files = list_images(args.input_dir)
+    done = writer_cls.done_files(args.out)
+    todo = [f for f in files if f not in done]
+    print(f"🗂️ {len(files)} images found, {len(files) - len(todo)} already scored, {len(todo)} to go")
+    if not todo:
+        return
+
+    shards = [todo[i:i + args.shard_size] for i in range(0, len(todo), args.shard_size)]
+    if writer_cls is ParquetWriter:
+        writer = ParquetWriter(args.out, args.parquet_rows, args.parquet_flush_s)
+    else:
+        writer = CsvWriter(args.out)
+
+    pool_start = last_report = time.perf_counter()
+    start = None
+    scored = baseline = 0
+    ctx = mp.get_context("spawn")
+    try:
+        with ctx.Pool(
+            args.workers,
+            initializer=_init_worker,
+            initargs=(args.model, args.detector, os.path.abspath(args.input_dir),
+                      args.threads_per_worker, args.fallback_full_image)
+        ) as pool:
+            # Steady-state throughput is measured from the first finished
+            # shard, so worker start-up and model loading are excluded
+            for n, rows in pool.imap_unordered(_score_shard, shards):
+                writer.write(rows)
+                scored += n
+                now = time.perf_counter()
+                if start is None:
+                    start, baseline = now, scored
+                elif now - last_report >= 5.0:
+                    rate = (scored - baseline) / (now - start)
+                    print(f"⚡ {scored}/{len(todo)} images, {rate:.0f} images/sec")
+                    last_report = now
+    finally:
+        writer.close()
+
+    end = time.perf_counter()
+    rate = (scored - baseline) / (end - start) if start is not None and end > start else 0.0
+    print(f"✅ Scored {scored} images in {end - pool_start:.1f}s "
+          f"({rate:.0f} images/sec steady state with {args.workers} workers) → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
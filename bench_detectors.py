@@ -0,0 +1,151 @@
+# bench_detectors.py
+#
+# Compares the face-detector backends in face_detectors.py on frames
+# synthesized from Dataset/test: a few upscaled test faces pasted at
+# random positions onto a textured background, with known boxes.
+# Reports frames/sec, detections/sec, CPU time per frame, recall and
+# false positives per frame.
+#
+#   python bench_detectors.py --frames 200 --size 1280x720
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from dataset_pack import list_split_files
+from face_detectors import DETECTORS, make_detector
+
+
+def box_iou(a, b):
+    """
+    IoU between one box and an (N, 4) array of boxes, all (x, y, w, h)
+    """
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[0], b[:, 0])
+    y1 = np.maximum(a[1], b[:, 1])
+    x2 = np.minimum(a[0] + a[2], b[:, 0] + b[:, 2])
+    y2 = np.minimum(a[1] + a[3], b[:, 1] + b[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = a[2] * a[3] + b[:, 2] * b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def synthesize_frames(dataset_dir, count, size=(1280, 720), faces_per_frame=(1, 3),
+                      face_px=(96, 240), seed=0):
+    """
+    Returns a list of (bgr_frame, ground_truth_boxes) pairs
+    """
+    test_dir = os.path.join(dataset_dir, "test")
+    _, entries = list_split_files(test_dir)
+    rng = np.random.default_rng(seed)
+    width, height = size
+
+    frames = []
+    for _ in range(count):
+        # Smooth random background so detectors see some texture
+        noise = rng.integers(0, 256, (height // 16 + 1, width // 16 + 1), dtype=np.uint8)
+        canvas = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+        boxes = []
+        for _ in range(rng.integers(faces_per_frame[0], faces_per_frame[1] + 1)):
+            side = int(rng.integers(face_px[0], face_px[1] + 1))
+            for _attempt in range(20):
+                x = int(rng.integers(0, width - side))
+                y = int(rng.integers(0, height - side))
+                if not boxes or box_iou(np.array([x, y, side, side]), boxes).max() == 0:
+                    break
+            else:
+                continue
+            face = cv2.imread(os.path.join(test_dir, entries[rng.integers(len(entries))][0]),
+                              cv2.IMREAD_GRAYSCALE)
+            canvas[y:y + side, x:x + side] = cv2.resize(face, (side, side), interpolation=cv2.INTER_CUBIC)
+            boxes.append([x, y, side, side])
+
+        frames.append((cv2.cvtColor(canvas, cv2.COLOR_GRAY2BGR), np.array(boxes, dtype=np.int32)))
+    return frames
+
+
+def benchmark_detector(detector, frames, iou_threshold=0.3, warmup=3):
+    """
+    Runs one detector over the synthetic frames and returns its metrics
+    """
+    for bgr, _ in frames[:warmup]:
+        detector.detect(bgr)
+
+    detections = matched = total_truth = false_positives = 0
+    wall = cpu = 0.0
+    for bgr, truth in frames:
+        w0, c0 = time.perf_counter(), time.process_time()
+        boxes = detector.detect(bgr)
+        wall += time.perf_counter() - w0
+        cpu += time.process_time() - c0
+
+        detections += len(boxes)
+        total_truth += len(truth)
+        used = np.zeros(len(boxes), dtype=bool)
+        for gt in truth:
+            if len(boxes) == 0:
+                continue
+            iou = box_iou(gt, boxes)
+            iou[used] = 0
+            best = int(np.argmax(iou))
+            if iou[best] >= iou_threshold:
+                used[best] = True
+                matched += 1
+        false_positives += int(np.count_nonzero(~used))
+
+    return {
+        "detector": detector.name,
+        "frames_per_sec": len(frames) / wall,
+        "detections_per_sec": detections / wall,
+        "cpu_ms_per_frame": cpu / len(frames) * 1e3,
+        "recall": matched / max(total_truth, 1),
+        "false_positives_per_frame": false_positives / len(frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face-detector backends")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--detectors", nargs="+", default=list(DETECTORS))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--size", default="1280x720", help="Frame size WxH")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="cv2.setNumThreads (default: OpenCV's choice)")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    frames = synthesize_frames(args.dataset_dir, args.frames, size)
+    print(f"🖼️ {len(frames)} synthetic {size[0]}x{size[1]} frames, "
+          f"{sum(len(t) for _, t in frames)} faces")
+
+    results = []
+    for name in args.detectors:
+        try:
+            detector = make_detector(name)
+        except (FileNotFoundError, ValueError, cv2.error) as e:
+            print(f"⚠️ Skipping {name}: {e}")
+            continue
+        results.append(benchmark_detector(detector, frames))
+
+    print(f"\n{'detector':<10}{'frames/s':>10}{'dets/s':>10}{'cpu ms':>10}{'recall':>9}{'FP/frame':>10}")
+    for r in results:
+        print(f"{r['detector']:<10}{r['frames_per_sec']:>10.1f}{r['detections_per_sec']:>10.1f}"
+              f"{r['cpu_ms_per_frame']:>10.2f}{r['recall']:>9.3f}{r['false_positives_per_frame']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
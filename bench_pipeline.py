@@ -0,0 +1,177 @@
+# bench_pipeline.py
+#
+# Headless per-stage latency benchmark for the emotion pipeline. Runs the
+# exact stages used by app.py / realtime_emotion_music.py, in isolation
+# and end to end, on:
+#   - "dataset": Dataset/test images (48x48 face crops, JPEG-encoded)
+#   - "frames":  synthetic larger frames with pasted faces (see bench_detectors.py)
+# and writes p50/p95/p99 latency and throughput per stage as JSON, so
+# results can be diffed between model or dependency versions.
+#
+#   python bench_pipeline.py --out bench_results.json
+
+import argparse
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from bench_detectors import synthesize_frames
+from dataset_pack import list_split_files
+from emotion_predictor import MODEL_PATH, EmotionPredictor, preprocess_faces, top_emotion
+from music_mapper import get_music_recommendation
+
+
+def time_stage(fn, inputs, warmup=10, repeat=200):
+    """
+    Calls fn on the inputs (cycled) `warmup` times untimed, then
+    `repeat` times timed.
+    Returns {p50_ms, p95_ms, p99_ms, mean_ms, throughput_per_sec, runs}
+    """
+    for i in range(warmup):
+        fn(inputs[i % len(inputs)])
+
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        arg = inputs[i % len(inputs)]
+        t = time.perf_counter()
+        fn(arg)
+        timings[i] = time.perf_counter() - t
+
+    ms = timings * 1e3
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "throughput_per_sec": float(repeat / timings.sum()),
+        "runs": repeat,
+    }
+
+
+def _load_dataset_jpegs(dataset_dir, count, seed=0):
+    test_dir = os.path.join(dataset_dir, "test")
+    _, entries = list_split_files(test_dir)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(entries), size=min(count, len(entries)), replace=False)
+    jpegs = []
+    for i in picks:
+        with open(os.path.join(test_dir, entries[i][0]), "rb") as f:
+            jpegs.append(f.read())
+    return jpegs
+
+
+def benchmark_inputs(predictor, jpegs, warmup, repeat, full_frame_boxes=False):
+    """
+    Times every stage on one set of JPEG-encoded inputs
+    """
+    frames = [cv2.imdecode(np.frombuffer(b, np.uint8), cv2.IMREAD_COLOR) for b in jpegs]
+    grays = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in frames]
+
+    if full_frame_boxes:
+        # 48x48 crops are the face already, like a tracker-provided ROI
+        boxes = [np.array([[0, 0, g.shape[1], g.shape[0]]], dtype=np.int32) for g in grays]
+    else:
+        boxes = [predictor.detect_faces(g) for g in grays]
+    with_faces = [(g, b) for g, b in zip(grays, boxes) if len(b)]
+    if not with_faces:
+        with_faces = [(g, np.array([[0, 0, g.shape[1], g.shape[0]]], dtype=np.int32)) for g in grays]
+    batches = [preprocess_faces(g, b) for g, b in with_faces]
+    emotions = [top_emotion(p)[0] for p in predictor.predict_batch(np.concatenate(batches))]
+
+    def end_to_end(image_bytes):
+        if full_frame_boxes:
+            # Same path as the separate stages: the crop is the face, so the
+            # detector (which rarely fires on 48x48 crops) is skipped
+            frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            found = np.array([[0, 0, gray.shape[1], gray.shape[0]]], dtype=np.int32)
+            probs = predictor.predict_faces(gray, found)
+        else:
+            found, probs = predictor.predict_image(image_bytes)
+        if len(found):
+            get_music_recommendation(top_emotion(probs[0])[0], probs[0])
+
+    stages = {
+        "jpeg_decode": (lambda b: cv2.imdecode(np.frombuffer(b, np.uint8), cv2.IMREAD_COLOR), jpegs),
+        "bgr_to_gray": (lambda f: cv2.cvtColor(f, cv2.COLOR_BGR2GRAY), frames),
+        "detect_faces": (predictor.detect_faces, grays),
+        "roi_preprocess": (lambda gb: preprocess_faces(gb[0], gb[1]), with_faces),
+        "inference": (predictor.predict_batch, batches),
+        "recommendation": (get_music_recommendation, emotions),
+        "end_to_end": (end_to_end, jpegs),
+    }
+
+    results = {name: time_stage(fn, inputs, warmup, repeat) for name, (fn, inputs) in stages.items()}
+    results["faces_per_input"] = float(np.mean([len(b) for b in boxes]))
+    return results
+
+
+def environment_info(model_path):
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "model": model_path,
+    }
+    try:
+        import tensorflow as tf
+        info["tensorflow"] = tf.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark (headless)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--detector", default=None, help="Face detector backend (default: FACE_DETECTOR)")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--images", type=int, default=200, help="Dataset/test images to sample")
+    parser.add_argument("--frames", type=int, default=20, help="Synthetic frames to build")
+    parser.add_argument("--size", default="1280x720", help="Synthetic frame size WxH")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--out", default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    kwargs = {"detector": args.detector} if args.detector else {}
+    predictor = EmotionPredictor(args.model, **kwargs)
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    dataset_jpegs = _load_dataset_jpegs(args.dataset_dir, args.images)
+    frame_jpegs = [
+        cv2.imencode(".jpg", f)[1].tobytes()
+        for f, _ in synthesize_frames(args.dataset_dir, args.frames, size)
+    ]
+
+    report = {
+        "environment": environment_info(args.model),
+        "settings": {"warmup": args.warmup, "repeat": args.repeat, "frame_size": list(size)},
+        "dataset": benchmark_inputs(predictor, dataset_jpegs, args.warmup, args.repeat,
+                                    full_frame_boxes=True),
+        "frames": benchmark_inputs(predictor, frame_jpegs, args.warmup, args.repeat),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        for input_set in ("dataset", "frames"):
+            print(f"\n📊 {input_set}")
+            for stage, r in report[input_set].items():
+                if isinstance(r, dict):
+                    print(f"  {stage:<16} p50 {r['p50_ms']:8.3f} ms   p95 {r['p95_ms']:8.3f} ms   "
+                          f"p99 {r['p99_ms']:8.3f} ms   {r['throughput_per_sec']:9.1f}/s")
+        print(f"\n💾 Report saved to {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
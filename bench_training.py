@@ -0,0 +1,142 @@
+# bench_training.py
+#
+# Compares train_model.py's default TensorFlow settings with the
+# CPU-optimised mode (cpu_training.py) on this machine. Each
+# configuration trains the same CNN on the same in-memory subset of
+# Dataset/train for a few epochs in a fresh process (thread pools and
+# precision policies are per process) and reports per-epoch time,
+# steady-state images/sec (first epoch, which includes tracing / XLA
+# compilation, excluded) and validation accuracy.
+#
+#   python bench_training.py --samples 4096 --epochs 3
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# name -> (cpu_optimized, xla, batch_size, bf16)
+CONFIGS = {
+    "default": (False, False, 64, False),
+    "cpu": (True, False, 64, False),
+    "cpu-xla": (True, True, 64, False),
+    "cpu-b256": (True, False, 256, False),
+    "cpu-b256-bf16": (True, False, 256, True),
+}
+
+
+def run_config(name, dataset_dir, samples, epochs, seed=0):
+    """
+    Trains one configuration in this process. Returns its metrics
+    """
+    cpu_optimized, xla, batch_size, bf16 = CONFIGS[name]
+
+    import tensorflow as tf
+
+    from cpu_training import (BASE_LEARNING_RATE, compile_for_cpu, configure_cpu, enable_bf16,
+                              scaled_learning_rate)
+    from data_pipeline import ThroughputCallback
+    from dataset_pack import load_split_arrays
+    from emotion_model import build_emotion_cnn
+
+    if cpu_optimized:
+        configure_cpu()
+    if bf16 and not enable_bf16():
+        return {"config": name, "skipped": "no native bfloat16 on this CPU"}
+
+    images, labels, class_indices = load_split_arrays(dataset_dir, "train")
+    rng = np.random.default_rng(seed)
+    # Sorted reads are cheap on a memory-mapped pack; shuffle afterwards
+    picks = np.sort(rng.permutation(len(labels))[:samples + samples // 4])
+    order = rng.permutation(len(picks))
+    x = images[picks][order, :, :, None].astype("float32") / 255.0
+    y = tf.keras.utils.to_categorical(labels[picks][order], len(class_indices))
+    x_train, y_train = x[:samples], y[:samples]
+    x_val, y_val = x[samples:], y[samples:]
+
+    train_ds = (tf.data.Dataset.from_tensor_slices((x_train, y_train))
+                .shuffle(len(x_train), seed=seed)
+                .batch(batch_size, drop_remainder=True)
+                .prefetch(tf.data.AUTOTUNE))
+    val_ds = tf.data.Dataset.from_tensor_slices((x_val, y_val)).batch(256)
+
+    tf.keras.utils.set_random_seed(seed)
+    model = build_emotion_cnn(len(class_indices))
+    learning_rate = scaled_learning_rate(batch_size) if batch_size != 64 else BASE_LEARNING_RATE
+    if cpu_optimized:
+        compile_for_cpu(model, learning_rate, jit_compile=xla)
+    else:
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate),
+                      loss='categorical_crossentropy', metrics=['accuracy'])
+
+    # One fit() call: repeated fit()s each pay iterator / function setup
+    trained = (len(x_train) // batch_size) * batch_size
+    throughput = ThroughputCallback(trained, label=name)
+    start = time.perf_counter()
+    history = model.fit(train_ds, epochs=epochs, validation_data=val_ds, verbose=0,
+                        callbacks=[throughput])
+    total = time.perf_counter() - start
+
+    epoch_times = [trained / rate for rate in throughput.history]
+    steady = throughput.history[1:] or throughput.history
+    return {
+        "config": name,
+        "batch_size": batch_size,
+        "learning_rate": learning_rate,
+        "epoch_seconds": epoch_times,
+        "first_epoch_seconds": epoch_times[0],
+        "images_per_sec": float(np.mean(steady)),
+        "total_seconds": total,
+        "val_accuracy": float(history.history["val_accuracy"][-1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark default vs CPU-optimised training")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--samples", type=int, default=4096, help="Training images per run")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_config(args.worker, args.dataset_dir, args.samples, args.epochs)))
+        return
+
+    results = []
+    for name in args.configs:
+        print(f"⏱️ Training {name}...")
+        out = subprocess.run(
+            [sys.executable, __file__, "--worker", name, "--dataset-dir", args.dataset_dir,
+             "--samples", str(args.samples), "--epochs", str(args.epochs)],
+            capture_output=True, text=True
+        )
+        if out.returncode != 0:
+            print(f"⚠️ {name} failed:\n{out.stderr[-2000:]}")
+            continue
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    baseline = next((r for r in results if r["config"] == "default"), None)
+    print(f"\n{'config':<16}{'batch':>6}{'1st epoch s':>13}{'epoch s':>9}{'images/s':>10}{'speedup':>9}{'val acc':>9}")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['config']:<16}  skipped: {r['skipped']}")
+            continue
+        speedup = r["images_per_sec"] / baseline["images_per_sec"] if baseline else float("nan")
+        print(f"{r['config']:<16}{r['batch_size']:>6}{r['first_epoch_seconds']:>13.1f}"
+              f"{np.mean(r['epoch_seconds'][1:] or r['epoch_seconds']):>9.1f}"
+              f"{r['images_per_sec']:>10.0f}{speedup:>8.2f}x{r['val_accuracy']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# compare_backends.py
+#
+# Compares the Keras model with its TFLite / ONNX exports on
+# Dataset/test: accuracy, size on disk, cold-load time and per-image
+# latency. Each model is measured in a fresh Python process so the
+# load time includes importing its runtime.
+#
+#   python export_model.py
+#   python compare_backends.py
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+_PROCESS_START = time.perf_counter()
+
+
+def _worker(model_path, dataset_dir, latency_runs):
+    import numpy as np
+
+    from emotion_predictor import INPUT_SHAPE, backend_for_path, load_backend
+
+    backend = load_backend(model_path)
+    backend.predict(np.zeros((1,) + INPUT_SHAPE, dtype="float32"))
+    cold_load = time.perf_counter() - _PROCESS_START
+
+    from dataset_pack import load_split_arrays
+
+    images, labels, _ = load_split_arrays(dataset_dir, "test")
+    correct = 0
+    for start in range(0, len(images), 256):
+        batch = images[start:start + 256, :, :, np.newaxis].astype("float32") / 255.0
+        preds = backend.predict(batch)
+        correct += int(np.sum(np.argmax(preds, axis=1) == labels[start:start + 256]))
+
+    single = images[:1, :, :, np.newaxis].astype("float32") / 255.0
+    for _ in range(10):
+        backend.predict(single)
+    timings = []
+    for i in range(latency_runs):
+        single = images[i % len(images)][np.newaxis, :, :, np.newaxis].astype("float32") / 255.0
+        t = time.perf_counter()
+        backend.predict(single)
+        timings.append(time.perf_counter() - t)
+    timings_ms = np.array(timings) * 1e3
+
+    return {
+        "model": model_path,
+        "backend": backend_for_path(model_path),
+        "size_kb": os.path.getsize(model_path) / 1024,
+        "cold_load_s": cold_load,
+        "accuracy": correct / max(len(images), 1),
+        "latency_p50_ms": float(np.percentile(timings_ms, 50)),
+        "latency_p95_ms": float(np.percentile(timings_ms, 95)),
+    }
+
+
+def default_models():
+    from emotion_predictor import MODEL_PATH
+
+    models = [MODEL_PATH] if os.path.exists(MODEL_PATH) else []
+    if os.path.exists("emotion_student.h5") and MODEL_PATH != "emotion_student.h5":
+        models.append("emotion_student.h5")
+    models += sorted(glob.glob(os.path.join("exported", "*.tflite")))
+    models += sorted(glob.glob(os.path.join("exported", "*.onnx")))
+    return models
+
+
+def run_isolated(model_path, dataset_dir, latency_runs):
+    """
+    Measures one model in a child process and returns its result dict
+    """
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", model_path,
+           "--dataset-dir", dataset_dir, "--latency-runs", str(latency_runs)]
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    if out.returncode != 0:
+        print(out.stderr[-2000:], file=sys.stderr)
+        raise RuntimeError(f"❌ Benchmark failed for {model_path}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends")
+    parser.add_argument("--models", nargs="*", default=None,
+                        help="Model files (default: the .h5 model, the distilled student and everything in exported/)")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--latency-runs", type=int, default=200)
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.dataset_dir, args.latency_runs)))
+        return
+
+    models = args.models or default_models()
+    if not models:
+        raise FileNotFoundError("❌ No models to compare (run train_model.py / export_model.py)")
+
+    results = [run_isolated(m, args.dataset_dir, args.latency_runs) for m in models]
+
+    print(f"\n{'model':<36}{'backend':<9}{'size KB':>9}{'load s':>9}"
+          f"{'acc %':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in results:
+        print(f"{os.path.basename(r['model']):<36}{r['backend']:<9}{r['size_kb']:>9.0f}"
+              f"{r['cold_load_s']:>9.2f}{r['accuracy'] * 100:>8.2f}"
+              f"{r['latency_p50_ms']:>9.3f}{r['latency_p95_ms']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
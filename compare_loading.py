@@ -0,0 +1,170 @@
+# compare_loading.py
+#
+# Load time and resident memory of the model formats, as several
+# processes on one host would see them (Streamlit sessions, kiosk
+# restarts, batch workers). For every model it starts --processes fresh
+# Python processes one after another; each imports its runtime, loads the
+# model and runs one warm-up inference, reports the time it took and
+# then stays alive until all of them are up, so the memory figures
+# include the sharing between them:
+#   RSS      pages resident in the process (shared pages counted in full)
+#   PSS      RSS with shared pages split between the processes using them
+#   private  pages only this process uses (its own copy of the weights)
+#   host     sum of PSS: what the N processes cost the machine together
+#
+# Memory is read from /proc/<pid>/smaps_rollup (Linux).
+#
+#   python export_model.py --formats savedmodel flat
+#   python compare_loading.py --processes 4
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+_PROCESS_START = time.perf_counter()
+
+
+def _worker(model_path):
+    import numpy as np
+
+    from emotion_predictor import INPUT_SHAPE, import_runtime, load_backend
+
+    import_runtime(model_path)
+    imported = time.perf_counter() - _PROCESS_START
+    backend = load_backend(model_path, num_threads=1)
+    backend.predict(np.zeros((1,) + INPUT_SHAPE, dtype="float32"))
+    ready = time.perf_counter() - _PROCESS_START
+    print(json.dumps({"import_s": imported, "load_s": ready - imported, "ready_s": ready}), flush=True)
+    # Stay resident until the parent has measured every process
+    sys.stdin.readline()
+
+
+def default_models():
+    from emotion_predictor import MODEL_PATH
+
+    candidates = [
+        MODEL_PATH,
+        os.path.join("exported", "emotion_savedmodel"),
+        os.path.join("exported", "emotion.flat"),
+        os.path.join("exported", "emotion_fp32.tflite"),
+    ]
+    return [path for path in candidates if os.path.exists(path)]
+
+
+def memory_mb(pid):
+    """
+    Returns {rss, pss, private, shared} in MB, or None off Linux
+    """
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        return None
+    fields = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+    }
+
+
+def measure(model_path, processes):
+    """
+    Starts the processes, measures them while all are alive, then
+    releases them. Returns the per-process results
+    """
+    procs, runs = [], []
+    try:
+        for _ in range(processes):
+            proc = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker", model_path],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+            procs.append(proc)
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"❌ Loading failed for {model_path}")
+            runs.append(json.loads(line))
+
+        for proc, run in zip(procs, runs):
+            run["memory_mb"] = memory_mb(proc.pid)
+    finally:
+        for proc in procs:
+            try:
+                proc.stdin.write("\n")
+                proc.stdin.flush()
+            except OSError:
+                pass
+        for proc in procs:
+            proc.wait()
+    return runs
+
+
+def summarize(model_path, runs):
+    from emotion_predictor import backend_for_path
+
+    def mean(values):
+        return sum(values) / len(values)
+
+    summary = {
+        "model": model_path,
+        "backend": backend_for_path(model_path),
+        "processes": len(runs),
+        "import_s": mean([r["import_s"] for r in runs]),
+        "load_s": mean([r["load_s"] for r in runs]),
+        "ready_s": mean([r["ready_s"] for r in runs]),
+        "runs": runs,
+    }
+    if all(r["memory_mb"] for r in runs):
+        for key in ("rss", "pss", "private", "shared"):
+            summary[f"{key}_mb"] = mean([r["memory_mb"][key] for r in runs])
+        summary["host_mb"] = sum(r["memory_mb"]["pss"] for r in runs)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model load time and resident memory")
+    parser.add_argument("--models", nargs="*", default=None,
+                        help="Model files / SavedModel dirs (default: the .h5 model plus the exports)")
+    parser.add_argument("--processes", type=int, default=4, help="Concurrent processes per model")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args.worker)
+        return
+
+    models = args.models or default_models()
+    if not models:
+        raise FileNotFoundError("❌ No models to compare (run train_model.py / export_model.py)")
+
+    results = []
+    for model_path in models:
+        print(f"⏱️ {model_path} x {args.processes}...")
+        results.append(summarize(model_path, measure(model_path, args.processes)))
+
+    print(f"\n{'model':<24}{'backend':<11}{'import s':>9}{'load s':>8}{'RSS MB':>8}"
+          f"{'PSS MB':>8}{'private':>9}{f'host MB (x{args.processes})':>16}")
+    for r in results:
+        line = (f"{os.path.basename(os.path.normpath(r['model'])):<24}{r['backend']:<11}"
+                f"{r['import_s']:>9.2f}{r['load_s']:>8.3f}")
+        if "rss_mb" in r:
+            line += f"{r['rss_mb']:>8.0f}{r['pss_mb']:>8.0f}{r['private_mb']:>9.0f}{r['host_mb']:>16.0f}"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# compress_model.py
+#
+# Compression stage after train_model.py:
+#   1. magnitude pruning - the smallest weights of every large kernel are
+#      zeroed, following a polynomial sparsity schedule while fine-tuning
+#      on Dataset/train (the mask is re-applied after every batch)
+#   2. weight clustering - the surviving weights of each kernel are
+#      k-means clustered and fine-tuned as shared centroids, so a kernel
+#      holds at most --clusters distinct values (pruned zeros stay zero)
+#
+# Artifacts (compressed/):
+#   emotion_pruned.h5              pruned + fine-tuned Keras model
+#   emotion_compressed.h5          pruned + clustered Keras model
+#   emotion_sparse.tflite          float32 TFLite, pruned kernels sparse-encoded
+#   emotion_dynamic.tflite         dynamic-range (int8 weight) TFLite; the
+#                                  clustered weights make it gzip well
+#
+# and a report of on-disk / gzip size, sparsity, cold-load time, latency
+# and test accuracy next to the baseline model (measured like
+# compare_backends.py, one fresh process per model). Any artifact can be
+# served with EMOTION_MODEL=<path>.
+#
+#   python compress_model.py --sparsity 0.8 --clusters 16
+#
+# tensorflow-model-optimization does not support Keras 3, so the
+# schedule, masks and centroid sharing are implemented as Keras callbacks.
+
+import argparse
+import gzip
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+from tensorflow.keras.models import load_model
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+from compare_backends import run_isolated
+from data_pipeline import packed_sequences
+from dataset_pack import PACKED_DIRNAME, pack_split
+from emotion_predictor import MODEL_PATH
+
+COMPRESSED_DIR = "compressed"
+
+
+# ==========================
+# PRUNING
+# ==========================
+
+def compressible_layers(model, min_weights=4096):
+    """
+    Conv / dense layers worth compressing: everything with a kernel of at
+    least min_weights values, except the classifier
+    """
+    return [
+        layer for layer in model.layers[:-1]
+        if hasattr(layer, "kernel") and int(np.prod(layer.kernel.shape)) >= min_weights
+    ]
+
+
+def polynomial_sparsity(step, target, begin_step, end_step, initial=0.0, power=3):
+    """
+    Sparsity at a training step: initial until begin_step, then rising
+    quickly and flattening out at target by end_step
+    """
+    if step <= begin_step:
+        return initial
+    progress = min(1.0, (step - begin_step) / max(1, end_step - begin_step))
+    return target + (initial - target) * (1.0 - progress) ** power
+
+
+def magnitude_mask(kernel, sparsity):
+    """
+    Boolean mask keeping the largest-magnitude (1 - sparsity) of kernel
+    """
+    k = int(round(sparsity * kernel.size))
+    if k == 0:
+        return np.ones(kernel.shape, dtype=bool)
+    magnitude = np.abs(kernel)
+    threshold = np.partition(magnitude.ravel(), k - 1)[k - 1]
+    return magnitude > threshold
+
+
+class MagnitudePruning(Callback):
+    """
+    Re-computes the masks every `frequency` steps from the sparsity
+    schedule and re-applies them after every batch, so weights the
+    optimizer moves away from zero are pruned again.
+    """
+
+    def __init__(self, layers, target, begin_step, end_step, frequency=50):
+        super().__init__()
+        self.layers = layers
+        self.target = target
+        self.begin_step = begin_step
+        self.end_step = end_step
+        self.frequency = frequency
+        self.step = 0
+        self.sparsity = 0.0
+        self.masks = [np.ones(layer.kernel.shape, dtype=bool) for layer in layers]
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step += 1
+        if self.step % self.frequency == 0 or self.step == self.end_step:
+            self.sparsity = polynomial_sparsity(self.step, self.target, self.begin_step, self.end_step)
+            self.masks = [magnitude_mask(layer.kernel.numpy(), self.sparsity) for layer in self.layers]
+        for layer, mask in zip(self.layers, self.masks):
+            layer.kernel.assign(layer.kernel.numpy() * mask)
+
+    def on_epoch_end(self, epoch, logs=None):
+        print(f"\n✂️ sparsity {self.sparsity:.2f} (target {self.target:.2f})")
+
+
+# ==========================
+# CLUSTERING
+# ==========================
+
+def kmeans_1d(values, k, iterations=20):
+    """
+    Lloyd's k-means on a 1-D array with linearly spaced initial centroids.
+    Returns (centroids, assignment)
+    """
+    centroids = np.linspace(values.min(), values.max(), k)
+    for _ in range(iterations):
+        assignment = np.searchsorted((centroids[1:] + centroids[:-1]) / 2, values)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.bincount(assignment, weights=values, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled]
+    assignment = np.searchsorted((centroids[1:] + centroids[:-1]) / 2, values)
+    return centroids, assignment
+
+
+class WeightClustering(Callback):
+    """
+    Clusters every kernel's non-zero weights once, then after every batch
+    moves each centroid to the mean of its (updated) weights and snaps
+    the weights back onto the centroids: the centroids are trained with
+    the averaged gradient of their members.
+    """
+
+    def __init__(self, layers, clusters=16):
+        super().__init__()
+        self.layers = layers
+        self.clusters = clusters
+        self.state = []
+
+    def on_train_begin(self, logs=None):
+        self.state = []
+        for layer in self.layers:
+            kernel = layer.kernel.numpy()
+            mask = kernel != 0
+            _, assignment = kmeans_1d(kernel[mask].astype(np.float64), self.clusters)
+            self.state.append((mask, assignment))
+        self._snap()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._snap()
+
+    def _snap(self):
+        for layer, (mask, assignment) in zip(self.layers, self.state):
+            kernel = layer.kernel.numpy()
+            counts = np.bincount(assignment, minlength=self.clusters)
+            sums = np.bincount(assignment, weights=kernel[mask], minlength=self.clusters)
+            centroids = sums / np.maximum(counts, 1)
+            clustered = np.zeros_like(kernel)
+            clustered[mask] = centroids[assignment]
+            layer.kernel.assign(clustered)
+
+
+# ==========================
+# EXPORT + STATS
+# ==========================
+
+def export_compressed_tflite(model, path, optimization):
+    """
+    Writes a TFLite model with one converter optimization. Sparse encoding
+    is not combined with dynamic-range quantization: the default XNNPACK
+    delegate cannot prepare that combination.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [optimization]
+    data = converter.convert()
+    with open(path, "wb") as f:
+        f.write(data)
+    print(f"✅ {path} ({len(data) / 1024:.0f} KB)")
+
+
+def kernel_stats(model):
+    """
+    Returns (sparsity, max distinct values per kernel) over the
+    compressible kernels of a Keras model
+    """
+    kernels = [layer.kernel.numpy() for layer in compressible_layers(model)]
+    total = sum(k.size for k in kernels)
+    zeros = sum(int(np.sum(k == 0)) for k in kernels)
+    return zeros / max(total, 1), max((len(np.unique(k)) for k in kernels), default=0)
+
+
+def gzip_kb(path):
+    with open(path, "rb") as f:
+        return len(gzip.compress(f.read(), compresslevel=6)) / 1024
+
+
+# ==========================
+# MAIN
+# ==========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune, cluster and fine-tune the emotion model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--out-dir", default=COMPRESSED_DIR)
+    parser.add_argument("--sparsity", type=float, default=0.8, help="Target fraction of zero weights")
+    parser.add_argument("--clusters", type=int, default=16, help="Distinct values per kernel")
+    parser.add_argument("--prune-epochs", type=int, default=4)
+    parser.add_argument("--cluster-epochs", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--no-augment", action="store_true")
+    parser.add_argument("--latency-runs", type=int, default=200)
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    pruned_path = os.path.join(args.out_dir, "emotion_pruned.h5")
+    compressed_path = os.path.join(args.out_dir, "emotion_compressed.h5")
+    sparse_path = os.path.join(args.out_dir, "emotion_sparse.tflite")
+    dynamic_path = os.path.join(args.out_dir, "emotion_dynamic.tflite")
+
+    # ==========================
+    # 1. DATA + BASELINE
+    # ==========================
+    packed_dir = os.path.join(args.dataset_dir, PACKED_DIRNAME)
+    for split in ("train", "test"):
+        pack_split(args.dataset_dir, split, packed_dir)
+
+    augmenter = None if args.no_augment else ImageDataGenerator(
+        rotation_range=10,
+        width_shift_range=0.1,
+        height_shift_range=0.1,
+        zoom_range=0.1,
+        horizontal_flip=True
+    )
+    train_seq, val_seq, _, _ = packed_sequences(
+        packed_dir, batch_size=args.batch_size, validation_split=0.2, augmenter=augmenter
+    )
+
+    model = load_model(args.model, compile=False)
+    layers = compressible_layers(model)
+    print(f"🗜️ Compressing {len(layers)} layers: " + ", ".join(
+        f"{layer.name} ({int(np.prod(layer.kernel.shape)):,})" for layer in layers))
+
+    def compile_model():
+        # Fresh optimizer state per phase
+        model.compile(optimizer=tf.keras.optimizers.Adam(args.learning_rate),
+                      loss='categorical_crossentropy', metrics=['accuracy'])
+
+    # ==========================
+    # 2. PRUNE + FINE-TUNE
+    # ==========================
+    steps = len(train_seq) * args.prune_epochs
+    pruning = MagnitudePruning(layers, args.sparsity, begin_step=0, end_step=int(steps * 0.7))
+    compile_model()
+    model.fit(train_seq, epochs=args.prune_epochs, validation_data=val_seq, callbacks=[pruning])
+    model.save(pruned_path, include_optimizer=False)
+    print(f"💾 {pruned_path}")
+
+    # ==========================
+    # 3. CLUSTER + FINE-TUNE
+    # ==========================
+    clustering = WeightClustering(layers, args.clusters)
+    compile_model()
+    model.fit(train_seq, epochs=args.cluster_epochs, validation_data=val_seq, callbacks=[clustering])
+    model.save(compressed_path, include_optimizer=False)
+    print(f"💾 {compressed_path}")
+    export_compressed_tflite(model, sparse_path, tf.lite.Optimize.EXPERIMENTAL_SPARSITY)
+    export_compressed_tflite(model, dynamic_path, tf.lite.Optimize.DEFAULT)
+
+    # ==========================
+    # 4. REPORT
+    # ==========================
+    report = []
+    for path in (args.model, pruned_path, compressed_path, sparse_path, dynamic_path):
+        result = run_isolated(path, args.dataset_dir, args.latency_runs)
+        result["gzip_kb"] = gzip_kb(path)
+        result["sparsity"], result["distinct_values"] = (None, None)
+        if path.endswith(".h5"):
+            result["sparsity"], result["distinct_values"] = kernel_stats(load_model(path, compile=False))
+        report.append(result)
+
+    print(f"\n{'model':<28}{'size KB':>9}{'gzip KB':>9}{'sparsity':>10}{'load s':>8}"
+          f"{'acc %':>8}{'p50 ms':>9}")
+    for r in report:
+        sparsity = f"{r['sparsity'] * 100:.0f}%" if r["sparsity"] is not None else "-"
+        print(f"{os.path.basename(r['model']):<28}{r['size_kb']:>9.0f}{r['gzip_kb']:>9.0f}{sparsity:>10}"
+              f"{r['cold_load_s']:>8.2f}{r['accuracy'] * 100:>8.2f}{r['latency_p50_ms']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# cpu_training.py
+#
+# CPU-optimised training settings for train_model.py --cpu-optimized and
+# bench_training.py:
+#   - intra-/inter-op thread pools sized from the cores this process may use
+#   - optional XLA JIT compilation of the train step (--xla). XLA:CPU does
+#     not use oneDNN convolutions, so for this conv-heavy CNN it can be
+#     slower than the default kernels; measure with bench_training.py
+#   - optional bfloat16 mixed precision on CPUs with native bf16
+#     (AVX512_BF16 / AMX), where oneDNN runs the convolutions in bf16
+#   - learning-rate scaling for batch sizes above the baseline 64
+#
+# Thread settings only take effect before TensorFlow runs its first op,
+# so call configure_cpu() right after parsing arguments.
+
+import math
+import os
+
+import tensorflow as tf
+
+BASE_BATCH_SIZE = 64
+BASE_LEARNING_RATE = 1e-3
+BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+def cpu_core_count():
+    """
+    Returns the number of cores this process is allowed to run on
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def cpu_flags():
+    """
+    Returns the CPU feature flags from /proc/cpuinfo (empty set elsewhere)
+    """
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def bf16_supported():
+    """
+    True when the CPU has native bfloat16 instructions
+    """
+    return any(flag in cpu_flags() for flag in BF16_CPU_FLAGS)
+
+
+def configure_cpu(intra_op_threads=None, inter_op_threads=None):
+    """
+    Sizes TensorFlow's thread pools: one intra-op thread per core and a
+    small inter-op pool (the CNN is a single chain of ops).
+    Returns (intra, inter) as applied
+    """
+    cores = cpu_core_count()
+    intra = intra_op_threads or cores
+    inter = inter_op_threads or (2 if cores >= 4 else 1)
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+        tf.config.threading.set_inter_op_parallelism_threads(inter)
+    except RuntimeError:
+        print("⚠️ TensorFlow is already initialized; thread settings unchanged")
+    return intra, inter
+
+
+def enable_bf16(force=False):
+    """
+    Switches Keras to the mixed_bfloat16 policy if the CPU supports it
+    (or force=True). Returns True when enabled
+    """
+    if not (force or bf16_supported()):
+        print("⚠️ CPU has no native bfloat16 support; staying in float32")
+        return False
+    tf.keras.mixed_precision.set_global_policy("mixed_bfloat16")
+    return True
+
+
+def scaled_learning_rate(batch_size, base_lr=BASE_LEARNING_RATE, base_batch_size=BASE_BATCH_SIZE,
+                         rule="sqrt"):
+    """
+    Learning rate for batch_size given one tuned at base_batch_size.
+    "linear" scales with the batch size (SGD), "sqrt" with its square
+    root, which suits Adam better
+    """
+    ratio = batch_size / base_batch_size
+    if rule == "linear":
+        return base_lr * ratio
+    if rule == "sqrt":
+        return base_lr * math.sqrt(ratio)
+    raise ValueError(f"❌ Unknown learning-rate scaling rule: {rule}")
+
+
+def compile_for_cpu(model, learning_rate=BASE_LEARNING_RATE, jit_compile=False):
+    """
+    Compiles the model with Adam, optionally XLA-compiled
+    """
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=jit_compile
+    )
+    return model
@@ -0,0 +1,232 @@
+# data_pipeline.py
+#
+# Keras input pipelines for train_model.py:
+#   - PackedSequence: batches sliced from the memory-mapped pack (dataset_pack.py)
+#   - tfdata_datasets: tf.data with parallel decode, cache, batch-level
+#     augmentation and prefetch
+#   - ThroughputCallback: prints training images/sec for any pipeline
+
+import math
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers
+from tensorflow.keras.callbacks import Callback
+from tensorflow.keras.utils import Sequence
+
+from dataset_manifest import split_files
+from dataset_pack import IMG_SIZE, load_packed, validation_split_indices
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+class PackedSequence(Sequence):
+    """
+    Batches (images, one-hot labels) straight out of a memory-mapped
+    packed split. Only the rows of the current batch are read and
+    converted to float32; an optional ImageDataGenerator supplies the
+    same random augmentation the folder generators use.
+    """
+
+    def __init__(self, images, labels, indices, num_classes,
+                 batch_size=64, shuffle=False, augmenter=None, seed=None,
+                 class_indices=None):
+        super().__init__()
+        self.class_indices = class_indices
+        self.images = images
+        self.labels = labels
+        self.indices = np.asarray(indices)
+        self.num_classes = num_classes
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.augmenter = augmenter
+        self.rng = np.random.default_rng(seed)
+        self.order = self.indices.copy()
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+    @property
+    def samples(self):
+        return len(self.indices)
+
+    def __len__(self):
+        return math.ceil(len(self.order) / self.batch_size)
+
+    def __getitem__(self, i):
+        rows = self.order[i * self.batch_size:(i + 1) * self.batch_size]
+        # Sorted reads keep the memmap access mostly sequential
+        sorted_rows = np.sort(rows)
+
+        x = self.images[sorted_rows].astype("float32")[..., np.newaxis]
+        x *= 1.0 / 255.0
+        y = np.eye(self.num_classes, dtype="float32")[self.labels[sorted_rows]]
+
+        if self.augmenter is not None:
+            for j in range(len(x)):
+                x[j] = self.augmenter.random_transform(x[j])
+
+        return x, y
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+
+def packed_sequences(packed_dir, batch_size=64, validation_split=0.2, augmenter=None):
+    """
+    Builds (train, validation, test) PackedSequences with the same
+    80/20 split and class indices as flow_from_directory.
+    Returns (train_seq, val_seq, test_seq, class_indices)
+    """
+    train_images, train_labels, train_manifest = load_packed(packed_dir, "train")
+    test_images, test_labels, test_manifest = load_packed(packed_dir, "test")
+
+    class_indices = train_manifest["class_indices"]
+    num_classes = len(class_indices)
+    if test_manifest["class_indices"] != class_indices:
+        raise ValueError("❌ Train and test packs have different class indices")
+
+    train_idx, val_idx = validation_split_indices(train_labels, num_classes, validation_split)
+
+    train_seq = PackedSequence(train_images, train_labels, train_idx, num_classes,
+                               batch_size=batch_size, shuffle=True, augmenter=augmenter,
+                               class_indices=class_indices)
+    val_seq = PackedSequence(train_images, train_labels, val_idx, num_classes,
+                             batch_size=batch_size, class_indices=class_indices)
+    test_seq = PackedSequence(test_images, test_labels, np.arange(len(test_labels)),
+                              num_classes, batch_size=batch_size,
+                              class_indices=class_indices)
+
+    return train_seq, val_seq, test_seq, class_indices
+
+
+# ==========================
+# tf.data PIPELINE
+# ==========================
+
+def _decode_file(path, img_size=IMG_SIZE):
+    img = tf.io.decode_image(tf.io.read_file(path), channels=1, expand_animations=False)
+    # Dataset images are already 48x48; this only matters for stray files
+    img = tf.image.resize(img, img_size, method="nearest")
+    return tf.cast(img, tf.uint8)
+
+
+def batch_augmenter(seed=None):
+    """
+    Vectorized equivalent of the ImageDataGenerator augmentation
+    (rotation 10°, shift 0.1, zoom 0.1, horizontal flip). Works on a
+    whole (B, 48, 48, 1) batch with one projective transform per op.
+    """
+    return tf.keras.Sequential([
+        layers.RandomFlip("horizontal", seed=seed),
+        layers.RandomRotation(10 / 360, fill_mode="nearest", seed=seed),
+        layers.RandomTranslation(0.1, 0.1, fill_mode="nearest", seed=seed),
+        layers.RandomZoom(0.1, 0.1, fill_mode="nearest", seed=seed),
+    ], name="batch_augmentation")
+
+
+def _file_dataset(split_dir, entries, indices, num_classes):
+    paths = [os.path.join(split_dir, entries[i][0]) for i in indices]
+    labels = [entries[i][1] for i in indices]
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    return ds.map(
+        lambda path, label: (_decode_file(path), tf.one_hot(label, num_classes)),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=True
+    )
+
+
+def _to_float(images, labels):
+    return tf.cast(images, tf.float32) / 255.0, labels
+
+
+def tfdata_datasets(dataset_dir, batch_size=64, validation_split=0.2, seed=None, rescan=False):
+    """
+    Builds (train, validation, test) tf.data pipelines over the JPEG
+    folders with the same per-class 80/20 split and class indices as
+    flow_from_directory. Decoded uint8 images are cached after the
+    first epoch, so later epochs only shuffle, augment and prefetch.
+    File lists come from the dataset manifest (dataset_manifest.py),
+    fully re-walked first when rescan=True.
+    Returns (train_ds, val_ds, test_ds, class_indices, counts)
+    """
+    train_dir = os.path.join(dataset_dir, "train")
+    test_dir = os.path.join(dataset_dir, "test")
+
+    class_indices, train_entries = split_files(dataset_dir, "train", rescan)
+    test_classes, test_entries = split_files(dataset_dir, "test", rescan)
+    if test_classes != class_indices:
+        raise ValueError("❌ Train and test folders have different classes")
+    num_classes = len(class_indices)
+
+    labels = np.array([e[1] for e in train_entries])
+    train_idx, val_idx = validation_split_indices(labels, num_classes, validation_split)
+    test_idx = np.arange(len(test_entries))
+
+    augment = batch_augmenter(seed)
+
+    train_ds = (
+        _file_dataset(train_dir, train_entries, train_idx, num_classes)
+        .cache()
+        .shuffle(len(train_idx), seed=seed, reshuffle_each_iteration=True)
+        .batch(batch_size)
+        .map(_to_float, num_parallel_calls=AUTOTUNE)
+        .map(lambda x, y: (augment(x, training=True), y), num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+
+    val_ds = (
+        _file_dataset(train_dir, train_entries, val_idx, num_classes)
+        .cache()
+        .batch(batch_size)
+        .map(_to_float, num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+
+    test_ds = (
+        _file_dataset(test_dir, test_entries, test_idx, num_classes)
+        .batch(batch_size)
+        .map(_to_float, num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+
+    counts = {"train": len(train_idx), "validation": len(val_idx), "test": len(test_idx)}
+    return train_ds, val_ds, test_ds, class_indices, counts
+
+
+# ==========================
+# THROUGHPUT
+# ==========================
+
+class ThroughputCallback(Callback):
+    """
+    Prints training images/sec at the end of every epoch. Validation
+    time is excluded so the figure compares input pipelines fairly.
+    """
+
+    def __init__(self, samples_per_epoch, label=""):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.label = label
+        self.history = []
+        self._start = None
+        self._train_time = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._train_time = None
+        self._start = time.perf_counter()
+
+    def on_test_begin(self, logs=None):
+        if self._start is not None and self._train_time is None:
+            self._train_time = time.perf_counter() - self._start
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self._train_time is None:
+            self._train_time = time.perf_counter() - self._start
+        rate = self.samples_per_epoch / self._train_time
+        self.history.append(rate)
+        print(f"\n⚡ [{self.label}] epoch {epoch + 1}: "
+              f"{rate:.0f} images/sec ({self._train_time:.1f}s train)")
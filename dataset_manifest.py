@@ -0,0 +1,410 @@
+# dataset_manifest.py
+#
+# Persistent index of the Dataset tree, so the training scripts never have
+# to list ~26k files again:
+#
+#   Dataset/manifest.json
+#     per split: class indices, class counts and one row per image
+#     [relpath, class_index, size, mtime_ns, content_hash, phash]
+#
+#   content_hash  blake2b-128 of the file bytes (the same key
+#                 result_cache / evaluate_model use for image bytes)
+#   phash         64-bit DCT perceptual hash of the decoded grayscale
+#                 image, as 16 hex digits
+#
+# Updating re-walks the folders but only reads / hashes files whose size or
+# mtime changed since the last run; everything else is copied from the
+# previous manifest. dataset_pack.py, data_pipeline.tfdata_datasets and
+# train_model.py take their file lists and class counts from here without
+# listing the files. Readers only compare the mtimes of the split and
+# class folders with the ones stored in the manifest (a handful of stats)
+# and re-walk a split when one changed, which catches added, deleted and
+# renamed images. An image overwritten in place under the same name does
+# not touch its folder: this CLI, dataset_pack.py and train_model.py
+# --rescan always re-walk (about 0.4s when nothing changed).
+#
+# The duplicate / leakage report groups exact copies by content hash and
+# near-duplicates by perceptual hash. Near-duplicates are found by
+# bucketing: the 64 hash bits are cut into max_distance + 1 bands, and two
+# hashes within max_distance bits of each other must agree exactly on at
+# least one band, so only images sharing a band bucket are compared.
+#
+#   python dataset_manifest.py                       # build / update
+#   python dataset_manifest.py --report --json leaks.json
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from dataset_pack import SPLITS, list_split_files
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+NEAR_DISTANCE = 4
+
+
+def manifest_path(dataset_dir):
+    return os.path.join(dataset_dir, MANIFEST_FILENAME)
+
+
+# ==========================
+# HASHES
+# ==========================
+
+def content_hash(data):
+    """
+    Returns the blake2b-128 hex digest of the file bytes
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def perceptual_hash(gray):
+    """
+    Returns the 64-bit DCT perceptual hash of a grayscale image as
+    16 hex digits
+    """
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    bits = (low > np.median(low)).ravel()
+    return np.packbits(bits).tobytes().hex()
+
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    return content_hash(data), perceptual_hash(gray) if gray is not None else None
+
+
+# ==========================
+# MANIFEST
+# ==========================
+
+def folder_mtimes(split_dir):
+    """
+    Returns {".": mtime_ns, <class>: mtime_ns, ...} for a split folder
+    and its class folders
+    """
+    mtimes = {".": os.stat(split_dir).st_mtime_ns}
+    with os.scandir(split_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                mtimes[entry.name] = entry.stat().st_mtime_ns
+    return mtimes
+
+
+def stale_splits(manifest, dataset_dir):
+    """
+    Returns the splits whose folders changed since they were indexed
+    """
+    stale = []
+    for split, data in manifest["splits"].items():
+        split_dir = os.path.join(dataset_dir, split)
+        if not os.path.isdir(split_dir) or data.get("folders") != folder_mtimes(split_dir):
+            stale.append(split)
+    return stale
+
+
+def update_manifest(dataset_dir, splits=SPLITS, workers=None):
+    """
+    Re-walks the split folders and hashes only new or changed files.
+    Writes the manifest and returns (manifest, stats)
+    """
+    path = manifest_path(dataset_dir)
+    previous = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("version") != MANIFEST_VERSION:
+            previous = {}
+
+    manifest = {"version": MANIFEST_VERSION, "splits": {}}
+    stats = {}
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for split in splits:
+            split_dir = os.path.join(dataset_dir, split)
+            # Taken before the walk, so changes during it show up as stale
+            folders = folder_mtimes(split_dir)
+            class_indices, entries = list_split_files(split_dir)
+            known = {
+                row[0]: row for row in previous.get("splits", {}).get(split, {}).get("files", [])
+            }
+
+            rows, changed = [], []
+            for relpath, label, size, mtime_ns in entries:
+                old = known.get(relpath)
+                if old is not None and old[2] == size and old[3] == mtime_ns:
+                    rows.append([relpath, label, size, mtime_ns, old[4], old[5]])
+                else:
+                    rows.append([relpath, label, size, mtime_ns, None, None])
+                    changed.append(len(rows) - 1)
+
+            hashes = pool.map(_hash_file, [os.path.join(split_dir, rows[i][0]) for i in changed])
+            for i, (digest, phash) in zip(changed, hashes):
+                rows[i][4:6] = digest, phash
+
+            labels = np.array([row[1] for row in rows], dtype=np.int64)
+            manifest["splits"][split] = {
+                "class_indices": class_indices,
+                "class_counts": {
+                    name: int(np.count_nonzero(labels == idx)) for name, idx in class_indices.items()
+                },
+                "files": rows,
+                "folders": folders,
+            }
+            stats[split] = {
+                "files": len(rows),
+                "hashed": len(changed),
+                "removed": len(set(known) - {row[0] for row in rows}),
+                "unreadable": sum(1 for row in rows if row[5] is None),
+            }
+
+    # Splits that were not rescanned are carried over unchanged
+    for split, data in previous.get("splits", {}).items():
+        manifest["splits"].setdefault(split, data)
+    manifest["updated"] = time.time()
+
+    # Unique tmp name: concurrent training runs may update it at once
+    fd, tmp_path = tempfile.mkstemp(prefix=MANIFEST_FILENAME + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return manifest, stats
+
+
+def load_manifest(dataset_dir, rescan=False):
+    """
+    Returns the manifest as stored, re-walking only the splits whose
+    folders changed (all of them with rescan=True). It is built if it
+    does not exist yet
+    """
+    path = manifest_path(dataset_dir)
+    if rescan or not os.path.exists(path):
+        return update_manifest(dataset_dir)[0]
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return update_manifest(dataset_dir)[0]
+    stale = stale_splits(manifest, dataset_dir)
+    if stale:
+        return update_manifest(dataset_dir, splits=stale)[0]
+    return manifest
+
+
+def split_files(dataset_dir, split, rescan=False):
+    """
+    Drop-in replacement for list_split_files() that reads the manifest
+    instead of walking the folder.
+    rescan=True fully re-walks this split only.
+    Returns (class_indices, [(relpath, class_index, size, mtime_ns), ...])
+    """
+    if rescan:
+        manifest = update_manifest(dataset_dir, splits=(split,))[0]
+    else:
+        manifest = load_manifest(dataset_dir)
+    if split not in manifest["splits"]:
+        manifest = update_manifest(dataset_dir, splits=(split,))[0]
+    data = manifest["splits"][split]
+    return data["class_indices"], [tuple(row[:4]) for row in data["files"]]
+
+
+def class_counts(dataset_dir, split, rescan=False):
+    """
+    Returns {class name: number of files} for a split
+    """
+    return load_manifest(dataset_dir, rescan)["splits"][split]["class_counts"]
+
+
+# ==========================
+# DUPLICATES / LEAKAGE
+# ==========================
+
+def _popcount64(values):
+    return np.unpackbits(values.astype(">u8").view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def near_duplicate_pairs(hashes, max_distance=NEAR_DISTANCE):
+    """
+    Returns the (i, j) index pairs, i < j, of the uint64 hashes that
+    differ in at most max_distance bits, via band bucketing
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    bands = max_distance + 1
+    edges = np.linspace(0, 64, bands + 1).astype(int)
+    pairs = set()
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        keys = (hashes >> np.uint64(lo)) & np.uint64((1 << (hi - lo)) - 1)
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for bucket in np.split(order, bounds):
+            if len(bucket) < 2:
+                continue
+            # Only the members of one bucket are compared with each other
+            i, j = np.triu_indices(len(bucket), k=1)
+            close = _popcount64(hashes[bucket[i]] ^ hashes[bucket[j]]) <= max_distance
+            a, b = bucket[i[close]], bucket[j[close]]
+            pairs.update(zip(np.minimum(a, b).tolist(), np.maximum(a, b).tolist()))
+    return sorted(pairs)
+
+
+def _components(count, pairs):
+    parent = list(range(count))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    groups = {}
+    for x in range(count):
+        groups.setdefault(find(x), []).append(x)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def duplicate_report(manifest, max_distance=NEAR_DISTANCE, train_split="train", test_split="test"):
+    """
+    Groups exact duplicates (same content hash) and near-duplicates
+    (perceptual hashes within max_distance bits) across all splits.
+    Returns the report dict
+    """
+    files = []
+    for split, data in manifest["splits"].items():
+        names = {idx: name for name, idx in data["class_indices"].items()}
+        for relpath, label, _, _, digest, phash in data["files"]:
+            files.append((split, relpath, names[label], digest, phash))
+
+    by_content = {}
+    for n, f in enumerate(files):
+        by_content.setdefault(f[3], []).append(n)
+    exact_pairs = [(g[0], m) for g in by_content.values() for m in g[1:]]
+
+    # Identical pHashes are merged first, so large groups of (near-)blank
+    # images collapse into one bucket entry
+    hashed = [n for n, f in enumerate(files) if f[4] is not None]
+    unique, inverse = np.unique(
+        np.array([int(files[n][4], 16) for n in hashed], dtype=np.uint64), return_inverse=True
+    )
+    first = {}
+    near_pairs = []
+    for n, u in zip(hashed, inverse.tolist()):
+        if u in first:
+            near_pairs.append((first[u], n))
+        else:
+            first[u] = n
+    near_pairs += [(first[a], first[b]) for a, b in near_duplicate_pairs(unique, max_distance)]
+
+    def describe(groups, kind):
+        out = []
+        for group in groups:
+            members = [files[n] for n in group]
+            splits = {m[0] for m in members}
+            out.append({
+                "kind": kind,
+                "cross_split": len(splits) > 1,
+                "label_conflict": len({m[2] for m in members}) > 1,
+                "files": [f"{m[0]}/{m[1]}" for m in members],
+            })
+        return out
+
+    exact_groups = _components(len(files), exact_pairs)
+    all_groups = _components(len(files), exact_pairs + near_pairs)
+    # Near groups are the ones that hold more than one distinct file content
+    near_groups = [g for g in all_groups if len({files[n][3] for n in g}) > 1]
+    groups = describe(exact_groups, "exact") + describe(near_groups, "near")
+
+    def leaked(groups):
+        count = 0
+        for group in groups:
+            splits = [files[n][0] for n in group]
+            if train_split in splits:
+                count += splits.count(test_split)
+        return count
+
+    test_total = len(manifest["splits"].get(test_split, {}).get("files", []))
+    return {
+        "files": len(files),
+        "max_distance": max_distance,
+        "exact_groups": len(exact_groups),
+        "exact_files": sum(len(g) for g in exact_groups),
+        "near_groups": len(near_groups),
+        "near_files": sum(len(g) for g in near_groups),
+        "cross_split_groups": sum(1 for g in groups if g["cross_split"]),
+        "label_conflict_groups": sum(1 for g in groups if g["label_conflict"]),
+        "test_leaked_exact": leaked(exact_groups),
+        "test_leaked_near": leaked(all_groups),
+        "test_files": test_total,
+        "groups": groups,
+    }
+
+
+def print_report(report, examples=5):
+    test_files = max(report["test_files"], 1)
+    print(f"\n📊 {report['files']} files")
+    print(f"   🔁 exact duplicates: {report['exact_groups']} groups ({report['exact_files']} files)")
+    print(f"   🧬 near duplicates (pHash ≤ {report['max_distance']} bits): "
+          f"{report['near_groups']} groups ({report['near_files']} files)")
+    print(f"   ⚠️ cross-split groups: {report['cross_split_groups']}, "
+          f"label conflicts: {report['label_conflict_groups']}")
+    print(f"   ⚠️ test images with a train duplicate: {report['test_leaked_exact']} exact "
+          f"({report['test_leaked_exact'] / test_files:.1%}), {report['test_leaked_near']} "
+          f"exact or near ({report['test_leaked_near'] / test_files:.1%})")
+
+    leaks = [g for g in report["groups"] if g["cross_split"]]
+    for group in leaks[:examples]:
+        conflict = "  (labels differ)" if group["label_conflict"] else ""
+        print(f"\n   [{group['kind']}]{conflict}")
+        for path in group["files"][:6]:
+            print(f"     {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Dataset manifest and report duplicates / leakage")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--splits", nargs="+", default=list(SPLITS))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--report", action="store_true", help="Print the duplicate / leakage report")
+    parser.add_argument("--max-distance", type=int, default=NEAR_DISTANCE,
+                        help="Largest pHash Hamming distance counted as a near-duplicate")
+    parser.add_argument("--json", default=None, help="Also write the report (every group) to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest, stats = update_manifest(args.dataset_dir, args.splits, args.workers)
+    elapsed = time.perf_counter() - start
+    for split, s in stats.items():
+        print(f"✅ {split}: {s['files']} files ({s['hashed']} hashed, {s['removed']} removed"
+              + (f", {s['unreadable']} unreadable" if s["unreadable"] else "") + ") "
+              f"{manifest['splits'][split]['class_counts']}")
+    print(f"💾 {manifest_path(args.dataset_dir)} updated in {elapsed:.2f}s")
+
+    if args.report or args.json:
+        start = time.perf_counter()
+        report = duplicate_report(manifest, args.max_distance)
+        print_report(report)
+        print(f"\n⏱️ Report in {time.perf_counter() - start:.2f}s")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# dataset_pack.py
+#
+# One-time packing step for the FER-style Dataset tree.
+#
+#   Dataset/<split>/<class>/*.jpg  ->  Dataset/packed/<split>_images.npy  (N, 48, 48) uint8
+#                                      Dataset/packed/<split>_labels.npy  (N,)        uint8
+#                                      Dataset/packed/<split>_manifest.json
+#
+# The arrays are plain .npy files so the training scripts can open them with
+# np.load(mmap_mode="r") and slice batches straight out of the page cache.
+# Re-running the packer only decodes files that are new or changed.
+# File lists come from Dataset/manifest.json (dataset_manifest.py). The
+# training scripts read it as stored (re-walking only splits whose folders
+# changed); running this script re-walks fully, so images overwritten in
+# place are picked up too.
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+IMG_SIZE = (48, 48)
+SPLITS = ("train", "test")
+PACKED_DIRNAME = "packed"
+
+# Same extensions flow_from_directory accepts
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".ppm", ".tif", ".tiff")
+
+
+def packed_paths(packed_dir, split):
+    """
+    Returns the (images, labels, manifest) file paths for a split
+    """
+    return (
+        os.path.join(packed_dir, f"{split}_images.npy"),
+        os.path.join(packed_dir, f"{split}_labels.npy"),
+        os.path.join(packed_dir, f"{split}_manifest.json"),
+    )
+
+
+def list_split_files(split_dir):
+    """
+    Lists a split folder exactly like flow_from_directory does:
+    classes are the sorted sub-folders, files are sorted inside each class.
+    Returns (class_indices, [(relpath, class_index, size, mtime_ns), ...])
+    """
+    classes = sorted(
+        d for d in os.listdir(split_dir)
+        if os.path.isdir(os.path.join(split_dir, d))
+    )
+    class_indices = {name: i for i, name in enumerate(classes)}
+
+    entries = []
+    for name in classes:
+        class_dir = os.path.join(split_dir, name)
+        for root, _, files in sorted(os.walk(class_dir), key=lambda w: w[0]):
+            for fname in sorted(files):
+                if not fname.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, fname)
+                st = os.stat(path)
+                relpath = os.path.relpath(path, split_dir).replace(os.sep, "/")
+                entries.append((relpath, class_indices[name], st.st_size, st.st_mtime_ns))
+
+    return class_indices, entries
+
+
+def decode_image(path, img_size=IMG_SIZE):
+    """
+    Reads one image as a (48, 48) uint8 grayscale array
+    """
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"❌ Could not decode image: {path}")
+    if img.shape != img_size:
+        # flow_from_directory resizes with nearest-neighbour by default
+        img = cv2.resize(img, (img_size[1], img_size[0]), interpolation=cv2.INTER_NEAREST)
+    return img
+
+
+def _load_previous(packed_dir, split):
+    """
+    Returns (images_mmap, {relpath: (row, size, mtime_ns)}) from an earlier pack,
+    or (None, {}) if there is nothing reusable
+    """
+    images_path, _, manifest_path = packed_paths(packed_dir, split)
+    if not (os.path.exists(images_path) and os.path.exists(manifest_path)):
+        return None, {}
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    images = np.load(images_path, mmap_mode="r")
+    if images.shape[1:] != tuple(manifest["image_size"]):
+        return None, {}
+
+    previous = {
+        relpath: (row, size, mtime_ns)
+        for row, (relpath, _, size, mtime_ns) in enumerate(manifest["files"])
+    }
+    return images, previous
+
+
+def _save_atomic(path, array):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def pack_split(dataset_dir, split, packed_dir=None, img_size=IMG_SIZE, workers=None, rescan=False):
+    """
+    Packs Dataset/<split> into a contiguous uint8 array, a label array
+    and a JSON manifest. Unchanged files are copied from the previous pack
+    instead of being decoded again. The file list is read from the
+    dataset manifest (fully re-walked first when rescan=True).
+    Returns a small stats dict.
+    """
+    from dataset_manifest import split_files
+
+    packed_dir = packed_dir or os.path.join(dataset_dir, PACKED_DIRNAME)
+    os.makedirs(packed_dir, exist_ok=True)
+    split_dir = os.path.join(dataset_dir, split)
+
+    class_indices, entries = split_files(dataset_dir, split, rescan)
+    old_images, previous = _load_previous(packed_dir, split)
+
+    images = np.empty((len(entries),) + tuple(img_size), dtype=np.uint8)
+    labels = np.fromiter((e[1] for e in entries), dtype=np.uint8, count=len(entries))
+
+    to_decode = []
+    reused = 0
+    for row, (relpath, _, size, mtime_ns) in enumerate(entries):
+        prev = previous.get(relpath)
+        if prev is not None and prev[1] == size and prev[2] == mtime_ns:
+            images[row] = old_images[prev[0]]
+            reused += 1
+        else:
+            to_decode.append(row)
+
+    # cv2 releases the GIL while decoding, so threads are enough here
+    def _decode(row):
+        images[row] = decode_image(os.path.join(split_dir, entries[row][0]), img_size)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(_decode, to_decode))
+
+    # Drop the old mapping before replacing the file underneath it
+    del old_images
+
+    images_path, labels_path, manifest_path = packed_paths(packed_dir, split)
+    _save_atomic(images_path, images)
+    _save_atomic(labels_path, labels)
+
+    manifest = {
+        "split": split,
+        "image_size": list(img_size),
+        "class_indices": class_indices,
+        "class_counts": {
+            name: int(np.count_nonzero(labels == idx))
+            for name, idx in class_indices.items()
+        },
+        "files": [list(e) for e in entries],
+    }
+    tmp_manifest = manifest_path + ".tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, manifest_path)
+
+    return {
+        "split": split,
+        "samples": len(entries),
+        "decoded": len(to_decode),
+        "reused": reused,
+    }
+
+
+def load_packed(packed_dir, split):
+    """
+    Opens a packed split without copying it into memory.
+    Returns (images, labels, manifest); images is a read-only memmap
+    of shape (N, 48, 48) uint8 and labels holds class indices.
+    """
+    images_path, labels_path, manifest_path = packed_paths(packed_dir, split)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(
+            f"❌ Packed split not found: {manifest_path} (run: python dataset_pack.py)"
+        )
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    images = np.load(images_path, mmap_mode="r")
+    labels = np.load(labels_path, mmap_mode="r")
+    return images, labels, manifest
+
+
+def load_split_arrays(dataset_dir, split, packed_dir=None, workers=None):
+    """
+    Returns (images, labels, class_indices) for a split, reading the
+    packed arrays when they exist and decoding the folder otherwise.
+    images is (N, 48, 48) uint8, labels holds class indices.
+    """
+    packed_dir = packed_dir or os.path.join(dataset_dir, PACKED_DIRNAME)
+    if os.path.exists(packed_paths(packed_dir, split)[2]):
+        images, labels, manifest = load_packed(packed_dir, split)
+        return images, labels, manifest["class_indices"]
+
+    split_dir = os.path.join(dataset_dir, split)
+    class_indices, entries = list_split_files(split_dir)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        decoded = list(pool.map(lambda e: decode_image(os.path.join(split_dir, e[0])), entries))
+
+    images = np.stack(decoded) if decoded else np.empty((0,) + IMG_SIZE, dtype=np.uint8)
+    labels = np.fromiter((e[1] for e in entries), dtype=np.uint8, count=len(entries))
+    return images, labels, class_indices
+
+
+def validation_split_indices(labels, num_classes, validation_split=0.2):
+    """
+    Reproduces flow_from_directory(validation_split=...) on packed labels:
+    the first `validation_split` fraction of every class (in sorted file
+    order) is validation, the rest is training.
+    Returns (train_idx, val_idx) as sorted int arrays.
+    """
+    labels = np.asarray(labels)
+    train_idx, val_idx = [], []
+    for c in range(num_classes):
+        rows = np.flatnonzero(labels == c)
+        cut = int(validation_split * len(rows))
+        val_idx.append(rows[:cut])
+        train_idx.append(rows[cut:])
+    return np.concatenate(train_idx), np.concatenate(val_idx)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the Dataset tree into memory-mapped arrays")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--packed-dir", default=None,
+                        help="Output folder (default: <dataset-dir>/packed)")
+    parser.add_argument("--splits", nargs="+", default=list(SPLITS))
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    for split in args.splits:
+        start = time.perf_counter()
+        stats = pack_split(args.dataset_dir, split, args.packed_dir, workers=args.workers,
+                           rescan=True)
+        elapsed = time.perf_counter() - start
+        print(
+            f"✅ {split}: {stats['samples']} images "
+            f"({stats['decoded']} decoded, {stats['reused']} reused) in {elapsed:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
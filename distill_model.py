@@ -0,0 +1,206 @@
+# distill_model.py
+#
+# Knowledge distillation: the trained emotion CNN (teacher) supervises the
+# lightweight depthwise-separable student from emotion_model.py on the
+# same Dataset. The student learns from a mix of the hard labels and the
+# teacher's temperature-softened probabilities:
+#
+#   loss = alpha * CE(labels, student) + (1 - alpha) * T^2 * KL(teacher_T || student_T)
+#
+# The teacher is loaded through emotion_predictor.load_backend, so a
+# .h5, .tflite or .onnx model can teach. Batches come from the packed
+# dataset (dataset_pack.py); teacher targets are computed per batch on
+# the augmented images. The result is a plain softmax Keras model that
+# every front end loads through EMOTION_MODEL, followed by a teacher vs
+# student report (test accuracy, per-image latency, parameters).
+#
+#   python distill_model.py --epochs 30
+#   EMOTION_MODEL=emotion_student.h5 python -m streamlit run app.py
+
+import argparse
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from tensorflow.keras.utils import Sequence
+
+from compare_backends import run_isolated
+from data_pipeline import packed_sequences
+from dataset_pack import PACKED_DIRNAME, pack_split
+from emotion_model import build_student_cnn
+from emotion_predictor import MODEL_PATH, load_backend
+
+STUDENT_PATH = "emotion_student.h5"
+
+
+# ==========================
+# DISTILLATION TARGETS
+# ==========================
+
+def soften(probs, temperature):
+    """
+    softmax(log(probs) / T): the teacher's distribution at temperature T
+    """
+    logits = np.log(np.clip(probs, 1e-7, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    soft = np.exp(logits)
+    return soft / soft.sum(axis=1, keepdims=True)
+
+
+class DistillationSequence(Sequence):
+    """
+    Wraps a PackedSequence: every batch's targets become
+    [one-hot labels | teacher probabilities at temperature T], (N, 2C).
+    The teacher sees exactly the (augmented) images the student sees.
+    """
+
+    def __init__(self, base, teacher, temperature):
+        super().__init__()
+        self.base = base
+        self.teacher = teacher
+        self.temperature = temperature
+
+    def __len__(self):
+        return len(self.base)
+
+    def __getitem__(self, i):
+        x, y = self.base[i]
+        soft = soften(self.teacher.predict(x), self.temperature).astype("float32")
+        return x, np.concatenate([y, soft], axis=1)
+
+    def on_epoch_end(self):
+        self.base.on_epoch_end()
+
+
+def distillation_loss(num_classes, temperature, alpha):
+    """
+    Keras loss over the student's logits and the packed targets
+    """
+    def loss(y_true, logits):
+        hard, soft = y_true[:, :num_classes], y_true[:, num_classes:]
+        hard_loss = tf.keras.losses.categorical_crossentropy(hard, logits, from_logits=True)
+        log_student = tf.nn.log_softmax(logits / temperature)
+        kl = tf.reduce_sum(soft * (tf.math.log(tf.clip_by_value(soft, 1e-7, 1.0)) - log_student), axis=1)
+        return alpha * hard_loss + (1.0 - alpha) * temperature ** 2 * kl
+    return loss
+
+
+def hard_accuracy(num_classes):
+    def accuracy(y_true, logits):
+        return tf.cast(tf.equal(tf.argmax(y_true[:, :num_classes], axis=1),
+                                tf.argmax(logits, axis=1)), tf.float32)
+    accuracy.__name__ = "hard_accuracy"
+    return accuracy
+
+
+# ==========================
+# MAIN
+# ==========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the emotion CNN into a lightweight student")
+    parser.add_argument("--teacher", default=MODEL_PATH)
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--out", default=STUDENT_PATH)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--learning-rate", type=float, default=2e-3)
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.3,
+                        help="Weight of the hard-label loss (rest goes to the teacher)")
+    parser.add_argument("--filters", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--no-augment", action="store_true")
+    parser.add_argument("--latency-runs", type=int, default=200)
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    # ==========================
+    # 1. DATA + TEACHER
+    # ==========================
+    packed_dir = os.path.join(args.dataset_dir, PACKED_DIRNAME)
+    for split in ("train", "test"):
+        pack_split(args.dataset_dir, split, packed_dir)
+
+    augmenter = None if args.no_augment else ImageDataGenerator(
+        rotation_range=10,
+        width_shift_range=0.1,
+        height_shift_range=0.1,
+        zoom_range=0.1,
+        horizontal_flip=True
+    )
+    train_seq, val_seq, _, class_indices = packed_sequences(
+        packed_dir, batch_size=args.batch_size, validation_split=0.2, augmenter=augmenter
+    )
+    num_classes = len(class_indices)
+
+    teacher = load_backend(args.teacher)
+    print(f"🎓 Teacher: {args.teacher}")
+
+    # ==========================
+    # 2. DISTILL
+    # ==========================
+    student = build_student_cnn(num_classes, filters=tuple(args.filters), logits=True)
+    student.compile(
+        optimizer=tf.keras.optimizers.Adam(args.learning_rate),
+        loss=distillation_loss(num_classes, args.temperature, args.alpha),
+        metrics=[hard_accuracy(num_classes)]
+    )
+    student.summary()
+
+    early_stop = EarlyStopping(
+        monitor="val_hard_accuracy",
+        mode="max",
+        patience=5,
+        restore_best_weights=True,
+        verbose=1
+    )
+    student.fit(
+        DistillationSequence(train_seq, teacher, args.temperature),
+        epochs=args.epochs,
+        validation_data=DistillationSequence(val_seq, teacher, args.temperature),
+        callbacks=[early_stop]
+    )
+
+    # Same weights, plus the softmax the inference backends expect
+    exported = build_student_cnn(num_classes, filters=tuple(args.filters))
+    exported.set_weights(student.get_weights())
+    exported.save(args.out)
+    print(f"💾 Student saved as: {args.out}")
+
+    # ==========================
+    # 3. REPORT
+    # ==========================
+    teacher_params = None
+    if args.teacher.endswith((".h5", ".keras")):
+        teacher_params = tf.keras.models.load_model(args.teacher, compile=False).count_params()
+
+    report = {}
+    for role, path, params in (("teacher", args.teacher, teacher_params),
+                               ("student", args.out, exported.count_params())):
+        result = run_isolated(path, args.dataset_dir, args.latency_runs)
+        result["params"] = params
+        report[role] = result
+    t, s = report["teacher"], report["student"]
+    report["accuracy_gap"] = t["accuracy"] - s["accuracy"]
+    report["speedup_p50"] = t["latency_p50_ms"] / s["latency_p50_ms"]
+
+    print(f"\n{'model':<9}{'params':>11}{'size KB':>9}{'acc %':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for role in ("teacher", "student"):
+        r = report[role]
+        params = f"{r['params']:,}" if r["params"] is not None else "-"
+        print(f"{role:<9}{params:>11}{r['size_kb']:>9.0f}{r['accuracy'] * 100:>8.2f}"
+              f"{r['latency_p50_ms']:>9.3f}{r['latency_p95_ms']:>9.3f}")
+    print(f"\n📊 Accuracy gap: {report['accuracy_gap'] * 100:+.2f} points, "
+          f"{report['speedup_p50']:.1f}x faster per image")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
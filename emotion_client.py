@@ -0,0 +1,166 @@
+# emotion_client.py
+#
+# Client for emotion_service.py. EmotionClient.predict_image has the same
+# (boxes, probs) contract as EmotionPredictor.predict_image, so app.py and
+# app_ui.py switch to the shared service when EMOTION_SERVICE_URL is set:
+#
+#   EMOTION_SERVICE_URL=http://127.0.0.1:8765 python -m streamlit run app.py
+#
+# Run as a script it is a concurrent load generator for the service:
+#
+#   python emotion_client.py --concurrency 32 --requests 2000
+
+import argparse
+import http.client
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+EMOTION_SERVICE_URL = os.environ.get("EMOTION_SERVICE_URL") or None
+
+
+class EmotionClient:
+    """
+    Thread-safe HTTP client with one keep-alive connection per thread
+    """
+
+    def __init__(self, url=EMOTION_SERVICE_URL, timeout=30.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def request(self, method, path, body=None, content_type="application/octet-stream"):
+        """
+        Sends one request and returns the decoded JSON response
+        """
+        headers = {"Content-Type": content_type} if body is not None else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # Stale keep-alive connection: reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if response.will_close:
+            conn.close()
+            self._local.conn = None
+
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            # e.g. an HTML error page from a proxy in front of the service
+            snippet = data[:200].decode("utf-8", "replace").strip()
+            raise RuntimeError(
+                f"❌ Emotion service returned a non-JSON response ({response.status}): {snippet}"
+            ) from None
+        if response.status != 200:
+            error = payload.get("error") if isinstance(payload, dict) else payload
+            raise RuntimeError(f"❌ Emotion service error {response.status}: {error}")
+        return payload
+
+    def analyze(self, image_bytes, cropped=False):
+        """
+        Returns the service's full JSON payload (faces + recommendation)
+        """
+        path = "/predict?cropped=1" if cropped else "/predict"
+        return self.request("POST", path, image_bytes, "application/octet-stream")
+
+    def predict_image(self, image_bytes):
+        """
+        Returns (boxes, probs) like EmotionPredictor.predict_image
+        """
+        from emotion_predictor import LABELS
+
+        faces = self.analyze(image_bytes)["faces"]
+        boxes = np.array([f["box"] for f in faces], dtype=np.int32).reshape(-1, 4)
+        probs = np.array([[f["probabilities"][label] for label in LABELS] for f in faces],
+                         dtype=np.float32).reshape(-1, len(LABELS))
+        return boxes, probs
+
+    def predict_faces(self, faces_u8):
+        """
+        Classifies (N, 48, 48) uint8 face crops. Returns the JSON payload
+        """
+        return self.request("POST", "/faces", np.ascontiguousarray(faces_u8, dtype=np.uint8).tobytes())
+
+    def health(self):
+        return self.request("GET", "/health")
+
+
+# ==========================
+# LOAD GENERATOR
+# ==========================
+
+def _load_faces(dataset_dir, count, seed=0):
+    import cv2
+
+    from dataset_pack import list_split_files
+
+    test_dir = os.path.join(dataset_dir, "test")
+    _, entries = list_split_files(test_dir)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(entries), size=min(count, len(entries)), replace=False)
+    faces = [cv2.imread(os.path.join(test_dir, entries[i][0]), cv2.IMREAD_GRAYSCALE) for i in picks]
+    return [cv2.resize(f, (48, 48)) for f in faces]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for emotion_service.py")
+    parser.add_argument("--url", default=EMOTION_SERVICE_URL or "http://127.0.0.1:8765")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--endpoint", choices=["faces", "predict"], default="faces",
+                        help="faces: raw 48x48 crops, predict: JPEG-encoded crops (cropped=1)")
+    args = parser.parse_args()
+
+    import cv2
+
+    client = EmotionClient(args.url)
+    faces = _load_faces(args.dataset_dir, 256)
+    jpegs = [cv2.imencode(".jpg", f)[1].tobytes() for f in faces]
+    before = client.health()
+
+    def one(i):
+        t = time.perf_counter()
+        if args.endpoint == "faces":
+            client.predict_faces(faces[i % len(faces)][None])
+        else:
+            client.analyze(jpegs[i % len(jpegs)], cropped=True)
+        return time.perf_counter() - t
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        latencies = np.array(list(pool.map(one, range(args.requests))))
+    elapsed = time.perf_counter() - start
+
+    after = client.health()
+    batches = after["batches"] - before["batches"]
+    batched = after["faces"] - before["faces"]
+    print(f"📊 {args.requests} requests, concurrency {args.concurrency}: "
+          f"{args.requests / elapsed:.0f} req/s, "
+          f"p50 {np.percentile(latencies, 50) * 1e3:.1f} ms, p95 {np.percentile(latencies, 95) * 1e3:.1f} ms, "
+          f"mean batch {batched / max(batches, 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
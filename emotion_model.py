@@ -0,0 +1,76 @@
+# emotion_model.py
+#
+# The emotion CNN architecture, shared by train_model.py, the training
+# benchmarks and hparam_sweep.py so every mode trains exactly the same
+# network. The defaults are the shipped model; the sweep varies them.
+
+from tensorflow.keras import layers, models
+
+INPUT_SHAPE = (48, 48, 1)
+NUM_CLASSES = 4
+DEFAULT_FILTERS = (32, 64, 128)
+
+
+def build_emotion_cnn(num_classes=NUM_CLASSES, input_shape=INPUT_SHAPE, filters=DEFAULT_FILTERS,
+                      dropout=0.25, dense_units=256, dense_dropout=0.5):
+    """
+    Returns the (uncompiled) CNN: one conv / batch-norm / pool / dropout
+    block per entry of filters, then a dense layer. The softmax is always
+    computed in float32 so the model stays numerically safe under a mixed
+    precision policy.
+    """
+    stack = [layers.Input(shape=input_shape)]
+    for n in filters:
+        stack += [
+            layers.Conv2D(n, (3, 3), activation='relu', padding='same'),
+            layers.BatchNormalization(),
+            layers.MaxPooling2D(2, 2),
+            layers.Dropout(dropout),
+        ]
+
+    stack += [
+        layers.Flatten(),
+        layers.Dense(dense_units, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(dense_dropout),
+
+        layers.Dense(num_classes, activation='softmax', dtype='float32')
+    ]
+    return models.Sequential(stack)
+
+
+def build_student_cnn(num_classes=NUM_CLASSES, input_shape=INPUT_SHAPE, filters=(32, 64, 128),
+                      dropout=0.3, logits=False):
+    """
+    Returns the lightweight student for distill_model.py: a plain 3x3
+    stem (depthwise on one channel would be pointless), then
+    depthwise-separable conv blocks and global average pooling instead of
+    a dense layer over the flattened feature map.
+    logits=True leaves out the final softmax (used while distilling).
+    """
+    stack = [
+        layers.Input(shape=input_shape),
+        layers.Conv2D(filters[0], (3, 3), padding='same', use_bias=False),
+        layers.BatchNormalization(),
+        layers.ReLU(),
+        layers.MaxPooling2D(2, 2),
+    ]
+    for n in filters[1:]:
+        stack += [
+            layers.SeparableConv2D(n, (3, 3), padding='same', use_bias=False),
+            layers.BatchNormalization(),
+            layers.ReLU(),
+            layers.MaxPooling2D(2, 2),
+        ]
+
+    stack += [
+        layers.SeparableConv2D(filters[-1], (3, 3), padding='same', use_bias=False),
+        layers.BatchNormalization(),
+        layers.ReLU(),
+        layers.GlobalAveragePooling2D(),
+        layers.Dropout(dropout),
+        layers.Dense(num_classes, dtype='float32'),
+    ]
+    if not logits:
+        stack.append(layers.Activation('softmax', dtype='float32'))
+    return models.Sequential(stack)
@@ -0,0 +1,355 @@
+# emotion_predictor.py
+#
+# Shared face → emotion inference used by app.py, app_ui.py and
+# realtime_emotion_music.py.
+#
+# The model file picks the runtime:
+#   *.h5 / *.keras  -> Keras (TensorFlow)
+#   *.tflite        -> tflite-runtime (falls back to tf.lite)
+#   *.onnx          -> onnxruntime
+#   SavedModel dir  -> TensorFlow (tf.saved_model, no Keras graph rebuild)
+#   *.flat          -> NumPy on memory-mapped weights (flat_model.py)
+# Set EMOTION_MODEL to serve an exported model (see export_model.py) and
+# FACE_DETECTOR to pick a face-detector backend (see face_detectors.py).
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from face_detectors import FACE_DETECTOR, make_detector
+from metrics import NULL_METRICS
+
+MODEL_PATH = os.environ.get("EMOTION_MODEL", "emotion_music_model.h5")
+LABELS = ['Angry', 'Happy', 'Neutral', 'Sad']
+FACE_SIZE = (48, 48)
+INPUT_SHAPE = (FACE_SIZE[0], FACE_SIZE[1], 1)
+
+
+def crop_face(gray, box):
+    """
+    Returns the ROI of a face box (x, y, w, h), clipped to the frame so
+    boxes reaching past an edge never give an empty crop
+    """
+    frame_h, frame_w = gray.shape[:2]
+    x, y, w, h = (int(v) for v in box)
+    x0, y0 = min(max(x, 0), frame_w - 1), min(max(y, 0), frame_h - 1)
+    x1, y1 = min(max(x + w, x0 + 1), frame_w), min(max(y + h, y0 + 1), frame_h)
+    return gray[y0:y1, x0:x1]
+
+
+def preprocess_faces(gray, boxes):
+    """
+    Crops, resizes and normalizes face boxes from a grayscale frame.
+    Returns a (N, 48, 48, 1) float32 batch
+    """
+    batch = np.empty((len(boxes),) + INPUT_SHAPE, dtype="float32")
+    for i, box in enumerate(boxes):
+        batch[i, :, :, 0] = cv2.resize(crop_face(gray, box), FACE_SIZE)
+    batch *= 1.0 / 255.0
+    return batch
+
+
+def top_emotion(probs):
+    """
+    Returns (label, confidence) for one probability vector
+    """
+    idx = int(np.argmax(probs))
+    return LABELS[idx], float(probs[idx])
+
+
+# ==========================
+# INFERENCE BACKENDS
+# ==========================
+# Every backend takes a (N, 48, 48, 1) float32 batch in [0, 1]
+# and returns (N, 4) float32 probabilities.
+
+class KerasBackend:
+    """
+    Runs the Keras model through a tf.function with a fixed
+    (None, 48, 48, 1) float32 signature, so it is traced once and later
+    calls skip model.predict's data adapter and batching machinery.
+    """
+
+    name = "keras"
+
+    def __init__(self, model_path=None, model=None, num_threads=None):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+                tf.config.threading.set_inter_op_parallelism_threads(1)
+            except RuntimeError:
+                # TensorFlow was already initialized in this process
+                pass
+
+        self.model = model if model is not None else load_model(model_path, compile=False)
+        self._infer = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32)]
+        )
+
+    def predict(self, batch):
+        return self._infer(batch).numpy()
+
+
+def _tflite_interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """
+    Runs a .tflite export (float32, dynamic-range or full int8).
+    Quantized inputs/outputs are converted using the tensor's own
+    scale and zero point.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=None):
+        Interpreter = _tflite_interpreter_class()
+        self.interpreter = Interpreter(
+            model_path=model_path,
+            num_threads=num_threads or os.cpu_count()
+        )
+        self.interpreter.allocate_tensors()
+
+        inp = self.interpreter.get_input_details()[0]
+        out = self.interpreter.get_output_details()[0]
+        self._input_index = inp["index"]
+        self._input_dtype = inp["dtype"]
+        self._input_quant = inp["quantization"]
+        self._output_index = out["index"]
+        self._output_quant = out["quantization"]
+        self._batch_size = int(inp["shape"][0])
+
+        # The interpreter keeps per-call state, so calls are serialized
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input_index, (len(batch),) + INPUT_SHAPE)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+
+            x = batch
+            if np.issubdtype(self._input_dtype, np.integer):
+                scale, zero_point = self._input_quant
+                info = np.iinfo(self._input_dtype)
+                x = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+            self.interpreter.set_tensor(self._input_index, x.astype(self._input_dtype))
+            self.interpreter.invoke()
+            y = self.interpreter.get_tensor(self._output_index)
+
+        if np.issubdtype(y.dtype, np.integer):
+            scale, zero_point = self._output_quant
+            y = (y.astype("float32") - zero_point) * scale
+        return y.astype("float32", copy=False)
+
+
+class OnnxBackend:
+    """
+    Runs an .onnx export with onnxruntime on the CPU.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count()
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+class SavedModelBackend:
+    """
+    Runs a SavedModel export through its serving signature. Loading skips
+    HDF5 parsing and rebuilding the Keras layers.
+    """
+
+    name = "savedmodel"
+
+    def __init__(self, model_path, num_threads=None):
+        import tensorflow as tf
+
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+                tf.config.threading.set_inter_op_parallelism_threads(1)
+            except RuntimeError:
+                pass
+
+        self._loaded = tf.saved_model.load(model_path)
+        self._serve = self._loaded.signatures["serving_default"]
+        self._input_name = next(iter(self._serve.structured_input_signature[1]))
+
+    def predict(self, batch):
+        outputs = self._serve(**{self._input_name: batch})
+        return next(iter(outputs.values())).numpy()
+
+
+class FlatBackend:
+    """
+    Runs a .flat export with NumPy straight from the memory-mapped file:
+    no TensorFlow import, and processes on one host share the weights
+    through the page cache.
+    """
+
+    name = "flat"
+
+    def __init__(self, model_path, num_threads=None):
+        from flat_model import FlatModel
+
+        self.model = FlatModel(model_path)
+
+    def predict(self, batch):
+        return self.model.predict(batch)
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+    "savedmodel": SavedModelBackend,
+    "flat": FlatBackend,
+}
+
+
+def backend_for_path(model_path):
+    """
+    Returns the backend name that serves a model file
+    """
+    ext = os.path.splitext(model_path)[1].lower()
+    if ext == ".tflite":
+        return "tflite"
+    if ext == ".onnx":
+        return "onnx"
+    if ext == ".flat":
+        return "flat"
+    if os.path.isdir(model_path) and os.path.exists(os.path.join(model_path, "saved_model.pb")):
+        return "savedmodel"
+    return "keras"
+
+
+def import_runtime(model_path, backend=None):
+    """
+    Imports the inference runtime a model file needs (TensorFlow,
+    tflite-runtime, onnxruntime or the NumPy flat runtime) without
+    loading the model
+    """
+    name = backend or backend_for_path(model_path)
+    if name in ("keras", "savedmodel"):
+        import tensorflow  # noqa: F401
+    elif name == "tflite":
+        _tflite_interpreter_class()
+    elif name == "onnx":
+        import onnxruntime  # noqa: F401
+    elif name == "flat":
+        import flat_model  # noqa: F401
+
+
+def load_backend(model_path, backend=None, num_threads=None):
+    """
+    Loads a model file with the requested (or extension-implied) backend
+    """
+    name = backend or backend_for_path(model_path)
+    if name not in BACKENDS:
+        raise ValueError(f"❌ Unknown inference backend: {name}")
+    return BACKENDS[name](model_path, num_threads=num_threads)
+
+
+class EmotionPredictor:
+    """
+    Loads the emotion model once and serves low-latency predictions
+    through one of the inference backends. The backend is warmed up at
+    load time so the first real frame is not slow.
+
+    detector is a face_detectors backend name or instance (default:
+    FACE_DETECTOR); detector_kwargs (model path, thresholds, ...) are
+    passed to make_detector and kept for building per-thread copies.
+    metrics, if given, is a metrics.Metrics that receives "decode",
+    "detection" and "inference" stage timings.
+    num_threads caps the backend's CPU threads (default: all cores).
+    warmup=False skips the dummy batch (call warmup() yourself, e.g. to
+    time it separately; see model_loader.py).
+    """
+
+    def __init__(self, model_path=MODEL_PATH, model=None, backend=None, detector=FACE_DETECTOR,
+                 metrics=None, num_threads=None, warmup=True, detector_kwargs=None):
+        self.metrics = metrics or NULL_METRICS
+
+        if model is not None:
+            self.backend = KerasBackend(model=model)
+        else:
+            self.backend = load_backend(model_path, backend, num_threads)
+
+        if isinstance(detector, str):
+            detector = make_detector(detector, **(detector_kwargs or {}))
+        self.detector = detector
+        self.detector_kwargs = dict(detector_kwargs or getattr(detector, "options", {}))
+
+        if warmup:
+            self.warmup()
+
+    def warmup(self):
+        """
+        Runs one dummy batch (traces the graph / allocates tensors)
+        """
+        self.predict_batch(np.zeros((1,) + INPUT_SHAPE, dtype="float32"))
+
+    def predict_batch(self, batch):
+        """
+        Classifies a preprocessed (N, 48, 48, 1) batch.
+        Returns a (N, 4) array of probabilities
+        """
+        if len(batch) == 0:
+            return np.empty((0, len(LABELS)), dtype="float32")
+        return self.backend.predict(batch)
+
+    def detect_faces(self, image):
+        """
+        Returns face boxes (x, y, w, h) for a grayscale or BGR frame
+        """
+        with self.metrics.timer("detection"):
+            return self.detector.detect(image)
+
+    def predict_faces(self, gray_frame, boxes):
+        """
+        Classifies every face box of a grayscale frame in one call.
+        Returns a (N, 4) array of probabilities, aligned with boxes
+        """
+        if len(boxes) == 0:
+            return np.empty((0, len(LABELS)), dtype="float32")
+        with self.metrics.timer("inference"):
+            return self.predict_batch(preprocess_faces(gray_frame, boxes))
+
+    def predict_image(self, image_bytes):
+        """
+        Decodes encoded image bytes (JPEG/PNG), detects faces and
+        classifies them.
+        Returns (boxes, probs); both are empty when no face is found
+        """
+        with self.metrics.timer("decode"):
+            frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("❌ Could not decode image bytes")
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        boxes = self.detect_faces(gray)
+        return boxes, self.predict_faces(gray, boxes)
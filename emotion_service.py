@@ -0,0 +1,349 @@
+# emotion_service.py
+#
+# Standalone async HTTP inference service. Loads the emotion model once
+# and serves every front end (app.py / app_ui.py via emotion_client.py,
+# scripts, curl). Concurrent requests are queued into micro-batches: the
+# batcher takes whatever faces are waiting, waits at most --max-wait-ms
+# for more (up to --max-batch faces) and runs one inference call for all
+# of them, so throughput grows with load instead of serializing on one
+# batch-size-1 predict per request.
+#
+#   POST /predict            encoded image (JPEG/PNG) -> detect + classify
+#   POST /predict?cropped=1  encoded image that is already one face crop
+#   POST /faces              raw uint8 48x48 grayscale faces (N * 2304 bytes)
+#   GET  /health             readiness + batching stats
+#   GET  /metrics            Prometheus text (see metrics.py)
+#
+# Responses are JSON:
+#   {"faces": [{"box": [x, y, w, h], "emotion": "Happy", "confidence": 0.93,
+#               "probabilities": {"Angry": ..., ...}}, ...],
+#    "recommendation": {...get_music_recommendation() of the first face...} | null}
+#
+#   python emotion_service.py --port 8765 --max-batch 64 --max-wait-ms 5
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from emotion_predictor import (FACE_SIZE, INPUT_SHAPE, LABELS, MODEL_PATH, EmotionPredictor,
+                               preprocess_faces, top_emotion)
+from face_detectors import make_detector
+from metrics import Metrics
+from music_mapper import get_music_recommendation
+
+SERVICE_HOST = os.environ.get("EMOTION_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("EMOTION_SERVICE_PORT", "8765"))
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+FACE_BYTES = FACE_SIZE[0] * FACE_SIZE[1]
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ==========================
+# MICRO-BATCHER
+# ==========================
+
+class MicroBatcher:
+    """
+    Collects face batches submitted by concurrent requests and classifies
+    them together with one predict_fn call. A batch is dispatched when
+    max_batch faces are waiting or max_wait_ms has passed since the first
+    one arrived; requests that arrive during an inference call form the
+    next batch.
+    """
+
+    def __init__(self, predict_fn, max_batch=64, max_wait_ms=5.0, executor=None, metrics=None):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self.executor = executor
+        self.metrics = metrics
+        self.batches = 0
+        self.faces = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, faces):
+        """
+        Queues a (N, 48, 48, 1) float32 batch and returns its (N, 4) probabilities
+        """
+        if len(faces) == 0:
+            return np.empty((0, len(LABELS)), dtype="float32")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((faces, future))
+        return await future
+
+    async def _collect(self):
+        items = [await self._queue.get()]
+        count = len(items[0][0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while count < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            items.append(item)
+            count += len(item[0])
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            batch = np.concatenate([faces for faces, _ in items])
+            try:
+                probs = await loop.run_in_executor(self.executor, self.predict_fn, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.faces += len(batch)
+            if self.metrics is not None:
+                self.metrics.inc("batches")
+                self.metrics.inc("batched_faces", len(batch))
+                self.metrics.set_gauge("mean_batch_size", self.faces / self.batches)
+
+            offset = 0
+            for faces, future in items:
+                if not future.done():
+                    future.set_result(probs[offset:offset + len(faces)])
+                offset += len(faces)
+
+
+# ==========================
+# REQUEST HANDLING
+# ==========================
+
+def _face_entries(boxes, probs):
+    faces = []
+    for box, p in zip(boxes, probs):
+        emotion, confidence = top_emotion(p)
+        faces.append({
+            "box": [int(v) for v in box],
+            "emotion": emotion,
+            "confidence": confidence,
+            "probabilities": {label: float(v) for label, v in zip(LABELS, p)},
+        })
+    return faces
+
+
+def _response_payload(boxes, probs):
+    faces = _face_entries(boxes, probs)
+    recommendation = get_music_recommendation(faces[0]["emotion"], probs[0]) if faces else None
+    return {"faces": faces, "recommendation": recommendation}
+
+
+class EmotionService:
+    """
+    Wires HTTP requests to the predictor's decode/detect stage (run on a
+    thread pool, OpenCV releases the GIL) and the shared MicroBatcher.
+    Each decode thread gets its own detector instance, since cv2.dnn nets
+    and cascades are not safe to share between threads.
+    """
+
+    def __init__(self, predictor, max_batch=64, max_wait_ms=5.0, workers=None):
+        self.predictor = predictor
+        self.metrics = predictor.metrics
+        # Decode + detection run in parallel; inference gets its own thread
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count(),
+                                        thread_name_prefix="decode")
+        self._infer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer")
+        self.batcher = MicroBatcher(predictor.predict_batch, max_batch, max_wait_ms,
+                                    executor=self._infer_pool, metrics=self.metrics)
+        self._local = threading.local()
+
+    def _detector(self):
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            # Same backend and parameters as the predictor's own detector
+            detector = self._local.detector = make_detector(
+                self.predictor.detector.name, **self.predictor.detector_kwargs
+            )
+        return detector
+
+    def _prepare_image(self, image_bytes, cropped):
+        frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if frame is None:
+            raise HTTPError(400, "Could not decode image")
+        if cropped:
+            boxes = np.array([[0, 0, frame.shape[1], frame.shape[0]]], dtype=np.int32)
+        else:
+            with self.metrics.timer("detection"):
+                boxes = self._detector().detect(frame)
+        return boxes, preprocess_faces(frame, boxes)
+
+    async def predict_image(self, image_bytes, cropped=False):
+        loop = asyncio.get_running_loop()
+        boxes, faces = await loop.run_in_executor(self._pool, self._prepare_image, image_bytes, cropped)
+        probs = await self.batcher.submit(faces)
+        return _response_payload(boxes, probs)
+
+    async def predict_faces(self, raw):
+        if len(raw) == 0 or len(raw) % FACE_BYTES:
+            raise HTTPError(400, f"Body must be N * {FACE_BYTES} bytes of 48x48 uint8 faces")
+        faces = np.frombuffer(raw, np.uint8).reshape((-1,) + INPUT_SHAPE).astype("float32")
+        faces *= 1.0 / 255.0
+        probs = await self.batcher.submit(faces)
+        boxes = [[0, 0, FACE_SIZE[0], FACE_SIZE[1]]] * len(faces)
+        return _response_payload(boxes, probs)
+
+    def health(self):
+        return {
+            "status": "ok",
+            "backend": self.predictor.backend.name,
+            "batches": self.batcher.batches,
+            "faces": self.batcher.faces,
+            "mean_batch_size": self.batcher.faces / max(self.batcher.batches, 1),
+        }
+
+    async def route(self, method, target, body):
+        """
+        Returns (status, content_type, body_bytes)
+        """
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+
+        if method == "GET" and url.path == "/health":
+            return 200, "application/json", json.dumps(self.health()).encode("utf-8")
+        if method == "GET" and url.path == "/metrics":
+            return 200, "text/plain; version=0.0.4", self.metrics.prometheus_text().encode("utf-8")
+
+        if method == "POST" and url.path == "/predict":
+            cropped = query.get("cropped", ["0"])[0] in ("1", "true")
+            with self.metrics.timer("request"):
+                payload = await self.predict_image(body, cropped)
+        elif method == "POST" and url.path == "/faces":
+            with self.metrics.timer("request"):
+                payload = await self.predict_faces(body)
+        else:
+            raise HTTPError(404, f"No route for {method} {url.path}")
+
+        self.metrics.inc("requests")
+        return 200, "application/json", json.dumps(payload).encode("utf-8")
+
+    async def handle_connection(self, reader, writer):
+        """
+        Minimal HTTP/1.1 with keep-alive: one request at a time per connection
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    length = int(headers.get("content-length", "0"))
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    status, content_type, payload = await self.route(method, target, body)
+                except HTTPError as e:
+                    self.metrics.inc("request_errors")
+                    status, content_type = e.status, "application/json"
+                    payload = json.dumps({"error": str(e)}).encode("utf-8")
+                    keep_alive = keep_alive and e.status != 413
+                except Exception as e:
+                    self.metrics.inc("request_errors")
+                    status, content_type = 500, "application/json"
+                    payload = json.dumps({"error": str(e)}).encode("utf-8")
+
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"✅ Emotion service ({self.predictor.backend.name}) on http://{host}:{port} "
+              f"(max batch {self.batcher.max_batch}, max wait {self.batcher.max_wait * 1e3:.1f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching HTTP emotion inference service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--detector", default=None, help="Face detector backend (default: FACE_DETECTOR)")
+    parser.add_argument("--max-batch", type=int, default=64, help="Max faces per inference call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Max time the first queued face waits for others")
+    parser.add_argument("--workers", type=int, default=None, help="Decode/detection threads")
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    kwargs = {"detector": args.detector} if args.detector else {}
+    predictor = EmotionPredictor(args.model, metrics=metrics, **kwargs)
+    service = EmotionService(predictor, args.max_batch, args.max_wait_ms, args.workers)
+
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("🛑 Service stopped")
+
+
+if __name__ == "__main__":
+    main()
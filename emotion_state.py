@@ -0,0 +1,160 @@
+# emotion_state.py
+#
+# Per-face emotion state for the realtime loop. Faces are kept as tracks
+# by greedy IoU matching between consecutive results; every track holds
+# an exponential moving average of its probability vectors, the time
+# since its smoothed emotion last changed and whether it already
+# triggered music. All track state lives in parallel NumPy arrays, so one
+# update is a handful of vectorized operations however many faces are in
+# view.
+#
+#   tracker = EmotionStateTracker(stable_time=3.0)
+#   faces, triggered = tracker.update(result.boxes, result.probs, result.timestamp)
+#   for face in triggered:
+#       play_async(get_music_recommendation(face.emotion, face.probs)["keywords"][0])
+
+from collections import namedtuple
+
+import numpy as np
+
+from emotion_predictor import LABELS
+
+FaceState = namedtuple("FaceState", ["track_id", "box", "emotion", "confidence", "probs", "stable_for"])
+
+
+def pairwise_iou(a, b):
+    """
+    IoU matrix between (M, 4) and (N, 4) boxes as (x, y, w, h)
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(1, -1, 4)
+    x1 = np.maximum(a[..., 0], b[..., 0])
+    y1 = np.maximum(a[..., 1], b[..., 1])
+    x2 = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2])
+    y2 = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def greedy_match(iou, threshold):
+    """
+    Pairs rows with columns by descending IoU (each used once).
+    Returns (rows, cols) index arrays
+    """
+    rows, cols = np.nonzero(iou >= threshold)
+    if len(rows) == 0:
+        return rows, cols
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_r = np.zeros(iou.shape[0], dtype=bool)
+    used_c = np.zeros(iou.shape[1], dtype=bool)
+    keep = []
+    for k in order:
+        r, c = rows[k], cols[k]
+        if not used_r[r] and not used_c[c]:
+            used_r[r] = used_c[c] = True
+            keep.append(k)
+    keep = np.array(keep, dtype=np.intp)
+    return rows[keep], cols[keep]
+
+
+class EmotionStateTracker:
+    """
+    Smoothed, per-face emotion stability.
+
+    alpha          EMA weight of the newest probabilities
+    stable_time    seconds a smoothed emotion must hold before it triggers
+    min_confidence smoothed confidence needed to count as stable
+    iou_threshold  minimum IoU to continue a track
+    max_missed     results a track may go unmatched before it is dropped
+    """
+
+    def __init__(self, alpha=0.3, stable_time=3.0, min_confidence=0.5, iou_threshold=0.3, max_missed=5):
+        self.alpha = alpha
+        self.stable_time = stable_time
+        self.min_confidence = min_confidence
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self._next_id = 0
+
+        n = len(LABELS)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.int32)
+        self.ema = np.empty((0, n), dtype=np.float32)
+        self.label = np.empty(0, dtype=np.int64)
+        self.stable_since = np.empty(0, dtype=np.float64)
+        self.triggered = np.empty(0, dtype=bool)
+        self.missed = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _keep(self, mask):
+        for name in ("ids", "boxes", "ema", "label", "stable_since", "triggered", "missed"):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def update(self, boxes, probs, timestamp):
+        """
+        Folds one inference result into the tracks.
+        Returns (faces, triggered): a FaceState per input box (same order)
+        and the FaceStates whose emotion just became stable
+        """
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        probs = np.asarray(probs, dtype=np.float32).reshape(len(boxes), len(LABELS))
+
+        # 1. Match detections to existing tracks
+        track_idx = np.full(len(boxes), -1, dtype=np.intp)
+        if len(self) and len(boxes):
+            rows, cols = greedy_match(pairwise_iou(self.boxes, boxes), self.iou_threshold)
+            track_idx[cols] = rows
+
+        # 2. Age unmatched tracks, drop the lost ones
+        matched = np.zeros(len(self), dtype=bool)
+        matched[track_idx[track_idx >= 0]] = True
+        self.missed[~matched] += 1
+        self.missed[matched] = 0
+        keep = self.missed <= self.max_missed
+        if not keep.all():
+            remap = np.cumsum(keep) - 1
+            track_idx[track_idx >= 0] = remap[track_idx[track_idx >= 0]]
+            self._keep(keep)
+
+        # 3. Start tracks for unmatched detections
+        new = track_idx < 0
+        if new.any():
+            count = int(new.sum())
+            track_idx[new] = len(self) + np.arange(count)
+            self.ids = np.concatenate([self.ids, self._next_id + np.arange(count)])
+            self._next_id += count
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.ema = np.concatenate([self.ema, probs[new]])
+            self.label = np.concatenate([self.label, np.argmax(probs[new], axis=1)])
+            self.stable_since = np.concatenate([self.stable_since, np.full(count, timestamp)])
+            self.triggered = np.concatenate([self.triggered, np.zeros(count, dtype=bool)])
+            self.missed = np.concatenate([self.missed, np.zeros(count, dtype=np.int32)])
+
+        # 4. One vectorized EMA / stability step for all matched tracks
+        old = track_idx[~new]
+        if len(old):
+            self.ema[old] += self.alpha * (probs[~new] - self.ema[old])
+        self.boxes[track_idx] = boxes
+
+        label = np.argmax(self.ema[track_idx], axis=1)
+        confidence = self.ema[track_idx, label]
+        changed = (label != self.label[track_idx]) | (confidence < self.min_confidence)
+        reset = track_idx[changed]
+        self.label[track_idx] = label
+        self.stable_since[reset] = timestamp
+        self.triggered[reset] = False
+
+        stable_for = timestamp - self.stable_since[track_idx]
+        fire = (~self.triggered[track_idx]) & (stable_for >= self.stable_time) \
+            & (confidence >= self.min_confidence)
+        self.triggered[track_idx[fire]] = True
+
+        faces = [
+            FaceState(int(self.ids[t]), boxes[i], LABELS[label[i]], float(confidence[i]),
+                      self.ema[t].copy(), float(stable_for[i]))
+            for i, t in enumerate(track_idx)
+        ]
+        return faces, [face for face, f in zip(faces, fire) if f]
@@ -0,0 +1,305 @@
+# evaluate_model.py
+#
+# Streaming evaluation of one or more models on a labelled image tree
+# (Dataset/test by default: <split>/<class>/*.jpg):
+#   - files are processed in fixed-size chunks, so memory stays flat
+#     however large the test set is; a thread pool reads / hashes /
+#     decodes the next chunk while the current one is being classified
+#   - per-image probability vectors are cached in SQLite, keyed by a hash
+#     of the model file(s) and a hash of the image bytes, so re-evaluating
+#     a model (or comparing it with another one) only runs inference on
+#     images it has not seen
+#   - reports accuracy, the confusion matrix, per-class precision / recall
+#     / F1, expected calibration error and images/sec
+#
+# Any backend emotion_predictor can load works (.h5, .tflite, .onnx,
+# SavedModel, .flat).
+#
+#   python evaluate_model.py
+#   python evaluate_model.py --models emotion_music_model.h5 emotion_student.h5 --json eval.json
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from dataset_pack import IMG_SIZE, list_split_files
+from emotion_predictor import INPUT_SHAPE, MODEL_PATH, load_backend
+from result_cache import image_key
+
+CACHE_PATH = os.environ.get("EVAL_CACHE", "eval_cache.sqlite")
+ECE_BINS = 15
+
+
+# ==========================
+# PREDICTION CACHE
+# ==========================
+
+def model_key(model_path):
+    """
+    Content hash of a model file, or of every file in a SavedModel dir
+    """
+    h = hashlib.blake2b(digest_size=16)
+    if os.path.isdir(model_path):
+        paths = sorted(
+            os.path.join(root, f) for root, _, files in os.walk(model_path) for f in files
+        )
+    else:
+        paths = [model_path]
+    for path in paths:
+        h.update(os.path.relpath(path, model_path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """
+    SQLite table of float32 probability vectors keyed by
+    (model hash, image hash)
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "model TEXT NOT NULL, image TEXT NOT NULL, probs BLOB NOT NULL, "
+            "PRIMARY KEY (model, image))"
+        )
+
+    def get_many(self, model, images):
+        """
+        Returns {image hash: probs} for the cached ones
+        """
+        found = {}
+        # SQLite caps the number of bound parameters per statement
+        for start in range(0, len(images), 500):
+            part = images[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT image, probs FROM predictions WHERE model = ? "
+                f"AND image IN ({','.join('?' * len(part))})",
+                [model] + part
+            )
+            for image, blob in rows:
+                found[image] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO predictions (model, image, probs) VALUES (?, ?, ?)",
+            [(model, image, np.asarray(probs, dtype=np.float32).tobytes()) for image, probs in items]
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+# ==========================
+# STREAMING METRICS
+# ==========================
+
+class EvaluationStats:
+    """
+    Confusion matrix and calibration bins, updated batch by batch
+    """
+
+    def __init__(self, num_classes, bins=ECE_BINS):
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.bin_count = np.zeros(bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(bins)
+        self.bin_correct = np.zeros(bins)
+
+    def update(self, labels, probs):
+        predicted = np.argmax(probs, axis=1)
+        np.add.at(self.confusion, (labels, predicted), 1)
+
+        confidence = probs[np.arange(len(probs)), predicted]
+        bins = np.minimum((confidence * len(self.bin_count)).astype(int), len(self.bin_count) - 1)
+        np.add.at(self.bin_count, bins, 1)
+        np.add.at(self.bin_confidence, bins, confidence)
+        np.add.at(self.bin_correct, bins, predicted == labels)
+
+    def report(self, class_names):
+        total = int(self.confusion.sum())
+        tp = np.diag(self.confusion).astype(float)
+        precision = tp / np.maximum(self.confusion.sum(axis=0), 1)
+        recall = tp / np.maximum(self.confusion.sum(axis=1), 1)
+        f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+        # ECE: |accuracy - confidence| per bin, weighted by the bin's share
+        filled = self.bin_count > 0
+        gaps = np.abs(self.bin_correct[filled] - self.bin_confidence[filled]) / self.bin_count[filled]
+        ece = float(np.sum(gaps * self.bin_count[filled]) / max(total, 1))
+        return {
+            "images": total,
+            "accuracy": float(tp.sum() / max(total, 1)),
+            "confusion_matrix": self.confusion.tolist(),
+            "per_class": {
+                name: {"precision": float(precision[i]), "recall": float(recall[i]), "f1": float(f1[i]),
+                       "support": int(self.confusion[i].sum())}
+                for i, name in enumerate(class_names)
+            },
+            "macro_f1": float(f1.mean()),
+            "ece": ece,
+        }
+
+
+# ==========================
+# EVALUATION
+# ==========================
+
+def _read(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return image_key(data), data
+
+
+def _decode(data):
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    if image.shape != IMG_SIZE:
+        image = cv2.resize(image, IMG_SIZE[::-1], interpolation=cv2.INTER_AREA)
+    return image
+
+
+def evaluate(model_path, split_dir, cache=None, chunk_size=2048, batch_size=256, workers=None):
+    """
+    Streams split_dir through the model. Returns the report dict
+    """
+    class_indices, entries = list_split_files(split_dir)
+    class_names = sorted(class_indices, key=class_indices.get)
+    stats = EvaluationStats(len(class_names))
+    key = model_key(model_path)
+    backend = None
+    counters = {"cached": 0, "inferred": 0, "unreadable": 0, "inference_s": 0.0}
+
+    def load_chunk(chunk, pool):
+        return list(pool.map(_read, [os.path.join(split_dir, e[0]) for e in chunk]))
+
+    start = time.perf_counter()
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool, \
+            ThreadPoolExecutor(max_workers=1) as prefetch:
+        pending = prefetch.submit(load_chunk, chunks[0], pool) if chunks else None
+        for n, chunk in enumerate(chunks):
+            files = pending.result()
+            # Read / hash the next chunk while this one is classified
+            pending = prefetch.submit(load_chunk, chunks[n + 1], pool) if n + 1 < len(chunks) else None
+
+            hashes = [h for h, _ in files]
+            labels = np.array([e[1] for e in chunk], dtype=np.int64)
+            probs = np.zeros((len(chunk), len(class_names)), dtype=np.float32)
+            known = np.zeros(len(chunk), dtype=bool)
+
+            found = cache.get_many(key, hashes) if cache is not None else {}
+            for i, h in enumerate(hashes):
+                if h in found:
+                    probs[i] = found[h]
+                    known[i] = True
+            counters["cached"] += int(known.sum())
+
+            missing = np.flatnonzero(~known)
+            if len(missing):
+                images = list(pool.map(_decode, [files[i][1] for i in missing]))
+                decoded = [i for i, image in zip(missing, images) if image is not None]
+                counters["unreadable"] += len(missing) - len(decoded)
+                if decoded:
+                    if backend is None:
+                        backend = load_backend(model_path)
+                    batch = np.stack([img for img in images if img is not None])
+                    batch = batch.reshape((-1,) + INPUT_SHAPE).astype(np.float32) / 255.0
+                    t = time.perf_counter()
+                    for b in range(0, len(batch), batch_size):
+                        probs[decoded[b:b + batch_size]] = backend.predict(batch[b:b + batch_size])
+                    counters["inference_s"] += time.perf_counter() - t
+                    counters["inferred"] += len(decoded)
+                    known[decoded] = True
+                    if cache is not None:
+                        cache.put_many(key, [(hashes[i], probs[i]) for i in decoded])
+
+            stats.update(labels[known], probs[known])
+
+    elapsed = time.perf_counter() - start
+    report = stats.report(class_names)
+    report.update({
+        "model": model_path,
+        "model_hash": key,
+        "seconds": elapsed,
+        "images_per_sec": report["images"] / max(elapsed, 1e-9),
+        "inference_images_per_sec": counters["inferred"] / counters["inference_s"]
+        if counters["inference_s"] else None,
+        "cached": counters["cached"],
+        "inferred": counters["inferred"],
+        "unreadable": counters["unreadable"],
+    })
+    return report
+
+
+def print_report(report):
+    names = list(report["per_class"])
+    print(f"\n📊 {report['model']}  ({report['images']} images, "
+          f"{report['cached']} cached / {report['inferred']} inferred)")
+    print(f"   accuracy {report['accuracy'] * 100:.2f}%   macro F1 {report['macro_f1']:.3f}   "
+          f"ECE {report['ece']:.4f}   {report['images_per_sec']:.0f} images/sec"
+          + (f" (inference {report['inference_images_per_sec']:.0f})" if report["inference_images_per_sec"] else ""))
+
+    width = max(len(n) for n in names) + 2
+    print("\n   confusion (rows: true, columns: predicted)")
+    print("   " + " " * width + "".join(f"{n[:8]:>9}" for n in names))
+    for name, row in zip(names, report["confusion_matrix"]):
+        print(f"   {name:<{width}}" + "".join(f"{v:>9}" for v in row))
+
+    print(f"\n   {'class':<{width}}{'precision':>10}{'recall':>8}{'F1':>7}{'support':>9}")
+    for name, m in report["per_class"].items():
+        print(f"   {name:<{width}}{m['precision']:>10.3f}{m['recall']:>8.3f}{m['f1']:>7.3f}{m['support']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming evaluation with cached predictions")
+    parser.add_argument("--models", nargs="+", default=[MODEL_PATH])
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--split", default="test")
+    parser.add_argument("--cache", default=CACHE_PATH, help="SQLite prediction cache")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=2048, help="Files held in memory at once")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=None, help="Read / decode threads")
+    parser.add_argument("--json", default=None, help="Also write the reports to this file")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else PredictionCache(args.cache)
+    split_dir = os.path.join(args.dataset_dir, args.split)
+    reports = []
+    try:
+        for model_path in args.models:
+            report = evaluate(model_path, split_dir, cache, args.chunk_size, args.batch_size, args.workers)
+            print_report(report)
+            reports.append(report)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if len(reports) > 1:
+        print(f"\n{'model':<36}{'acc %':>8}{'macro F1':>10}{'ECE':>8}")
+        for r in reports:
+            print(f"{os.path.basename(os.path.normpath(r['model'])):<36}{r['accuracy'] * 100:>8.2f}"
+                  f"{r['macro_f1']:>10.3f}{r['ece']:>8.4f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n💾 Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
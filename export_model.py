@@ -0,0 +1,138 @@
+# export_model.py
+#
+# Exports emotion_music_model.h5 for lightweight CPU runtimes:
+#   exported/emotion_fp32.tflite     float32 TFLite
+#   exported/emotion_dynamic.tflite  dynamic-range quantized weights
+#   exported/emotion_int8.tflite     full int8, calibrated on Dataset/train
+#   exported/emotion.onnx            ONNX (only if tf2onnx is installed)
+#   exported/emotion_savedmodel/     TensorFlow SavedModel (serving signature)
+#   exported/emotion.flat            flat memory-mapped weights (flat_model.py)
+#
+# Serve any of them with EMOTION_MODEL=<path>; compare them with
+# compare_backends.py.
+
+import argparse
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+
+from dataset_pack import decode_image, list_split_files
+from emotion_predictor import INPUT_SHAPE, MODEL_PATH
+from flat_model import export_flat
+
+EXPORT_DIR = "exported"
+FORMATS = ["tflite", "onnx", "savedmodel", "flat"]
+
+
+def calibration_batch(dataset_dir, samples=500, seed=0):
+    """
+    Returns a random (samples, 48, 48, 1) float32 sample of Dataset/train,
+    drawn across all classes, for int8 calibration
+    """
+    train_dir = os.path.join(dataset_dir, "train")
+    _, entries = list_split_files(train_dir)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(entries), size=min(samples, len(entries)), replace=False)
+
+    batch = np.stack([decode_image(os.path.join(train_dir, entries[i][0])) for i in picks])
+    return batch[..., np.newaxis].astype("float32") / 255.0
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    print(f"✅ {path} ({len(data) / 1024:.0f} KB)")
+
+
+def export_tflite(model, out_dir, calibration):
+    """
+    Writes the float32, dynamic-range and full-int8 TFLite models
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    _write(os.path.join(out_dir, "emotion_fp32.tflite"), converter.convert())
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    _write(os.path.join(out_dir, "emotion_dynamic.tflite"), converter.convert())
+
+    def representative_dataset():
+        for i in range(len(calibration)):
+            yield [calibration[i:i + 1]]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    _write(os.path.join(out_dir, "emotion_int8.tflite"), converter.convert())
+
+
+def export_savedmodel(model, out_dir):
+    """
+    Writes emotion_savedmodel/ with a serving_default signature
+    """
+    path = os.path.join(out_dir, "emotion_savedmodel")
+    if hasattr(model, "export"):
+        # Keras 3
+        model.export(path)
+    else:
+        tf.saved_model.save(model, path)
+    print(f"✅ {path}/")
+
+
+def export_flat_model(model, out_dir):
+    """
+    Writes emotion.flat for the memory-mapped NumPy runtime
+    """
+    path = os.path.join(out_dir, "emotion.flat")
+    size = export_flat(model, path)
+    print(f"✅ {path} ({size / 1024:.0f} KB)")
+
+
+def export_onnx(model, out_dir, opset=13):
+    """
+    Writes emotion.onnx; skipped when tf2onnx is not installed
+    """
+    try:
+        import tf2onnx
+    except ImportError:
+        print("⚠️ tf2onnx not installed, skipping ONNX export (pip install tf2onnx)")
+        return
+
+    spec = (tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32, name="input"),)
+    path = os.path.join(out_dir, "emotion.onnx")
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=path)
+    print(f"✅ {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the emotion model to TFLite / ONNX")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--out-dir", default=EXPORT_DIR)
+    parser.add_argument("--calibration-samples", type=int, default=500)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--no-onnx", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    model = load_model(args.model, compile=False)
+
+    if "tflite" in args.formats:
+        calibration = calibration_batch(args.dataset_dir, args.calibration_samples)
+        print(f"📦 Calibrating int8 on {len(calibration)} training images")
+        export_tflite(model, args.out_dir, calibration)
+    if "onnx" in args.formats and not args.no_onnx:
+        export_onnx(model, args.out_dir)
+    if "savedmodel" in args.formats:
+        export_savedmodel(model, args.out_dir)
+    if "flat" in args.formats:
+        export_flat_model(model, args.out_dir)
+
+
+if __name__ == "__main__":
+    main()
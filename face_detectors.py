@@ -0,0 +1,163 @@
+# face_detectors.py
+#
+# Interchangeable face-detector backends. Every detector exposes
+#
+#     detect(gray_or_bgr) -> (N, 4) int32 boxes as (x, y, w, h)
+#
+# Backends:
+#   haar   - OpenCV Haar cascade (bundled with opencv-python, default)
+#   lbp    - LBP cascade           (models/lbpcascade_frontalface_improved.xml)
+#   dnn    - res10 SSD via cv2.dnn (models/deploy.prototxt +
+#                                   models/res10_300x300_ssd_iter_140000.caffemodel)
+#   yunet  - cv2.FaceDetectorYN    (models/face_detection_yunet_2023mar.onnx)
+#
+# The model files for lbp/dnn/yunet are not bundled; download them from the
+# OpenCV repositories into models/.
+
+import os
+
+import cv2
+import numpy as np
+
+MODELS_DIR = "models"
+FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "haar")
+
+
+def _to_gray(image):
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _to_bgr(image):
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+def _as_boxes(boxes):
+    return np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+
+
+def _require(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ Face detector model not found: {path}")
+    return path
+
+
+class CascadeDetector:
+    """
+    Viola-Jones style cascade (Haar or LBP features)
+    """
+
+    name = "cascade"
+
+    def __init__(self, cascade_path, scale_factor=1.3, min_neighbors=5):
+        self.cascade = cv2.CascadeClassifier(_require(cascade_path))
+        if self.cascade.empty():
+            raise ValueError(f"❌ Could not load cascade: {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, image):
+        faces = self.cascade.detectMultiScale(_to_gray(image), self.scale_factor, self.min_neighbors)
+        return _as_boxes(faces)
+
+
+class HaarDetector(CascadeDetector):
+    name = "haar"
+
+    def __init__(self, cascade_path=None, scale_factor=1.3, min_neighbors=5):
+        cascade_path = cascade_path or cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        super().__init__(cascade_path, scale_factor, min_neighbors)
+
+
+class LBPDetector(CascadeDetector):
+    name = "lbp"
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5):
+        cascade_path = cascade_path or os.path.join(MODELS_DIR, "lbpcascade_frontalface_improved.xml")
+        super().__init__(cascade_path, scale_factor, min_neighbors)
+
+
+class DnnSSDDetector:
+    """
+    ResNet-10 SSD face detector (Caffe) run through cv2.dnn
+    """
+
+    name = "dnn"
+
+    def __init__(self, prototxt=None, weights=None, confidence=0.5, input_size=(300, 300)):
+        prototxt = prototxt or os.path.join(MODELS_DIR, "deploy.prototxt")
+        weights = weights or os.path.join(MODELS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+        self.net = cv2.dnn.readNetFromCaffe(_require(prototxt), _require(weights))
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, image):
+        bgr = _to_bgr(image)
+        h, w = bgr.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            cv2.resize(bgr, self.input_size), 1.0, self.input_size, (104.0, 177.0, 123.0)
+        )
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        detections = detections[detections[:, 2] >= self.confidence]
+        corners = detections[:, 3:7] * np.array([w, h, w, h], dtype=np.float32)
+        corners = np.clip(corners, 0, [w - 1, h - 1, w - 1, h - 1])
+        boxes = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+        return _as_boxes(boxes[(boxes[:, 2] > 0) & (boxes[:, 3] > 0)])
+
+
+class YuNetDetector:
+    """
+    YuNet face detector (cv2.FaceDetectorYN, OpenCV >= 4.5.4)
+    """
+
+    name = "yunet"
+
+    def __init__(self, model_path=None, score_threshold=0.6, nms_threshold=0.3):
+        model_path = model_path or os.path.join(MODELS_DIR, "face_detection_yunet_2023mar.onnx")
+        self.detector = cv2.FaceDetectorYN.create(
+            _require(model_path), "", (320, 320), score_threshold, nms_threshold
+        )
+        self._input_size = (320, 320)
+
+    def detect(self, image):
+        bgr = _to_bgr(image)
+        size = (bgr.shape[1], bgr.shape[0])
+        if size != self._input_size:
+            self.detector.setInputSize(size)
+            self._input_size = size
+
+        _, faces = self.detector.detect(bgr)
+        if faces is None:
+            return _as_boxes([])
+        # YuNet boxes can start left of / above the frame for faces at the edge
+        w, h = size
+        corners = np.column_stack([faces[:, :2], faces[:, :2] + faces[:, 2:4]])
+        corners = np.clip(np.round(corners), 0, [w - 1, h - 1, w - 1, h - 1])
+        boxes = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+        return _as_boxes(boxes[(boxes[:, 2] > 0) & (boxes[:, 3] > 0)])
+
+
+DETECTORS = {
+    "haar": HaarDetector,
+    "lbp": LBPDetector,
+    "dnn": DnnSSDDetector,
+    "yunet": YuNetDetector,
+}
+
+
+def make_detector(name=FACE_DETECTOR, **kwargs):
+    """
+    Builds a face detector by backend name. The kwargs are kept on the
+    detector as .options, so callers can build identical copies
+    (e.g. one per thread)
+    """
+    if name not in DETECTORS:
+        raise ValueError(f"❌ Unknown face detector: {name} (choose from {', '.join(DETECTORS)})")
+    detector = DETECTORS[name](**kwargs)
+    detector.options = dict(kwargs)
+    return detector
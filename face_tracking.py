@@ -0,0 +1,171 @@
+# face_tracking.py
+#
+# Detect-then-track face source for the realtime loop.
+#
+# Full face detection runs on a downscaled frame every `detect_interval`
+# frames (or as soon as a track is lost). In between, boxes are followed
+# with a cheap tracker and scaled back to full resolution for the ROI crop.
+
+import cv2
+import numpy as np
+
+_LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+)
+
+
+def _opencv_tracker_factory(name):
+    """
+    Returns a constructor for an OpenCV object tracker, or None when the
+    installed OpenCV build does not ship it (KCF/MOSSE need opencv-contrib)
+    """
+    candidates = {
+        "kcf": ["TrackerKCF_create", "legacy.TrackerKCF_create"],
+        "mosse": ["legacy.TrackerMOSSE_create", "TrackerMOSSE_create"],
+    }[name]
+    for attr in candidates:
+        obj = cv2
+        for part in attr.split("."):
+            obj = getattr(obj, part, None)
+            if obj is None:
+                break
+        if obj is not None:
+            return obj
+    return None
+
+
+class _FlowTrack:
+    """
+    Follows one box with pyramidal Lucas-Kanade optical flow on a
+    handful of corner features inside it.
+    """
+
+    def __init__(self, gray, box, min_points):
+        self.box = np.asarray(box, dtype=np.float32)
+        self.min_points = min_points
+        x, y, w, h = self.box.astype(int)
+        mask = np.zeros_like(gray)
+        mask[y:y+h, x:x+w] = 255
+        self.points = cv2.goodFeaturesToTrack(
+            gray, maxCorners=40, qualityLevel=0.01, minDistance=3, mask=mask
+        )
+
+    def update(self, prev_gray, gray):
+        if self.points is None or len(self.points) < self.min_points:
+            return False
+
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, self.points, None, **_LK_PARAMS)
+        ok = status.reshape(-1) == 1
+        if np.count_nonzero(ok) < self.min_points:
+            return False
+
+        old = self.points.reshape(-1, 2)[ok]
+        new = new_points.reshape(-1, 2)[ok]
+
+        # Translation = median motion, scale = change in median spread
+        shift = np.median(new - old, axis=0)
+        old_spread = np.median(np.linalg.norm(old - old.mean(axis=0), axis=1))
+        new_spread = np.median(np.linalg.norm(new - new.mean(axis=0), axis=1))
+        scale = new_spread / old_spread if old_spread > 1e-3 else 1.0
+
+        x, y, w, h = self.box
+        cx, cy = x + w / 2 + shift[0], y + h / 2 + shift[1]
+        w, h = w * scale, h * scale
+        self.box = np.array([cx - w / 2, cy - h / 2, w, h], dtype=np.float32)
+        self.points = new.reshape(-1, 1, 2)
+        return True
+
+
+class _OpenCVTrack:
+    """
+    Wraps a cv2.Tracker (KCF / MOSSE)
+    """
+
+    def __init__(self, factory, gray, box):
+        self.tracker = factory()
+        self.tracker.init(gray, tuple(int(v) for v in box))
+        self.box = np.asarray(box, dtype=np.float32)
+
+    def update(self, prev_gray, gray):
+        ok, box = self.tracker.update(gray)
+        if ok:
+            self.box = np.asarray(box, dtype=np.float32)
+        return ok
+
+
+class DetectTrackFaceSource:
+    """
+    Returns full-resolution face boxes for every grayscale frame while
+    running the expensive detector only every `detect_interval` frames,
+    on a frame downscaled by `downscale`.
+
+    detect_fn(gray) -> (N, 4) boxes, e.g. EmotionPredictor.detect_faces.
+    tracker is "flow" (optical flow, always available), "kcf" or "mosse".
+    """
+
+    def __init__(self, detect_fn, detect_interval=5, downscale=0.5,
+                 tracker="flow", min_points=4):
+        if tracker != "flow" and _opencv_tracker_factory(tracker) is None:
+            raise ValueError(
+                f"❌ OpenCV tracker '{tracker}' not available "
+                "(install opencv-contrib-python or use tracker='flow')"
+            )
+        self.detect_fn = detect_fn
+        self.detect_interval = max(1, int(detect_interval))
+        self.downscale = float(downscale)
+        self.tracker = tracker
+        self.min_points = min_points
+
+        self.tracks = []
+        self.prev_small = None
+        self.frames_since_detect = 0
+        self.detections = 0
+
+    def _make_track(self, small, box):
+        if self.tracker == "flow":
+            return _FlowTrack(small, box, self.min_points)
+        return _OpenCVTrack(_opencv_tracker_factory(self.tracker), small, box)
+
+    def _detect(self, small):
+        boxes = np.asarray(self.detect_fn(small), dtype=np.float32).reshape(-1, 4)
+        self.tracks = [self._make_track(small, box) for box in boxes]
+        self.frames_since_detect = 0
+        self.detections += 1
+
+    def update(self, gray):
+        """
+        Returns (N, 4) int32 face boxes in full-resolution coordinates
+        """
+        if self.downscale != 1.0:
+            small = cv2.resize(gray, None, fx=self.downscale, fy=self.downscale,
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+
+        need_detect = (
+            self.prev_small is None
+            or self.frames_since_detect + 1 >= self.detect_interval
+        )
+        if not need_detect:
+            tracked = [t.update(self.prev_small, small) for t in self.tracks]
+            self.frames_since_detect += 1
+            need_detect = not all(tracked)
+
+        if need_detect:
+            self._detect(small)
+
+        self.prev_small = small
+
+        if not self.tracks:
+            return np.empty((0, 4), dtype=np.int32)
+
+        boxes = np.stack([t.box for t in self.tracks]) / self.downscale
+        # Clip to the frame so ROI slicing stays valid
+        frame_h, frame_w = gray.shape[:2]
+        boxes[:, 0] = np.clip(boxes[:, 0], 0, frame_w - 1)
+        boxes[:, 1] = np.clip(boxes[:, 1], 0, frame_h - 1)
+        boxes[:, 2] = np.clip(boxes[:, 2], 1, frame_w - boxes[:, 0])
+        boxes[:, 3] = np.clip(boxes[:, 3], 1, frame_h - boxes[:, 1])
+        return boxes.round().astype(np.int32)
@@ -0,0 +1,121 @@
+# feedback_store.py
+#
+# Append-only store of user-confirmed face crops for online fine-tuning
+# (online_finetune.py). Opt-in: the front ends only offer the feedback
+# buttons when EMOTION_FEEDBACK_DIR is set.
+#
+#   <dir>/faces.u8    fixed-size records, one 48x48 uint8 face per record
+#   <dir>/labels.u8   label index, one uint8 (index into LABELS) per record
+#
+# Records are only ever appended. A record counts once its label byte is
+# written (faces first, then the label), so a crash mid-append never
+# produces a mislabelled sample: the stray face bytes are overwritten by
+# the next append. Readers memory-map both files.
+#
+#   store = FeedbackStore(FEEDBACK_DIR)
+#   store.append_image(image_bytes, analysis.boxes[0], "Happy")
+#   faces, labels = store.read(start=100)
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from emotion_predictor import FACE_SIZE, LABELS, crop_face
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+FEEDBACK_DIR = os.environ.get("EMOTION_FEEDBACK_DIR", "")
+RECORD_BYTES = FACE_SIZE[0] * FACE_SIZE[1]
+
+
+def face_record(gray, box):
+    """
+    Returns the 48x48 uint8 crop of a face box (x, y, w, h)
+    """
+    return cv2.resize(crop_face(gray, box), FACE_SIZE).astype(np.uint8)
+
+
+class FeedbackStore:
+    """
+    Fixed-size uint8 face records plus a uint8 label index
+    """
+
+    def __init__(self, directory=FEEDBACK_DIR):
+        if not directory:
+            raise ValueError("❌ No feedback directory configured (set EMOTION_FEEDBACK_DIR)")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.faces_path = os.path.join(directory, "faces.u8")
+        self.labels_path = os.path.join(directory, "labels.u8")
+        self._lock = threading.Lock()
+        for path in (self.faces_path, self.labels_path):
+            open(path, "ab").close()
+
+    def __len__(self):
+        return min(os.path.getsize(self.labels_path), os.path.getsize(self.faces_path) // RECORD_BYTES)
+
+    def append(self, face, label):
+        """
+        Appends one 48x48 uint8 face with its label (name or index).
+        Returns the record index
+        """
+        face = np.ascontiguousarray(face, dtype=np.uint8)
+        if face.shape != FACE_SIZE:
+            raise ValueError(f"❌ Face record must be {FACE_SIZE}, got {face.shape}")
+        index = LABELS.index(label) if isinstance(label, str) else int(label)
+        if not 0 <= index < len(LABELS):
+            raise ValueError(f"❌ Unknown label: {label}")
+
+        with self._lock, open(self.labels_path, "r+b") as labels_file, \
+                open(self.faces_path, "r+b") as faces_file:
+            if fcntl is not None:
+                # Several Streamlit processes may share one store
+                fcntl.flock(labels_file, fcntl.LOCK_EX)
+            try:
+                record = os.path.getsize(self.labels_path)
+                faces_file.seek(record * RECORD_BYTES)
+                faces_file.write(face.tobytes())
+                faces_file.flush()
+                labels_file.seek(record)
+                labels_file.write(bytes([index]))
+                labels_file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(labels_file, fcntl.LOCK_UN)
+        return record
+
+    def append_image(self, image_bytes, box, label):
+        """
+        Decodes encoded image bytes and appends the face in box.
+        Returns the record index
+        """
+        # Same decode as EmotionPredictor.predict_image, so the crop matches
+        # what the model saw
+        frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("❌ Could not decode image bytes")
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return self.append(face_record(gray, box), label)
+
+    def read(self, start=0, stop=None):
+        """
+        Returns (faces, labels) for records [start, stop): faces is a
+        read-only (N, 48, 48) uint8 memmap, labels a uint8 array
+        """
+        count = len(self)
+        stop = count if stop is None else min(stop, count)
+        if stop <= start:
+            return np.empty((0,) + FACE_SIZE, dtype=np.uint8), np.empty(0, dtype=np.uint8)
+        faces = np.memmap(self.faces_path, dtype=np.uint8, mode="r",
+                          offset=start * RECORD_BYTES, shape=(stop - start,) + FACE_SIZE)
+        labels = np.fromfile(self.labels_path, dtype=np.uint8, count=stop)[start:]
+        return faces, labels
+
+    def class_counts(self):
+        labels = np.fromfile(self.labels_path, dtype=np.uint8, count=len(self))
+        return dict(zip(LABELS, np.bincount(labels, minlength=len(LABELS)).tolist()))
@@ -0,0 +1,272 @@
+# flat_model.py
+#
+# Flat, memory-mapped model format and a small NumPy runtime for it.
+#
+#   exported/emotion.flat
+#     b"EMOFLAT1" | uint64 header length | JSON header | tensors
+#
+# The header lists the model as a sequence of ops; every tensor sits at a
+# 64-byte aligned offset and is stored in the layout the runtime uses
+# (inference-only, BatchNormalization folded into the preceding layer
+# where possible, dropout removed). FlatModel np.memmap's the file and
+# computes straight from the mapped pages, so:
+#   - loading is parsing a small JSON header, with no TensorFlow import
+#     and no Keras graph rebuild
+#   - every process serving the same file on a host shares one
+#     page-cached copy of the weights instead of holding a private one
+#
+# Supported layers: Conv2D, SeparableConv2D, DepthwiseConv2D, Dense,
+# BatchNormalization, MaxPooling2D / AveragePooling2D (pool == strides),
+# GlobalAveragePooling2D, Flatten, Dropout, ReLU and Activation.
+#
+#   export_flat(model, "exported/emotion.flat")     (see export_model.py)
+#   EMOTION_MODEL=exported/emotion.flat python realtime_emotion_music.py
+
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"EMOFLAT1"
+ALIGN = 64
+ACTIVATIONS = ("linear", "relu", "softmax")
+
+
+# ==========================
+# EXPORT
+# ==========================
+
+def _activation(config):
+    name = config.get("activation", "linear")
+    if name not in ACTIVATIONS:
+        raise ValueError(f"❌ Unsupported activation for the flat format: {name}")
+    return name
+
+
+def _pool(kind, config):
+    if tuple(config["pool_size"]) != tuple(config["strides"] or config["pool_size"]) \
+            or config.get("padding", "valid") != "valid":
+        raise ValueError("❌ Flat format pooling needs pool_size == strides and valid padding")
+    return {"op": kind, "pool": list(config["pool_size"])}
+
+
+def _layer_ops(layer):
+    """
+    Returns the ops (with float32 NumPy tensors) for one Keras layer
+    """
+    kind = type(layer).__name__
+    config = layer.get_config()
+    weights = [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+
+    if kind in ("Conv2D", "SeparableConv2D", "DepthwiseConv2D"):
+        if tuple(config.get("dilation_rate", (1, 1))) != (1, 1):
+            raise ValueError("❌ Dilated convolutions are not supported by the flat format")
+        common = {"strides": list(config["strides"]), "padding": config["padding"]}
+        if kind == "Conv2D":
+            kernel = weights[0]
+            bias = weights[1] if config["use_bias"] else np.zeros(kernel.shape[-1], np.float32)
+            # (kh, kw, cin, cout) -> (cin * kh * kw, cout) to match the window layout
+            kh, kw, cin, cout = kernel.shape
+            ops = [{"op": "conv2d", "size": [kh, kw], **common,
+                    "kernel": kernel.transpose(2, 0, 1, 3).reshape(cin * kh * kw, cout), "bias": bias}]
+        else:
+            depthwise = weights[0]
+            kh, kw, cin, mult = depthwise.shape
+            if mult != 1:
+                raise ValueError("❌ Flat format depthwise convolutions need depth_multiplier=1")
+            ops = [{"op": "depthwise2d", "size": [kh, kw], **common,
+                    "kernel": depthwise[..., 0].transpose(2, 0, 1).copy(),
+                    "bias": np.zeros(cin, np.float32), "activation": "linear"}]
+            if kind == "SeparableConv2D":
+                pointwise = weights[1][0, 0]
+                bias = weights[2] if config["use_bias"] else np.zeros(pointwise.shape[-1], np.float32)
+                ops.append({"op": "dense", "kernel": pointwise, "bias": bias})
+            elif config["use_bias"]:
+                ops[0]["bias"] = weights[1]
+        ops[-1]["activation"] = _activation(config)
+        return ops
+
+    if kind == "Dense":
+        bias = weights[1] if config["use_bias"] else np.zeros(weights[0].shape[-1], np.float32)
+        return [{"op": "dense", "kernel": weights[0], "bias": bias, "activation": _activation(config)}]
+
+    if kind == "BatchNormalization":
+        names = [w.name.split("/")[-1].split(":")[0] for w in layer.weights]
+        params = dict(zip(names, weights))
+        scale = 1.0 / np.sqrt(params["moving_variance"] + config["epsilon"])
+        if "gamma" in params:
+            scale = scale * params["gamma"]
+        shift = -params["moving_mean"] * scale
+        if "beta" in params:
+            shift = shift + params["beta"]
+        return [{"op": "scale_shift", "scale": scale.astype(np.float32), "shift": shift.astype(np.float32)}]
+
+    if kind == "MaxPooling2D":
+        return [_pool("maxpool", config)]
+    if kind == "AveragePooling2D":
+        return [_pool("avgpool", config)]
+    if kind == "GlobalAveragePooling2D":
+        return [{"op": "gap"}]
+    if kind == "Flatten":
+        return [{"op": "flatten"}]
+    if kind == "ReLU":
+        return [{"op": "activation", "activation": "relu"}]
+    if kind == "Activation":
+        return [{"op": "activation", "activation": _activation(config)}]
+    if kind in ("Dropout", "InputLayer"):
+        return []
+    raise ValueError(f"❌ Layer type not supported by the flat format: {kind}")
+
+
+def _fold(ops):
+    """
+    Folds every scale_shift that directly follows a linear conv / dense
+    op into that op's kernel and bias
+    """
+    folded = []
+    for op in ops:
+        prev = folded[-1] if folded else None
+        if op["op"] == "scale_shift" and prev is not None \
+                and prev["op"] in ("conv2d", "depthwise2d", "dense") and prev["activation"] == "linear":
+            scale = op["scale"][:, None, None] if prev["op"] == "depthwise2d" else op["scale"]
+            prev["kernel"] = (prev["kernel"] * scale).astype(np.float32)
+            prev["bias"] = (prev["bias"] * op["scale"] + op["shift"]).astype(np.float32)
+            continue
+        folded.append(op)
+    return folded
+
+
+def export_flat(model, path):
+    """
+    Writes a Keras Sequential-style model (a plain chain of layers) to
+    the flat format. Returns the file size in bytes
+    """
+    ops = []
+    for layer in model.layers:
+        ops += _layer_ops(layer)
+    ops = _fold(ops)
+
+    tensors, offset = [], 0
+    header_ops = []
+    for op in ops:
+        entry = {}
+        for key, value in op.items():
+            if isinstance(value, np.ndarray):
+                offset = -(-offset // ALIGN) * ALIGN
+                entry[key] = {"offset": offset, "shape": list(value.shape), "dtype": "float32"}
+                tensors.append((offset, np.ascontiguousarray(value, dtype=np.float32)))
+                offset += value.nbytes
+            else:
+                entry[key] = value
+        header_ops.append(entry)
+
+    input_shape = [int(d) for d in model.input_shape[1:]]
+    header = json.dumps({"input_shape": input_shape, "ops": header_ops}).encode("utf-8")
+    # Tensor offsets are relative to the page-aligned data section
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // 4096) * 4096
+
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for tensor_offset, value in tensors:
+            f.seek(data_start + tensor_offset)
+            f.write(value.tobytes())
+        f.truncate(data_start + offset)
+        return data_start + offset
+
+
+# ==========================
+# RUNTIME
+# ==========================
+
+def _pad_same(x, size, strides):
+    pads = []
+    for dim, k, s in zip(x.shape[1:3], size, strides):
+        total = max((-(-dim // s) - 1) * s + k - dim, 0)
+        pads.append((total // 2, total - total // 2))
+    return np.pad(x, ((0, 0), pads[0], pads[1], (0, 0)))
+
+
+def _windows(x, op):
+    """
+    (N, H', W', C, kh, kw) view of the conv windows of an NHWC batch
+    """
+    size, strides = op["size"], op["strides"]
+    if op["padding"] == "same":
+        x = _pad_same(x, size, strides)
+    windows = np.lib.stride_tricks.sliding_window_view(x, size, axis=(1, 2))
+    return windows[:, ::strides[0], ::strides[1]]
+
+
+def _activate(x, name):
+    if name == "relu":
+        return np.maximum(x, 0)
+    if name == "softmax":
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return x / x.sum(axis=-1, keepdims=True)
+    return x
+
+
+class FlatModel:
+    """
+    Runs a .flat model with NumPy from memory-mapped weights.
+    predict() takes an NHWC float32 batch and is thread-safe (no state).
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"❌ Not a flat model file: {path}")
+            (length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(length))
+        data_start = -(-(len(MAGIC) + 8 + length) // 4096) * 4096
+
+        self.input_shape = tuple(header["input_shape"])
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        self.ops = []
+        for entry in header["ops"]:
+            op = {}
+            for key, value in entry.items():
+                if isinstance(value, dict) and "offset" in value:
+                    count = int(np.prod(value["shape"]))
+                    op[key] = np.frombuffer(self._data, dtype=value["dtype"], count=count,
+                                            offset=data_start + value["offset"]).reshape(value["shape"])
+                else:
+                    op[key] = value
+            self.ops.append(op)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32)
+        for op in self.ops:
+            kind = op["op"]
+            if kind == "conv2d":
+                w = _windows(x, op)
+                n, h, wd = w.shape[:3]
+                x = w.reshape(n * h * wd, -1) @ op["kernel"]
+                x += op["bias"]
+                x = _activate(x.reshape(n, h, wd, -1), op["activation"])
+            elif kind == "depthwise2d":
+                x = np.einsum("nhwcij,cij->nhwc", _windows(x, op), op["kernel"], optimize=True)
+                x += op["bias"]
+                x = _activate(x, op["activation"])
+            elif kind == "dense":
+                x = x @ op["kernel"]
+                x += op["bias"]
+                x = _activate(x, op["activation"])
+            elif kind == "scale_shift":
+                x = x * op["scale"] + op["shift"]
+            elif kind in ("maxpool", "avgpool"):
+                ph, pw = op["pool"]
+                n, h, wd, c = x.shape
+                x = x[:, :h // ph * ph, :wd // pw * pw].reshape(n, h // ph, ph, wd // pw, pw, c)
+                x = x.max(axis=(2, 4)) if kind == "maxpool" else x.mean(axis=(2, 4))
+            elif kind == "gap":
+                x = x.mean(axis=(1, 2))
+            elif kind == "flatten":
+                x = x.reshape(len(x), -1)
+            elif kind == "activation":
+                x = _activate(x, op["activation"])
+        return x.astype(np.float32, copy=False)
@@ -0,0 +1,136 @@
+# frame_pipeline.py
+#
+# Capture → inference → display pipeline for the realtime recommender.
+#
+#   CaptureThread  ──► inference queue ──► InferenceWorker ──► result queue
+#         └──────────► display queue ─────────────────────────► display loop
+#
+# All queues are bounded and drop their OLDEST item when full, so a slow
+# stage never makes the others work on stale frames.
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from metrics import NULL_METRICS
+
+Frame = namedtuple("Frame", ["frame_id", "timestamp", "image"])
+InferenceResult = namedtuple("InferenceResult", ["frame_id", "timestamp", "boxes", "probs"])
+
+
+def put_latest(q, item):
+    """
+    Puts item on a bounded queue, discarding the oldest entry if it is full.
+    Returns the number of items dropped (0 or 1)
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class CaptureThread(threading.Thread):
+    """
+    Reads frames from a cv2.VideoCapture as fast as the camera delivers
+    them and fans each one out to the given queues.
+    """
+
+    def __init__(self, cap, queues, stop_event, metrics=None):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.queues = queues
+        self.stop_event = stop_event
+        self.metrics = metrics or NULL_METRICS
+        self.frames = 0
+        self.dropped = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with self.metrics.timer("capture"):
+                ret, image = self.cap.read()
+            if not ret:
+                self.stop_event.set()
+                break
+
+            frame = Frame(self.frames, time.time(), image)
+            self.frames += 1
+            dropped = 0
+            for q in self.queues:
+                dropped += put_latest(q, frame)
+
+            self.dropped += dropped
+            self.metrics.inc("frames_captured")
+            if dropped:
+                self.metrics.inc("frames_dropped", dropped)
+
+
+class FPSCounter:
+    """
+    Exponentially smoothed events-per-second counter
+    """
+
+    def __init__(self, smoothing=0.9):
+        self.smoothing = smoothing
+        self.fps = 0.0
+        self._last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last is not None and now > self._last:
+            rate = 1.0 / (now - self._last)
+            self.fps = rate if self.fps == 0.0 else self.smoothing * self.fps + (1 - self.smoothing) * rate
+        self._last = now
+        return self.fps
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Detects and classifies faces on the newest available frame and
+    publishes an InferenceResult for each processed frame.
+
+    face_source, if given, is an object with update(gray) -> boxes
+    (e.g. face_tracking.DetectTrackFaceSource); otherwise the predictor's
+    detector runs on every frame.
+    """
+
+    def __init__(self, predictor, frames, results, stop_event, face_source=None, metrics=None):
+        super().__init__(name="inference", daemon=True)
+        self.predictor = predictor
+        self.frames = frames
+        self.results = results
+        self.stop_event = stop_event
+        self.face_source = face_source
+        self.metrics = metrics or NULL_METRICS
+        self.processed = 0
+        self.fps = FPSCounter()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            gray = cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY)
+            if self.face_source is not None:
+                with self.metrics.timer("tracking"):
+                    boxes = self.face_source.update(gray)
+            else:
+                boxes = self.predictor.detect_faces(gray)
+            probs = self.predictor.predict_faces(gray, boxes)
+
+            put_latest(self.results, InferenceResult(frame.frame_id, frame.timestamp, boxes, probs))
+            self.processed += 1
+            self.metrics.inc("frames_inferred")
+            self.metrics.inc("faces_detected", len(boxes))
+            self.metrics.set_gauge("inference_fps", self.fps.tick())
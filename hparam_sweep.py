@@ -0,0 +1,407 @@
+# hparam_sweep.py
+#
+# Hyperparameter sweep for the emotion CNN. Trials run concurrently in
+# separate (spawned) processes and all read the same memory-mapped pack
+# from dataset_pack.py, so the dataset is decoded once and shared through
+# the page cache instead of being decoded / copied per trial.
+#
+# Every trial reports its validation accuracy after each epoch to a
+# shared table; a pruner stops unpromising trials early:
+#   median - stop when below the median of the other trials at the same epoch
+#   asha   - asynchronous successive halving: at rungs min_epochs * eta^k
+#            only the top 1/eta of the trials seen at that rung continue
+#
+# Finished and pruned trials are then timed for single-face CPU inference
+# and written to a leaderboard (CSV + JSON) of validation accuracy versus
+# latency, with the Pareto-optimal trials and the latency budget marked.
+#
+#   python hparam_sweep.py --trials 16 --workers 4 --epochs 10 --pruner asha
+#   python hparam_sweep.py --space space.json --latency-budget-ms 2 --out sweeps/run1
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+
+import numpy as np
+
+from cpu_training import cpu_core_count
+from dataset_pack import PACKED_DIRNAME, pack_split, packed_paths
+
+# Every parameter is a list of choices
+DEFAULT_SPACE = {
+    "filters": [[16, 32, 64], [32, 64, 128], [48, 96, 192]],
+    "dropout": [0.1, 0.25, 0.4],
+    "dense_units": [128, 256, 512],
+    "learning_rate": [3e-4, 1e-3, 3e-3],
+    "batch_size": [64, 128, 256],
+}
+
+LEADERBOARD_FIELDS = ["trial", "status", "epochs", "val_accuracy", "latency_ms", "params",
+                      "train_seconds", "pareto", "within_budget", "hyperparameters", "model"]
+
+
+# ==========================
+# SEARCH SPACE
+# ==========================
+
+def load_space(path=None):
+    """
+    Returns the search space: DEFAULT_SPACE, or a JSON file with the same
+    {name: [choices]} layout (missing names keep their defaults)
+    """
+    space = dict(DEFAULT_SPACE)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            space.update(json.load(f))
+    for name, choices in space.items():
+        if not isinstance(choices, list) or not choices:
+            raise ValueError(f"❌ Search space entry '{name}' must be a non-empty list")
+    return space
+
+
+def sample_trials(space, n, seed=0):
+    """
+    Returns up to n distinct parameter dicts: the full grid when it has at
+    most n points, otherwise n random grid points
+    """
+    names = sorted(space)
+    sizes = [len(space[name]) for name in names]
+    total = int(np.prod(sizes))
+    if total <= n:
+        picks = range(total)
+    else:
+        picks = random.Random(seed).sample(range(total), n)
+
+    trials = []
+    for flat in picks:
+        coords = np.unravel_index(flat, sizes)
+        trials.append({name: space[name][int(i)] for name, i in zip(names, coords)})
+    return trials
+
+
+# ==========================
+# PRUNERS
+# ==========================
+# should_prune(reports, trial_id, epoch) looks at the shared reports
+# {trial_id: [val_accuracy after epoch 1, 2, ...]}; epoch is 1-based.
+
+def best_so_far(history, epoch):
+    return max(history[:epoch])
+
+
+class NoPruner:
+    name = "none"
+
+    def should_prune(self, reports, trial_id, epoch):
+        return False
+
+
+class MedianPruner:
+    """
+    Prunes a trial whose best accuracy so far is below the median of the
+    other trials' best accuracy at the same epoch. Nothing is pruned
+    before warmup_epochs, or while fewer than min_trials others have
+    reached that epoch.
+    """
+
+    name = "median"
+
+    def __init__(self, warmup_epochs=2, min_trials=3):
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def should_prune(self, reports, trial_id, epoch):
+        if epoch < self.warmup_epochs:
+            return False
+        others = [best_so_far(h, epoch) for t, h in reports.items()
+                  if t != trial_id and len(h) >= epoch]
+        if len(others) < self.min_trials:
+            return False
+        return best_so_far(reports[trial_id], epoch) < float(np.median(others))
+
+
+class AshaPruner:
+    """
+    Asynchronous successive halving. Rungs are at epochs
+    min_epochs * eta^k; a trial reaching a rung continues only if it is
+    in the top 1/eta (at least the best one) of all trials that have
+    reached that rung so far, so early trials are never held back
+    waiting for the rest.
+    """
+
+    name = "asha"
+
+    def __init__(self, min_epochs=1, eta=3):
+        self.min_epochs = min_epochs
+        self.eta = eta
+
+    def is_rung(self, epoch):
+        rung = self.min_epochs
+        while rung < epoch:
+            rung *= self.eta
+        return rung == epoch
+
+    def should_prune(self, reports, trial_id, epoch):
+        if not self.is_rung(epoch):
+            return False
+        values = sorted((best_so_far(h, epoch) for h in reports.values() if len(h) >= epoch),
+                        reverse=True)
+        keep = max(1, len(values) // self.eta)
+        return best_so_far(reports[trial_id], epoch) < values[keep - 1]
+
+
+PRUNERS = {
+    "none": NoPruner,
+    "median": MedianPruner,
+    "asha": AshaPruner,
+}
+
+
+# ==========================
+# TRIAL WORKERS
+# ==========================
+
+_worker = {}
+
+
+def _init_worker(packed_dir, settings, reports, lock):
+    # Thread pools must be sized before TensorFlow runs its first op
+    from cpu_training import configure_cpu
+    configure_cpu(settings["threads"], 1)
+
+    from dataset_pack import load_packed, validation_split_indices
+
+    images, labels, manifest = load_packed(packed_dir, "train")
+    num_classes = len(manifest["class_indices"])
+    train_idx, val_idx = validation_split_indices(labels, num_classes, settings["validation_split"])
+    if settings["samples"] and settings["samples"] < len(train_idx):
+        rng = np.random.default_rng(settings["seed"])
+        train_idx = np.sort(rng.choice(train_idx, settings["samples"], replace=False))
+
+    _worker.update(images=images, labels=labels, num_classes=num_classes,
+                   train_idx=train_idx, val_idx=val_idx, settings=settings,
+                   reports=reports, lock=lock)
+
+
+def _run_trial(task):
+    trial_id, params = task
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import Callback
+
+    from data_pipeline import PackedSequence
+    from emotion_model import build_emotion_cnn
+
+    w = _worker
+    settings = w["settings"]
+    reports, lock = w["reports"], w["lock"]
+    pruner = PRUNERS[settings["pruner"]](**settings["pruner_args"])
+
+    class ReportCallback(Callback):
+        def __init__(self):
+            super().__init__()
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            # Manager dict values are copies: reassign to publish
+            with lock:
+                history = reports.get(trial_id, []) + [float(logs["val_accuracy"])]
+                reports[trial_id] = history
+                snapshot = dict(reports)
+            if pruner.should_prune(snapshot, trial_id, epoch + 1):
+                self.pruned = True
+                self.model.stop_training = True
+
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(settings["seed"] + trial_id)
+
+    train_seq = PackedSequence(w["images"], w["labels"], w["train_idx"], w["num_classes"],
+                               batch_size=params["batch_size"], shuffle=True,
+                               seed=settings["seed"] + trial_id)
+    val_seq = PackedSequence(w["images"], w["labels"], w["val_idx"], w["num_classes"],
+                             batch_size=256)
+
+    model = build_emotion_cnn(w["num_classes"], filters=tuple(params["filters"]),
+                              dropout=params["dropout"], dense_units=params["dense_units"])
+    model.compile(optimizer=tf.keras.optimizers.Adam(params["learning_rate"]),
+                  loss='categorical_crossentropy', metrics=['accuracy'])
+
+    report = ReportCallback()
+    start = time.perf_counter()
+    history = model.fit(train_seq, epochs=settings["epochs"], validation_data=val_seq,
+                        callbacks=[report], verbose=0)
+    train_seconds = time.perf_counter() - start
+
+    model_path = os.path.join(settings["out_dir"], f"trial_{trial_id:03d}.h5")
+    model.save(model_path)
+
+    val_acc = history.history["val_accuracy"]
+    status = "pruned" if report.pruned else "complete"
+    print(f"{'✂️' if report.pruned else '✅'} trial {trial_id}: {status} after {len(val_acc)} epochs, "
+          f"val acc {max(val_acc):.3f} ({train_seconds:.0f}s)", flush=True)
+    return {
+        "trial": trial_id,
+        "status": status,
+        "epochs": len(val_acc),
+        "val_accuracy": float(max(val_acc)),
+        "params": int(model.count_params()),
+        "train_seconds": train_seconds,
+        "hyperparameters": params,
+        "model": model_path,
+    }
+
+
+# ==========================
+# LATENCY + LEADERBOARD
+# ==========================
+
+def measure_latency(model_path, runs=50, num_threads=1):
+    """
+    Median single-face inference latency (ms) through the serving
+    backend (emotion_predictor.KerasBackend)
+    """
+    from emotion_predictor import INPUT_SHAPE, load_backend
+
+    backend = load_backend(model_path, "keras", num_threads=num_threads)
+    batch = np.random.default_rng(0).random((1,) + INPUT_SHAPE, dtype=np.float32)
+    backend.predict(batch)
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        backend.predict(batch)
+        times.append(time.perf_counter() - t)
+    return float(np.median(times)) * 1000.0
+
+
+def mark_pareto(rows):
+    """
+    Flags rows no other row beats on both accuracy and latency
+    """
+    for row in rows:
+        row["pareto"] = not any(
+            other["val_accuracy"] >= row["val_accuracy"] and other["latency_ms"] <= row["latency_ms"]
+            and (other["val_accuracy"] > row["val_accuracy"] or other["latency_ms"] < row["latency_ms"])
+            for other in rows
+        )
+
+
+def write_leaderboard(rows, out_dir):
+    """
+    Writes leaderboard.csv / leaderboard.json. Returns their paths
+    """
+    csv_path = os.path.join(out_dir, "leaderboard.csv")
+    json_path = os.path.join(out_dir, "leaderboard.json")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "hyperparameters": json.dumps(row["hyperparameters"])})
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    return csv_path, json_path
+
+
+def print_leaderboard(rows, budget_ms=None):
+    print(f"\n{'trial':>5} {'status':<9}{'epochs':>7}{'val acc':>9}{'latency ms':>12}{'params':>10}  hyperparameters")
+    for row in rows:
+        flags = ("*" if row["pareto"] else " ") + ("" if row["within_budget"] else " (over budget)")
+        hp = row["hyperparameters"]
+        print(f"{row['trial']:>5} {row['status']:<9}{row['epochs']:>7}{row['val_accuracy']:>9.3f}"
+              f"{row['latency_ms']:>12.2f}{row['params']:>10}  "
+              f"filters={hp['filters']} dropout={hp['dropout']} dense={hp['dense_units']} "
+              f"lr={hp['learning_rate']:g} batch={hp['batch_size']} {flags}")
+    print("* Pareto-optimal (no trial is both more accurate and faster)")
+
+    eligible = [r for r in rows if r["within_budget"] and r["status"] == "complete"]
+    if budget_ms is not None:
+        if eligible:
+            best = eligible[0]
+            print(f"🏆 Best within {budget_ms:g} ms: trial {best['trial']} "
+                  f"(val acc {best['val_accuracy']:.3f}, {best['latency_ms']:.2f} ms) -> {best['model']}")
+        else:
+            print(f"⚠️ No completed trial meets the {budget_ms:g} ms latency budget")
+
+
+# ==========================
+# MAIN
+# ==========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the emotion CNN")
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--space", default=None, help="JSON search space (default: DEFAULT_SPACE)")
+    parser.add_argument("--trials", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Concurrent trials (default: half the cores)")
+    parser.add_argument("--threads-per-trial", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=10, help="Maximum epochs per trial")
+    parser.add_argument("--samples", type=int, default=None, help="Cap on training images per trial")
+    parser.add_argument("--validation-split", type=float, default=0.2)
+    parser.add_argument("--pruner", choices=list(PRUNERS), default="asha")
+    parser.add_argument("--eta", type=int, default=3, help="ASHA reduction factor")
+    parser.add_argument("--min-epochs", type=int, default=1, help="ASHA first rung")
+    parser.add_argument("--warmup-epochs", type=int, default=2, help="Median pruner warm-up")
+    parser.add_argument("--latency-budget-ms", type=float, default=None)
+    parser.add_argument("--latency-threads", type=int, default=1,
+                        help="CPU threads when timing inference")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="sweeps/latest", help="Folder for models and leaderboard")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+
+    # 1. Decode once: every trial memory-maps the same packed arrays
+    packed_dir = os.path.join(args.dataset_dir, PACKED_DIRNAME)
+    if not os.path.exists(packed_paths(packed_dir, "train")[2]):
+        print("🗂️ Packing Dataset/train (once, shared by every trial)...")
+    stats = pack_split(args.dataset_dir, "train", packed_dir)
+    print(f"✅ Shared dataset: {stats['samples']} images ({stats['decoded']} decoded)")
+
+    space = load_space(args.space)
+    trials = sample_trials(space, args.trials, args.seed)
+    workers = min(len(trials), args.workers or max(1, cpu_core_count() // 2))
+    threads = args.threads_per_trial or max(1, cpu_core_count() // workers)
+    pruner_args = {
+        "asha": {"min_epochs": args.min_epochs, "eta": args.eta},
+        "median": {"warmup_epochs": args.warmup_epochs},
+        "none": {},
+    }[args.pruner]
+    settings = {
+        "epochs": args.epochs,
+        "samples": args.samples,
+        "validation_split": args.validation_split,
+        "seed": args.seed,
+        "threads": threads,
+        "pruner": args.pruner,
+        "pruner_args": pruner_args,
+        "out_dir": args.out,
+    }
+    print(f"🔎 {len(trials)} trials, {workers} at a time x {threads} threads, pruner: {args.pruner}")
+
+    # 2. Train concurrently; reports are shared for pruning
+    ctx = mp.get_context("spawn")
+    start = time.perf_counter()
+    with ctx.Manager() as manager:
+        reports, lock = manager.dict(), manager.Lock()
+        with ctx.Pool(workers, initializer=_init_worker,
+                      initargs=(packed_dir, settings, reports, lock)) as pool:
+            results = list(pool.imap_unordered(_run_trial, enumerate(trials)))
+    print(f"⏱️ Sweep trained in {time.perf_counter() - start:.0f}s")
+
+    # 3. Time inference one model at a time, on an otherwise idle CPU
+    for row in results:
+        row["latency_ms"] = measure_latency(row["model"], num_threads=args.latency_threads)
+        row["within_budget"] = args.latency_budget_ms is None or row["latency_ms"] <= args.latency_budget_ms
+    mark_pareto(results)
+    results.sort(key=lambda r: (r["status"] != "complete", -r["val_accuracy"], r["latency_ms"]))
+
+    print_leaderboard(results, args.latency_budget_ms)
+    csv_path, json_path = write_leaderboard(results, args.out)
+    print(f"\n💾 Leaderboard saved to {csv_path} and {json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# metrics.py
+#
+# Low-overhead hot-path instrumentation: stage timers with rolling
+# histograms, counters and gauges, exported as Prometheus text over HTTP
+# and/or to a periodically flushed file.
+#
+#   metrics = Metrics()
+#   with metrics.timer("detection"):
+#       boxes = detector.detect(gray)
+#   metrics.inc("frames_captured")
+#   serve_prometheus(metrics, 9108)          # GET /metrics
+#   FileFlusher(metrics, "metrics.prom").start()
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PREFIX = "emotion"
+
+# Exporter settings for processes without CLI flags (the Streamlit apps)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0")) or None
+METRICS_FILE = os.environ.get("METRICS_FILE") or None
+# Loopback only by default; set to 0.0.0.0 to let a remote Prometheus scrape
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+
+# Latency buckets in seconds (0.5 ms .. 2.5 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class RollingHistogram:
+    """
+    Cumulative Prometheus-style bucket counts plus a ring buffer of the
+    most recent samples for live percentiles
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=512):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        return float(np.percentile(np.fromiter(self.recent, dtype=np.float64), q))
+
+
+class Metrics:
+    """
+    Thread-safe registry of stage histograms, counters and gauges
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=512):
+        self._buckets = buckets
+        self._window = window
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = RollingHistogram(self._buckets, self._window)
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = float(value)
+
+    def latency_ms(self, stage, q=50):
+        """
+        Returns the rolling q-th percentile latency of a stage in ms
+        """
+        with self._lock:
+            hist = self.histograms.get(stage)
+            return hist.percentile(q) * 1e3 if hist else 0.0
+
+    def snapshot(self):
+        """
+        Returns a plain dict of every metric (p50/p95 in ms for stages)
+        """
+        with self._lock:
+            return {
+                "stages": {
+                    name: {
+                        "count": h.count,
+                        "p50_ms": h.percentile(50) * 1e3,
+                        "p95_ms": h.percentile(95) * 1e3,
+                    }
+                    for name, h in self.histograms.items()
+                },
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+            }
+
+    def prometheus_text(self):
+        """
+        Renders all metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            name = f"{PREFIX}_stage_seconds"
+            lines.append(f"# HELP {name} Latency of each pipeline stage")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(self._buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}_{counter}_total counter")
+                lines.append(f"{PREFIX}_{counter}_total {value}")
+
+            for gauge, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {PREFIX}_{gauge} gauge")
+                lines.append(f"{PREFIX}_{gauge} {value:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+
+class _NullMetrics:
+    """
+    Drop-in for Metrics when instrumentation is disabled
+    """
+
+    def timer(self, stage):
+        return nullcontext()
+
+    def observe(self, stage, seconds):
+        pass
+
+    def inc(self, name, value=1):
+        pass
+
+    def set_gauge(self, name, value):
+        pass
+
+    def latency_ms(self, stage, q=50):
+        return 0.0
+
+
+NULL_METRICS = _NullMetrics()
+
+
+def serve_prometheus(metrics, port, host=METRICS_HOST):
+    """
+    Serves metrics.prometheus_text() at http://host:port/metrics from a
+    daemon thread. Returns the server (call .shutdown() to stop it)
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class FileFlusher(threading.Thread):
+    """
+    Rewrites a Prometheus text file every `interval` seconds (for
+    node_exporter's textfile collector or any file-based scraper)
+    """
+
+    def __init__(self, metrics, path, interval=5.0):
+        super().__init__(name="metrics-file", daemon=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def flush(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.metrics.prometheus_text())
+        os.replace(tmp_path, self.path)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_exporters(metrics, port=None, path=None, interval=5.0, host=METRICS_HOST):
+    """
+    Starts the HTTP endpoint and/or file flusher that are configured.
+    Returns (server_or_None, flusher_or_None)
+    """
+    server = serve_prometheus(metrics, port, host) if port else None
+    flusher = None
+    if path:
+        flusher = FileFlusher(metrics, path, interval)
+        flusher.start()
+    return server, flusher
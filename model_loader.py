@@ -0,0 +1,160 @@
+# model_loader.py
+#
+# Background model loading for fast cold starts. The front ends render
+# (or start the camera) immediately while a daemon thread imports the
+# inference runtime, loads the model and runs the warm-up batch:
+#
+#   loader = ModelLoader(MODEL_PATH, metrics=metrics).start()
+#   ...
+#   if loader.ready:
+#       predictor = loader.get()
+#   predictor = loader.wait()        # blocks until loaded (re-raises errors)
+#
+# Each phase is timed separately in loader.timings (seconds) and recorded
+# as the "startup_import", "startup_load" and "startup_warmup" stages
+# (plus "startup_catalog" when MUSIC_CATALOG is set, see music_mapper.py).
+#
+# loader.swap(path) replaces the served model with a newer one (e.g. from
+# online_finetune.py) without a restart; callers holding the old
+# predictor keep using it until their next get().
+
+import threading
+import time
+
+from emotion_predictor import MODEL_PATH, EmotionPredictor, import_runtime
+from music_mapper import MUSIC_CATALOG, load_catalog_recommender
+
+
+class ModelLoader:
+    """
+    Builds an EmotionPredictor on a background thread.
+    predictor_kwargs are passed to EmotionPredictor
+    """
+
+    def __init__(self, model_path=MODEL_PATH, backend=None, metrics=None, **predictor_kwargs):
+        self.model_path = model_path
+        self.backend = backend
+        self.metrics = metrics
+        self.predictor_kwargs = predictor_kwargs
+        self.timings = {}
+        self.phase = "pending"
+        self.error = None
+        self.version = 0
+        self._predictor = None
+        self._done = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def loaded(cls, predictor):
+        """
+        Returns a loader that is already ready with the given predictor
+        (e.g. an emotion_client.EmotionClient)
+        """
+        loader = cls()
+        loader._predictor = predictor
+        loader.phase = "ready"
+        loader._done.set()
+        return loader
+
+    def _timed(self, phase, fn):
+        self.phase = phase
+        start = time.perf_counter()
+        result = fn()
+        self.timings[phase] = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.observe(f"startup_{phase}", self.timings[phase])
+        return result
+
+    def load(self):
+        """
+        Runs the import / load / warm-up phases in the calling thread.
+        Returns the predictor
+        """
+        try:
+            self._timed("import", lambda: import_runtime(self.model_path, self.backend))
+            predictor = self._timed("load", lambda: EmotionPredictor(
+                self.model_path, backend=self.backend, metrics=self.metrics,
+                warmup=False, **self.predictor_kwargs
+            ))
+            self._timed("warmup", predictor.warmup)
+            if MUSIC_CATALOG:
+                self._timed("catalog", load_catalog_recommender)
+            self._predictor = predictor
+            self.phase = "ready"
+            return predictor
+        except Exception as e:
+            self.error = e
+            self.phase = "failed"
+            raise
+        finally:
+            self._done.set()
+
+    def swap(self, model_path):
+        """
+        Loads and warms up model_path in the calling thread, then makes it
+        the served predictor. Returns the new predictor
+        """
+        start = time.perf_counter()
+        predictor = EmotionPredictor(model_path, metrics=self.metrics, **self.predictor_kwargs)
+        self.model_path, self.backend = model_path, None
+        self._predictor = predictor
+        self.version += 1
+        self.timings["swap"] = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.observe("model_swap", self.timings["swap"])
+        return predictor
+
+    def _run(self):
+        try:
+            self.load()
+        except Exception:
+            # Kept in self.error and re-raised by wait()/get()
+            pass
+
+    def start(self):
+        """
+        Starts loading on a daemon thread. Returns self
+        """
+        if self._thread is None and not self._done.is_set():
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        return self._predictor is not None
+
+    def wait(self, timeout=None):
+        """
+        Blocks until loading finishes. Returns the predictor, or None on
+        timeout; re-raises a loading error
+        """
+        if not self._done.wait(timeout):
+            return None
+        if self.error is not None:
+            raise self.error
+        return self._predictor
+
+    def get(self):
+        """
+        Returns the predictor if it is ready, else None
+        """
+        if self.error is not None:
+            raise self.error
+        return self._predictor
+
+    def status(self):
+        """
+        Returns a short human-readable readiness string
+        """
+        if self.ready and self.version:
+            return f"🟢 Model ready (updated {self.version}x from feedback)"
+        if self.ready:
+            total = sum(self.timings.values())
+            return f"🟢 Model ready ({total:.1f}s)" if total else "🟢 Model ready"
+        if self.error is not None:
+            return f"🔴 Model failed to load: {self.error}"
+        labels = {"pending": "Starting", "import": "Importing runtime",
+                  "load": "Loading model", "warmup": "Warming up",
+                  "catalog": "Loading music catalog"}
+        return f"🟡 {labels.get(self.phase, self.phase)}..."
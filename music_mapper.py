@@ -1,60 +1,97 @@
 # music_mapper.py
+#
+# Emotion → music recommendation. With MUSIC_CATALOG pointing at a local
+# track catalog (see track_catalog.py) the full probability vector picks
+# the nearest tracks; otherwise, or if the catalog cannot be loaded, the
+# fixed MUSIC_MAP search keywords are returned.
 
-def get_music_recommendation(emotion):
+import os
+import threading
+
+MUSIC_CATALOG = os.environ.get("MUSIC_CATALOG") or None
+
+# Returned as-is (not copied): callers must not modify these dicts
+MUSIC_MAP = {
+    "happy": {
+        "mood": "Energetic",
+        "keywords": [
+            "energetic songs",
+            "feel good music",
+            "happy upbeat playlist"
+        ],
+        "message": "You're feeling happy! Enjoy some energetic music 🎶"
+    },
+
+    "sad": {
+        "mood": "Calm",
+        "keywords": [
+            "calm relaxing music",
+            "soothing songs",
+            "peaceful piano music"
+        ],
+        "message": "Feeling low? Here's some calm music to relax 🌿"
+    },
+
+    "angry": {
+        "mood": "Peaceful",
+        "keywords": [
+            "peaceful instrumental music",
+            "nature sounds",
+            "meditation music"
+        ],
+        "message": "Let's cool down with peaceful music 🧘"
+    },
+
+    "neutral": {
+        "mood": "Focus",
+        "keywords": [
+            "lofi beats",
+            "study music",
+            "ambient background music"
+        ],
+        "message": "Stay focused with some background music 🎧"
+    }
+}
+
+DEFAULT_RECOMMENDATION = {
+    "mood": "General",
+    "keywords": ["popular music playlist"],
+    "message": "Enjoy some music 🎵"
+}
+
+_recommender = None
+_recommender_lock = threading.Lock()
+
+
+def load_catalog_recommender():
     """
-    Takes detected emotion as input
-    Returns music recommendation details
+    Returns the process-wide TrackRecommender, loading MUSIC_CATALOG on
+    first use; None when no catalog is configured or it failed to load
     """
+    global _recommender
+    if MUSIC_CATALOG is None:
+        return None
+    with _recommender_lock:
+        if _recommender is None:
+            from track_catalog import TrackRecommender, load_catalog
+            try:
+                _recommender = TrackRecommender(load_catalog(MUSIC_CATALOG))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Music catalog unavailable, using keyword recommendations: {e}")
+                _recommender = False
+        return _recommender or None
 
-    emotion = emotion.lower()
-
-    music_map = {
-        "happy": {
-            "mood": "Energetic",
-            "keywords": [
-                "energetic songs",
-                "feel good music",
-                "happy upbeat playlist"
-            ],
-            "message": "You're feeling happy! Enjoy some energetic music 🎶"
-        },
-
-        "sad": {
-            "mood": "Calm",
-            "keywords": [
-                "calm relaxing music",
-                "soothing songs",
-                "peaceful piano music"
-            ],
-            "message": "Feeling low? Here's some calm music to relax 🌿"
-        },
-
-        "angry": {
-            "mood": "Peaceful",
-            "keywords": [
-                "peaceful instrumental music",
-                "nature sounds",
-                "meditation music"
-            ],
-            "message": "Let's cool down with peaceful music 🧘"
-        },
-
-        "neutral": {
-            "mood": "Focus",
-            "keywords": [
-                "lofi beats",
-                "study music",
-                "ambient background music"
-            ],
-            "message": "Stay focused with some background music 🎧"
-        }
-    }
 
-    return music_map.get(
-        emotion,
-        {
-            "mood": "General",
-            "keywords": ["popular music playlist"],
-            "message": "Enjoy some music 🎵"
-        }
-    )
+def get_music_recommendation(emotion, probs=None, k=5):
+    """
+    Takes detected emotion as input (and optionally the full probability
+    vector over emotion_predictor.LABELS)
+    Returns music recommendation details; with a catalog configured it
+    also has a "tracks" list and keywords naming those tracks
+    """
+    base = MUSIC_MAP.get(emotion.lower(), DEFAULT_RECOMMENDATION)
+
+    recommender = load_catalog_recommender()
+    if recommender is None:
+        return base
+    return recommender.recommend(emotion, probs, base, k)
@@ -0,0 +1,322 @@
+# online_finetune.py
+#
+# Background fine-tuning from confirmed captures (feedback_store.py).
+# A FineTuner keeps its own copy of the Keras model and, whenever enough
+# new feedback has arrived, runs one small round:
+#   1. train the copy for a few epochs in small batches on the new
+#      records, mixed with a replay sample of older feedback and of
+#      Dataset/train (so it does not forget the original data)
+#   2. validate on held-out feedback (every holdout_every-th record is
+#      never trained on) and on a fixed Dataset/test subset
+#   3. if held-out feedback accuracy improved and the Dataset/test
+#      accuracy did not drop by more than max_regression, save the copy
+#      (atomically) and call on_improved(path) - the front ends hot-swap
+#      the served model there; otherwise roll the copy back
+# Nothing is ever retrained on the whole Dataset.
+#
+#   fine_tuner = FineTuner(FeedbackStore(FEEDBACK_DIR), on_improved=loader.swap).start()
+#   fine_tuner.notify()          # after each store.append()
+#
+#   python online_finetune.py --feedback-dir feedback --once
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from emotion_predictor import LABELS, MODEL_PATH
+from feedback_store import FEEDBACK_DIR, FeedbackStore
+
+FINETUNED_PATH = os.environ.get("FINETUNED_MODEL", "emotion_finetuned.h5")
+STATE_FILENAME = "finetune_state.json"
+KERAS_EXTENSIONS = (".h5", ".keras")
+
+
+def fine_tunable(model_path):
+    """
+    Only Keras models can be fine-tuned (and replaced by a fine-tuned one)
+    """
+    return model_path.endswith(KERAS_EXTENSIONS)
+
+
+def load_state(directory=FEEDBACK_DIR):
+    """
+    Returns the fine-tuning state saved next to a feedback store ({} if none)
+    """
+    path = os.path.join(directory, STATE_FILENAME) if directory else ""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def current_model_path(default=MODEL_PATH, directory=FEEDBACK_DIR):
+    """
+    Returns the last accepted fine-tuned model when feedback is enabled,
+    one exists and default is a Keras model, else default (an exported
+    .tflite / .onnx / .flat / SavedModel is never swapped for an .h5)
+    """
+    if not fine_tunable(default):
+        return default
+    model = load_state(directory).get("model")
+    return model if model and os.path.exists(model) else default
+
+
+class FineTuner:
+    """
+    Incrementally fine-tunes a copy of a Keras model on a FeedbackStore
+    on a daemon thread (or synchronously with run_round()).
+    """
+
+    def __init__(self, store, base_model_path=MODEL_PATH, out_path=FINETUNED_PATH, on_improved=None,
+                 min_new=16, batch_size=16, epochs=3, learning_rate=1e-4, holdout_every=5,
+                 replay_samples=256, reference_samples=1000, max_regression=0.01,
+                 dataset_dir="Dataset", poll_interval=60.0):
+        self.store = store
+        self.base_model_path = base_model_path
+        # Absolute, so the state file does not depend on the working dir
+        self.out_path = os.path.abspath(out_path)
+        self.on_improved = on_improved
+        self.min_new = min_new
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.holdout_every = holdout_every
+        self.replay_samples = replay_samples
+        self.reference_samples = reference_samples
+        self.max_regression = max_regression
+        self.dataset_dir = dataset_dir
+        self.poll_interval = poll_interval
+
+        self.state_path = os.path.join(store.directory, STATE_FILENAME)
+        self.state = load_state(store.directory)
+        self.state.setdefault("trained_upto", 0)
+        self.state.setdefault("rounds", 0)
+        self.state.setdefault("accepted", 0)
+        self.last_round = None
+        self.error = None
+        self._attempted_upto = self.state["trained_upto"]
+        self._model = None
+        self._reference = None
+        self._replay = None
+        self._rng = np.random.default_rng()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ==========================
+    # DATA
+    # ==========================
+
+    def _split(self, start, stop):
+        ids = np.arange(start, stop)
+        holdout = ids % self.holdout_every == 0
+        return ids[~holdout], ids[holdout]
+
+    def _records(self, ids):
+        faces, labels = self.store.read(0, int(ids.max()) + 1 if len(ids) else 0)
+        return np.asarray(faces[ids]), np.asarray(labels[ids])
+
+    def _packed(self, split, samples):
+        """
+        A fixed random sample of a packed Dataset split, or None
+        """
+        from dataset_pack import PACKED_DIRNAME, load_packed
+
+        try:
+            images, labels, _ = load_packed(os.path.join(self.dataset_dir, PACKED_DIRNAME), split)
+        except FileNotFoundError:
+            return None
+        picks = np.sort(np.random.default_rng(0).permutation(len(labels))[:samples])
+        return np.asarray(images[picks]), np.asarray(labels[picks])
+
+    @staticmethod
+    def _xy(faces, labels):
+        x = faces.reshape((-1,) + faces.shape[1:] + (1,)).astype(np.float32) / 255.0
+        y = np.eye(len(LABELS), dtype=np.float32)[labels]
+        return x, y
+
+    def _accuracy(self, faces, labels):
+        if faces is None or len(faces) == 0:
+            return None
+        x, _ = self._xy(faces, labels)
+        probs = self._model.predict(x, batch_size=256, verbose=0)
+        return float(np.mean(np.argmax(probs, axis=1) == labels))
+
+    # ==========================
+    # ONE ROUND
+    # ==========================
+
+    def _load_model(self):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+
+        path = self.state.get("model") if os.path.exists(self.state.get("model", "")) else self.base_model_path
+        if not fine_tunable(path):
+            raise ValueError(f"❌ Fine-tuning needs a Keras model, got {path}")
+        self._model = load_model(path, compile=False)
+        self._model.compile(optimizer=tf.keras.optimizers.Adam(self.learning_rate),
+                            loss='categorical_crossentropy', metrics=['accuracy'])
+        self._reference = self._packed("test", self.reference_samples)
+        self._replay = self._packed("train", self.replay_samples)
+
+    def pending(self):
+        """
+        New records since the last attempted round
+        """
+        return len(self.store) - self._attempted_upto
+
+    def run_round(self):
+        """
+        Trains on the new feedback and keeps the result if it validates
+        better. Returns the round summary, or None if there was too
+        little new data
+        """
+        count = len(self.store)
+        if count - self._attempted_upto < self.min_new:
+            return None
+        train_ids, _ = self._split(self.state["trained_upto"], count)
+        _, holdout_ids = self._split(0, count)
+        if len(train_ids) == 0 or len(holdout_ids) == 0:
+            return None
+        self._attempted_upto = count
+        if self._model is None:
+            self._load_model()
+
+        start = time.perf_counter()
+        holdout = self._records(holdout_ids)
+        reference = self._reference or (None, None)
+        served = self._model.get_weights()
+        before = (self._accuracy(*holdout), self._accuracy(*reference))
+
+        # New records + replay of older feedback and of the original data
+        faces, labels = self._records(train_ids)
+        older, _ = self._split(0, self.state["trained_upto"])
+        if len(older):
+            picks = np.sort(self._rng.choice(older, min(len(older), self.replay_samples), replace=False))
+            old_faces, old_labels = self._records(picks)
+            faces, labels = np.concatenate([faces, old_faces]), np.concatenate([labels, old_labels])
+        if self._replay is not None:
+            faces = np.concatenate([faces, self._replay[0]])
+            labels = np.concatenate([labels, self._replay[1]])
+        x, y = self._xy(faces, labels)
+        self._model.fit(x, y, batch_size=self.batch_size, epochs=self.epochs, shuffle=True, verbose=0)
+
+        after = (self._accuracy(*holdout), self._accuracy(*reference))
+        accepted = after[0] > before[0] and (
+            before[1] is None or after[1] >= before[1] - self.max_regression
+        )
+
+        self.state["rounds"] += 1
+        summary = {
+            "records": count,
+            "trained_on": len(train_ids),
+            "holdout": len(holdout_ids),
+            "feedback_accuracy": [before[0], after[0]],
+            "reference_accuracy": [before[1], after[1]],
+            "accepted": accepted,
+            "seconds": time.perf_counter() - start,
+        }
+        if accepted:
+            tmp_path = self.out_path + ".tmp.h5"
+            self._model.save(tmp_path, include_optimizer=False)
+            os.replace(tmp_path, self.out_path)
+            self.state.update(model=self.out_path, trained_upto=count,
+                              accepted=self.state["accepted"] + 1,
+                              feedback_accuracy=after[0], reference_accuracy=after[1])
+        else:
+            self._model.set_weights(served)
+        self._save_state()
+        self.last_round = summary
+
+        if accepted and self.on_improved is not None:
+            self.on_improved(self.out_path)
+        return summary
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    # ==========================
+    # BACKGROUND THREAD
+    # ==========================
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                summary = self.run_round()
+                if summary is not None:
+                    verdict = "✅ swapped in" if summary["accepted"] else "↩️ kept current model"
+                    print(f"🧠 Fine-tune round on {summary['trained_on']} new samples: "
+                          f"feedback acc {summary['feedback_accuracy'][0]:.3f} -> "
+                          f"{summary['feedback_accuracy'][1]:.3f}, {verdict}")
+            except Exception as e:
+                self.error = e
+                print(f"⚠️ Fine-tuning round failed: {e}")
+
+    def start(self):
+        """
+        Starts the fine-tuning daemon thread. Returns self
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="fine-tuner", daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self):
+        """
+        Wakes the worker after new feedback was appended
+        """
+        if self.pending() >= self.min_new:
+            self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def status(self):
+        """
+        Returns a short human-readable summary
+        """
+        text = (f"{len(self.store)} feedback samples, {self.state['accepted']} of "
+                f"{self.state['rounds']} fine-tune rounds accepted")
+        if self.error is not None:
+            text += f" (last round failed: {self.error})"
+        return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the emotion model on collected feedback")
+    parser.add_argument("--feedback-dir", default=FEEDBACK_DIR or "feedback")
+    parser.add_argument("--model", default=None, help="Base model (default: last accepted or MODEL_PATH)")
+    parser.add_argument("--out", default=FINETUNED_PATH)
+    parser.add_argument("--dataset-dir", default="Dataset")
+    parser.add_argument("--min-new", type=int, default=16)
+    parser.add_argument("--once", action="store_true", help="Run a single round and exit")
+    args = parser.parse_args()
+
+    store = FeedbackStore(args.feedback_dir)
+    tuner = FineTuner(store, args.model or MODEL_PATH, args.out, min_new=args.min_new,
+                      dataset_dir=args.dataset_dir)
+    print(f"🗂️ {args.feedback_dir}: {len(store)} samples {store.class_counts()}")
+
+    while True:
+        summary = tuner.run_round()
+        if summary is not None:
+            print(json.dumps(summary, indent=2))
+        if args.once:
+            break
+        time.sleep(tuner.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,20 @@
 import os
+import argparse
 import tensorflow as tf
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 
+from data_pipeline import packed_sequences
+
+parser = argparse.ArgumentParser(description="Sanity-check the emotion dataset")
+parser.add_argument(
+    "--pipeline",
+    choices=["generator", "packed"],
+    default="generator",
+    help="generator: flow_from_directory on the JPEG folders, "
+         "packed: memory-mapped arrays from dataset_pack.py"
+)
+args = parser.parse_args()
+
 # ==========================
 # 1. BASIC INFO
 # ==========================
@@ -11,6 +24,7 @@ print("✅ TensorFlow version:", tf.__version__)
 # 2. DATASET PATH
 # ==========================
 DATASET_DIR = r"C:\Users\nidad\OneDrive\Desktop\emotion_music\Dataset"
+PACKED_DIR = os.path.join(DATASET_DIR, "packed")
 
 if not os.path.exists(DATASET_DIR):
     raise FileNotFoundError(f"❌ Dataset path not found: {DATASET_DIR}")
@@ -42,34 +56,43 @@ test_datagen = ImageDataGenerator(
 # 4. CREATE GENERATORS
 # ==========================
 
-train_generator = train_datagen.flow_from_directory(
-    os.path.join(DATASET_DIR, "train"),
-    target_size=IMG_SIZE,
-    color_mode="grayscale",
-    batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    shuffle=True,
-    subset="training"
-)
-
-val_generator = train_datagen.flow_from_directory(
-    os.path.join(DATASET_DIR, "train"),
-    target_size=IMG_SIZE,
-    color_mode="grayscale",
-    batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    shuffle=False,
-    subset="validation"
-)
-
-test_generator = test_datagen.flow_from_directory(
-    os.path.join(DATASET_DIR, "test"),
-    target_size=IMG_SIZE,
-    color_mode="grayscale",
-    batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    shuffle=False
-)
+if args.pipeline == "packed":
+    train_generator, val_generator, test_generator, _ = packed_sequences(
+        PACKED_DIR,
+        batch_size=BATCH_SIZE,
+        validation_split=0.2,
+        augmenter=train_datagen
+    )
+
+else:
+    train_generator = train_datagen.flow_from_directory(
+        os.path.join(DATASET_DIR, "train"),
+        target_size=IMG_SIZE,
+        color_mode="grayscale",
+        batch_size=BATCH_SIZE,
+        class_mode="categorical",
+        shuffle=True,
+        subset="training"
+    )
+
+    val_generator = train_datagen.flow_from_directory(
+        os.path.join(DATASET_DIR, "train"),
+        target_size=IMG_SIZE,
+        color_mode="grayscale",
+        batch_size=BATCH_SIZE,
+        class_mode="categorical",
+        shuffle=False,
+        subset="validation"
+    )
+
+    test_generator = test_datagen.flow_from_directory(
+        os.path.join(DATASET_DIR, "test"),
+        target_size=IMG_SIZE,
+        color_mode="grayscale",
+        batch_size=BATCH_SIZE,
+        class_mode="categorical",
+        shuffle=False
+    )
 
 # ==========================
 # 5. SANITY CHECKS
@@ -83,7 +106,7 @@ print("Train:", train_generator.samples)
 print("Validation:", val_generator.samples)
 print("Test:", test_generator.samples)
 
-x_batch, y_batch = next(train_generator)
+x_batch, y_batch = train_generator[0]
 print("\n✅ One Batch Shape:")
 print("Images:", x_batch.shape)   # (64, 48, 48, 1)
 print("Labels:", y_batch.shape)   # (64, 4)
@@ -1,96 +1,153 @@
+import argparse
 import cv2
-import numpy as np
-import time
-from tensorflow.keras.models import load_model
-
+import queue
+import threading
+
+from emotion_predictor import MODEL_PATH
+from emotion_state import EmotionStateTracker
+from face_detectors import DETECTORS, FACE_DETECTOR
+from face_tracking import DetectTrackFaceSource
+from frame_pipeline import CaptureThread, FPSCounter, InferenceWorker
+from metrics import METRICS_HOST, Metrics, start_exporters
+from model_loader import ModelLoader
 from music_mapper import get_music_recommendation
-from youtube_player import play_on_youtube
+from youtube_player import play_async
+
+parser = argparse.ArgumentParser(description="Real-time emotion-aware music recommender")
+parser.add_argument("--detector", choices=sorted(DETECTORS), default=FACE_DETECTOR,
+                    help="Face detector backend (lbp/dnn/yunet need model files in models/)")
+parser.add_argument("--track", action="store_true",
+                    help="Detect faces every N frames on a downscaled frame and track in between")
+parser.add_argument("--detect-interval", type=int, default=5,
+                    help="Frames between full detections in --track mode")
+parser.add_argument("--downscale", type=float, default=0.5,
+                    help="Detection/tracking scale factor in --track mode")
+parser.add_argument("--tracker", choices=["flow", "kcf", "mosse"], default="flow",
+                    help="Tracker used between detections (kcf/mosse need opencv-contrib)")
+parser.add_argument("--smoothing", type=float, default=0.3,
+                    help="EMA weight of the newest probabilities per face")
+parser.add_argument("--min-confidence", type=float, default=0.5,
+                    help="Smoothed confidence needed before an emotion counts as stable")
+parser.add_argument("--metrics-port", type=int, default=None,
+                    help="Serve Prometheus metrics at http://localhost:PORT/metrics")
+parser.add_argument("--metrics-host", default=METRICS_HOST,
+                    help="Interface for --metrics-port (default: loopback; 0.0.0.0 for all)")
+parser.add_argument("--metrics-file", default=None,
+                    help="Periodically write Prometheus metrics to this file")
+args = parser.parse_args()
+
+metrics = Metrics()
+start_exporters(metrics, port=args.metrics_port, path=args.metrics_file, host=args.metrics_host)
 
 # ==========================
-# 1. LOAD MODEL & LABELS
+# 1. LOAD MODEL & FACE DETECTOR
 # ==========================
-model = load_model("emotion_music_model.h5")
-labels = ['Angry', 'Happy', 'Neutral', 'Sad']
+# TensorFlow import, model load and warm-up run on a background thread;
+# the camera preview starts right away and inference joins once ready
+model_loader = ModelLoader(MODEL_PATH, detector=args.detector, metrics=metrics).start()
+
+
+def start_inference(predictor):
+    face_source = None
+    if args.track:
+        face_source = DetectTrackFaceSource(
+            predictor.detect_faces,
+            detect_interval=args.detect_interval,
+            downscale=args.downscale,
+            tracker=args.tracker
+        )
+    worker = InferenceWorker(predictor, inference_frames, results, stop_event, face_source, metrics)
+    worker.start()
+    print(f"✅ Model ready: {', '.join(f'{k} {v:.2f}s' for k, v in model_loader.timings.items())}")
+    return worker
 
 # ==========================
-# 2. FACE DETECTOR
+# 2. STABILITY SETTINGS
 # ==========================
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+# Each face is tracked separately; its smoothed emotion must hold this long
+STABLE_TIME_REQUIRED = 3.0  # seconds
+emotion_states = EmotionStateTracker(
+    alpha=args.smoothing,
+    stable_time=STABLE_TIME_REQUIRED,
+    min_confidence=args.min_confidence
 )
 
 # ==========================
-# 3. STABILITY SETTINGS
+# 3. PIPELINE QUEUES
 # ==========================
-STABLE_TIME_REQUIRED = 3.0  # seconds
-last_emotion = None
-emotion_start_time = None
-music_played = False
+# Size 1 = always hand the newest frame on; older ones are dropped
+inference_frames = queue.Queue(maxsize=1)
+display_frames = queue.Queue(maxsize=1)
+results = queue.Queue(maxsize=4)
+stop_event = threading.Event()
+
+# Per-face FaceState (box, smoothed emotion, stable_for, ...) from the latest result
+overlay = []
 
 # ==========================
-# 4. START CAMERA
+# 4. START CAMERA + WORKERS
 # ==========================
 cap = cv2.VideoCapture(0)
 print("🎥 Camera started... Press 'q' to quit.")
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
+capture = CaptureThread(cap, [inference_frames, display_frames], stop_event, metrics)
+worker = None
+display_fps = FPSCounter()
+capture.start()
+
+while not stop_event.is_set():
+    try:
+        frame = display_frames.get(timeout=0.5)
+    except queue.Empty:
+        continue
+
+    if worker is None and model_loader.ready:
+        worker = start_inference(model_loader.get())
+    elif model_loader.error is not None:
+        print(f"❌ Could not load the model: {model_loader.error}")
         break
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-
-    current_time = time.time()
-
-    if len(faces) == 0:
-        # No face detected → reset
-        last_emotion = None
-        emotion_start_time = None
-        music_played = False
-
-    for (x, y, w, h) in faces:
-        roi = gray[y:y+h, x:x+w]
-        roi = cv2.resize(roi, (48, 48))
-        roi = roi.astype("float32") / 255.0
-        roi = np.expand_dims(roi, axis=(0, -1))
-
-        preds = model.predict(roi, verbose=0)
-        emotion = labels[np.argmax(preds)]
-        confidence = np.max(preds)
+    # Consume every result produced since the last displayed frame
+    while True:
+        try:
+            result = results.get_nowait()
+        except queue.Empty:
+            break
 
         # ==========================
         # 5. EMOTION STABILITY LOGIC
         # ==========================
-        if emotion == last_emotion:
-            if emotion_start_time is None:
-                emotion_start_time = current_time
-            elapsed = current_time - emotion_start_time
-        else:
-            last_emotion = emotion
-            emotion_start_time = current_time
-            elapsed = 0
-            music_played = False
+        # One vectorized EMA / stability step for every face in the result
+        overlay, triggered = emotion_states.update(result.boxes, result.probs, result.timestamp)
+        metrics.set_gauge("tracked_faces", len(emotion_states))
 
         # ==========================
         # 6. AUTO MUSIC PLAY
         # ==========================
-        if elapsed >= STABLE_TIME_REQUIRED and not music_played:
-            rec = get_music_recommendation(emotion)
+        # The most confident newly stable face picks the music
+        if triggered:
+            face = max(triggered, key=lambda f: f.confidence)
+            with metrics.timer("recommendation"):
+                rec = get_music_recommendation(face.emotion, face.probs)
             keyword = rec["keywords"][0]
 
-            print(f"\n🎭 Stable Emotion: {emotion}")
+            print(f"\n🎭 Stable Emotion: {face.emotion} (face #{face.track_id})")
             print(f"▶ Auto-playing music for: {keyword}")
 
-            play_on_youtube(keyword)
-            music_played = True
-
-        # ==========================
-        # 7. DISPLAY INFO
-        # ==========================
-        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+            # Queued on the playback thread: the frame loop never waits
+            play_async(keyword)
+
+    # ==========================
+    # 7. DISPLAY INFO
+    # ==========================
+    # Newest frame, with the latest available labels attached
+    # (drawn on a copy: the inference thread may still be reading it)
+    image = frame.image.copy()
+    for face in overlay:
+        (x, y, w, h), emotion, confidence, elapsed = face.box, face.emotion, face.confidence, face.stable_for
+        cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)
         cv2.putText(
-            frame,
+            image,
             f"{emotion} ({confidence:.2f})",
             (x, y - 10),
             cv2.FONT_HERSHEY_SIMPLEX,
@@ -100,7 +157,7 @@ while True:
         )
 
         cv2.putText(
-            frame,
+            image,
             f"Stable for: {elapsed:.1f}s",
             (x, y + h + 20),
             cv2.FONT_HERSHEY_SIMPLEX,
@@ -109,10 +166,42 @@ while True:
             2
         )
 
-    cv2.imshow("Emotion-Aware Music Recommender", frame)
+    fps = display_fps.tick()
+    metrics.set_gauge("display_fps", fps)
+
+    mode = f"track/{args.detect_interval}" if args.track else "detect"
+    inference = f"{worker.fps.fps:.1f} ({mode})" if worker else f"loading ({model_loader.phase})"
+    stats = [
+        f"FPS: {fps:.1f}  Inference: {inference}  Dropped: {capture.dropped}",
+        "p50 ms  capture {:.1f}  detect {:.1f}  infer {:.1f}  rec {:.2f}".format(
+            metrics.latency_ms("capture"),
+            metrics.latency_ms("detection"),
+            metrics.latency_ms("inference"),
+            metrics.latency_ms("recommendation")
+        ),
+    ]
+    for i, text in enumerate(stats):
+        cv2.putText(
+            image,
+            text,
+            (10, 25 + 22 * i),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (0, 255, 0),
+            2
+        )
+
+    cv2.imshow("Emotion-Aware Music Recommender", image)
 
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
+stop_event.set()
+capture.join(timeout=1.0)
+if worker is not None:
+    worker.join(timeout=1.0)
+print(f"📉 Frames captured: {capture.frames}, inferred: {worker.processed if worker else 0}, "
+      f"dropped: {capture.dropped}")
+
 cap.release()
 cv2.destroyAllWindows()
@@ -0,0 +1,102 @@
+# result_cache.py
+#
+# Bounded LRU + TTL cache of image analyses keyed by a hash of the encoded
+# image bytes. Streamlit reruns the whole script on every widget click, so
+# without it the result page decodes, detects and classifies the same
+# camera snapshot again each time a button is pressed.
+#
+#   cache = ResultCache(max_entries=64, ttl=600)
+#   analysis = analyze_image(predictor, image_bytes, cache, metrics)
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from emotion_predictor import top_emotion
+from metrics import NULL_METRICS
+from music_mapper import get_music_recommendation
+
+# emotion / confidence / recommendation are None when no face was found
+Analysis = namedtuple("Analysis", ["boxes", "probs", "emotion", "confidence", "recommendation"])
+
+
+def image_key(image_bytes):
+    """
+    Returns a 128-bit content hash of encoded image bytes
+    """
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after
+    they were stored
+    """
+
+    def __init__(self, max_entries=64, ttl=600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def analyze_image(predictor, image_bytes, cache=None, metrics=None):
+    """
+    Detects and classifies faces in encoded image bytes, and picks the
+    music recommendation for the first face. Repeated calls with the same
+    bytes are served from cache.
+    Returns an Analysis
+    """
+    metrics = metrics or NULL_METRICS
+    key = image_key(image_bytes) if cache is not None else None
+    if cache is not None:
+        analysis = cache.get(key)
+        if analysis is not None:
+            metrics.inc("analysis_cache_hits")
+            return analysis
+        metrics.inc("analysis_cache_misses")
+
+    with metrics.timer("analysis"):
+        boxes, probs = predictor.predict_image(image_bytes)
+    metrics.inc("analyses")
+
+    emotion = confidence = recommendation = None
+    if len(boxes):
+        emotion, confidence = top_emotion(probs[0])
+        with metrics.timer("recommendation"):
+            recommendation = get_music_recommendation(emotion, probs[0])
+
+    analysis = Analysis(boxes, probs, emotion, confidence, recommendation)
+    if cache is not None:
+        cache.put(key, analysis)
+    return analysis
@@ -0,0 +1,95 @@
+# startup_profile.py
+#
+# Cold-start profile of the inference stack. Every run is a fresh Python
+# process (so nothing is already imported or cached) that reports, in
+# order:
+#   app_import       - modules the front ends import before rendering
+#   runtime_import   - TensorFlow / tflite-runtime / onnxruntime import
+#   model_load       - reading the model file + building the backend
+#   warmup           - first (dummy) inference: graph tracing / allocation
+#   first_inference  - first real face batch after warm-up
+#   steady_inference - median of later calls
+#
+#   python startup_profile.py --runs 5
+#   python startup_profile.py --model exported/emotion_int8.tflite --json startup.json
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+PHASES = ["app_import", "runtime_import", "model_load", "warmup", "first_inference", "steady_inference"]
+
+
+def profile_once(model_path):
+    """
+    Runs in a fresh process. Returns {phase: seconds}
+    """
+    start = time.perf_counter()
+    from emotion_predictor import INPUT_SHAPE
+    from model_loader import ModelLoader
+    import result_cache  # noqa: F401
+    timings = {"app_import": time.perf_counter() - start}
+
+    loader = ModelLoader(model_path)
+    predictor = loader.load()
+    timings["runtime_import"] = loader.timings["import"]
+    timings["model_load"] = loader.timings["load"]
+    timings["warmup"] = loader.timings["warmup"]
+
+    batch = np.random.default_rng(0).random((1,) + INPUT_SHAPE, dtype=np.float32)
+    t = time.perf_counter()
+    predictor.predict_batch(batch)
+    timings["first_inference"] = time.perf_counter() - t
+
+    steady = []
+    for _ in range(20):
+        t = time.perf_counter()
+        predictor.predict_batch(batch)
+        steady.append(time.perf_counter() - t)
+    timings["steady_inference"] = float(np.median(steady))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start (import / load / first inference) profile")
+    parser.add_argument("--model", default=None, help="Model file (default: EMOTION_MODEL or the .h5)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes to average over")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.model is None:
+        from emotion_predictor import MODEL_PATH
+        args.model = MODEL_PATH
+
+    if args.worker:
+        print(json.dumps(profile_once(args.model)))
+        return
+
+    runs = []
+    for i in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, __file__, "--worker", "--model", args.model],
+            capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+        print(f"⏱️ run {i + 1}/{args.runs}: {sum(runs[-1][p] for p in PHASES[:4]):.2f}s to ready")
+
+    summary = {p: float(np.median([r[p] for r in runs])) for p in PHASES}
+    print(f"\n📊 Cold start of {args.model} (median of {args.runs} fresh processes)")
+    for phase in PHASES:
+        print(f"  {phase:<18}{summary[phase] * 1e3:10.1f} ms")
+    print(f"  {'time_to_ready':<18}{sum(summary[p] for p in PHASES[:4]) * 1e3:10.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "median": summary, "runs": runs}, f, indent=2)
+        print(f"\n💾 Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
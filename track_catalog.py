@@ -0,0 +1,345 @@
+# track_catalog.py
+#
+# Local track catalog + nearest-neighbour lookup for music_mapper.py.
+# A catalog is a CSV (or Parquet, needs pyarrow) with the columns
+#
+#   track_id, title, artist, genre, valence, energy, tempo
+#
+# valence/energy in [0, 1], tempo in BPM. The emotion probability vector
+# is mapped to a target point in (valence, energy, tempo, genre) space as
+# the probability-weighted mix of per-emotion targets, and the k nearest
+# tracks are fetched from a KD-tree (scipy) or, without scipy, from
+# a sorted, blocked NumPy search.
+#
+# Genre is a one-hot over GENRES (case-insensitive; other genres get all
+# zeros); the target's genre coordinates are the per-emotion genre
+# preferences, so preferred genres are closer and disliked ones farther.
+#
+#   python track_catalog.py catalog.csv --synthesize 500000   # fake catalog + benchmark
+#   MUSIC_CATALOG=catalog.csv python -m streamlit run app.py
+
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from emotion_predictor import LABELS
+
+CATALOG_COLUMNS = ["track_id", "title", "artist", "genre", "valence", "energy", "tempo"]
+
+# Tempo is scaled to about [0, 1] and weighted down relative to mood;
+# genre nudges the ranking without overriding valence / energy
+TEMPO_RANGE = (50.0, 200.0)
+FEATURE_WEIGHTS = np.array([1.0, 1.0, 0.5], dtype=np.float32)
+GENRE_WEIGHT = 0.3
+
+# Target (valence, energy, tempo BPM) per emotion, in LABELS order.
+# Mirrors the MUSIC_MAP moods: calm down anger, lift sadness gently,
+# keep happiness energetic, keep neutral focused.
+EMOTION_TARGETS = {
+    "Angry": (0.55, 0.20, 80.0),
+    "Happy": (0.85, 0.80, 128.0),
+    "Neutral": (0.50, 0.40, 95.0),
+    "Sad": (0.45, 0.25, 85.0),
+}
+
+# Genre preference in [0, 1] per emotion, in GENRES order (same moods)
+GENRES = ("classical", "ambient", "lofi", "jazz", "folk", "pop", "rock", "edm", "hip hop")
+EMOTION_GENRES = {
+    "Angry": (1.0, 1.0, 0.5, 0.5, 0.5, 0.0, 0.0, 0.0, 0.0),
+    "Happy": (0.0, 0.0, 0.0, 0.3, 0.3, 1.0, 0.8, 1.0, 0.8),
+    "Neutral": (0.6, 0.8, 1.0, 0.8, 0.3, 0.0, 0.0, 0.0, 0.0),
+    "Sad": (1.0, 0.8, 0.6, 0.6, 0.8, 0.0, 0.0, 0.0, 0.0),
+}
+
+
+def genre_features(genres):
+    """
+    Returns (N, len(GENRES)) weighted one-hot genre columns
+    """
+    names = np.char.lower(np.char.strip(np.asarray(genres, dtype=str)))
+    return (names[:, None] == np.array(GENRES)[None, :]).astype(np.float32) * GENRE_WEIGHT
+
+
+def feature_space(valence, energy, tempo, genres):
+    """
+    Returns (N, 3 + len(GENRES)) float32 points in the weighted search space
+    """
+    tempo = (np.asarray(tempo, dtype=np.float32) - TEMPO_RANGE[0]) / (TEMPO_RANGE[1] - TEMPO_RANGE[0])
+    points = np.stack([
+        np.asarray(valence, dtype=np.float32),
+        np.asarray(energy, dtype=np.float32),
+        np.clip(tempo, 0.0, 1.0)
+    ], axis=-1)
+    return np.concatenate([points * FEATURE_WEIGHTS, genre_features(genres)], axis=1)
+
+
+_TARGET_MATRIX = np.concatenate([
+    feature_space(*np.array([EMOTION_TARGETS[label] for label in LABELS]).T, genres=[""] * len(LABELS))[:, :3],
+    np.array([EMOTION_GENRES[label] for label in LABELS], dtype=np.float32) * GENRE_WEIGHT,
+], axis=1)
+
+
+def emotion_target(probs):
+    """
+    Maps a probability vector over LABELS to a point in feature space
+    """
+    probs = np.asarray(probs, dtype=np.float32)
+    return (probs / max(float(probs.sum()), 1e-6)) @ _TARGET_MATRIX
+
+
+class TrackCatalog:
+    """
+    Column arrays of a loaded catalog; points is the (N, 3 + genres) search space
+    """
+
+    def __init__(self, track_ids, titles, artists, genres, valence, energy, tempo):
+        self.track_ids = np.asarray(track_ids, dtype=str)
+        self.titles = np.asarray(titles, dtype=str)
+        self.artists = np.asarray(artists, dtype=str)
+        self.genres = np.asarray(genres, dtype=str)
+        self.valence = np.asarray(valence, dtype=np.float32)
+        self.energy = np.asarray(energy, dtype=np.float32)
+        self.tempo = np.asarray(tempo, dtype=np.float32)
+        self.points = np.ascontiguousarray(
+            feature_space(self.valence, self.energy, self.tempo, self.genres)
+        )
+
+    def __len__(self):
+        return len(self.points)
+
+    def track(self, i):
+        return {
+            "track_id": str(self.track_ids[i]),
+            "title": str(self.titles[i]),
+            "artist": str(self.artists[i]),
+            "genre": str(self.genres[i]),
+            "valence": float(self.valence[i]),
+            "energy": float(self.energy[i]),
+            "tempo": float(self.tempo[i]),
+        }
+
+
+def load_catalog(path):
+    """
+    Loads a .csv or .parquet catalog. A parsed CSV is cached next to it
+    as <path>.npz and reused while it is newer than the CSV.
+    Returns a TrackCatalog
+    """
+    cache_path = path + ".npz"
+    if not path.endswith(".parquet") and os.path.exists(cache_path) \
+            and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        with np.load(cache_path) as data:
+            return TrackCatalog(*(data[name] for name in CATALOG_COLUMNS))
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, columns=CATALOG_COLUMNS)
+        columns = [table.column(name).to_numpy(zero_copy_only=False) for name in CATALOG_COLUMNS]
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            missing = [c for c in CATALOG_COLUMNS if c not in header]
+            if missing:
+                raise ValueError(f"❌ Catalog {path} is missing columns: {missing}")
+            order = [header.index(c) for c in CATALOG_COLUMNS]
+            columns = [list(col) for col in zip(*([row[i] for i in order] for row in reader))]
+        if not columns:
+            raise ValueError(f"❌ Catalog {path} has no tracks")
+
+        try:
+            np.savez(cache_path, **{
+                name: np.asarray(col, dtype=np.float32 if name in ("valence", "energy", "tempo") else str)
+                for name, col in zip(CATALOG_COLUMNS, columns)
+            })
+        except OSError:
+            pass
+
+    return TrackCatalog(*columns)
+
+
+# ==========================
+# NEAREST-NEIGHBOUR INDEXES
+# ==========================
+# Both return (distances, indices) of the k nearest points, nearest first.
+
+class KDTreeIndex:
+    """
+    scipy cKDTree; O(log N) queries, microseconds at 10^5-10^6 tracks
+    """
+
+    name = "kdtree"
+
+    def __init__(self, points):
+        from scipy.spatial import cKDTree
+
+        self.tree = cKDTree(points)
+
+    def query(self, target, k):
+        k = min(k, self.tree.n)
+        dist, idx = self.tree.query(target, k=k)
+        return np.atleast_1d(dist), np.atleast_1d(idx)
+
+
+class BlockedIndex:
+    """
+    Exact search without scipy. Points are sorted by their first
+    coordinate; a query computes distances for a block of rows around
+    the target and widens the block only while a row outside it could
+    still be closer than the current k-th best
+    """
+
+    name = "blocked"
+
+    def __init__(self, points, block_rows=4096):
+        order = np.argsort(points[:, 0], kind="stable")
+        self.order = order
+        self.points = np.ascontiguousarray(points[order], dtype=np.float32)
+        self.block_rows = block_rows
+
+    def query(self, target, k):
+        target = np.asarray(target, dtype=np.float32)
+        n = len(self.points)
+        k = min(k, n)
+        x = self.points[:, 0]
+        pos = int(np.searchsorted(x, target[0]))
+        half = max(self.block_rows // 2, k)
+
+        while True:
+            lo, hi = max(pos - half, 0), min(pos + half, n)
+            diff = self.points[lo:hi] - target
+            d = np.einsum("ij,ij->i", diff, diff)
+            part = np.argpartition(d, k - 1)[:k] if len(d) > k else np.arange(len(d))
+            kth = d[part].max()
+
+            # Rows outside [lo, hi) are at least this far away on axis 0
+            gap = min(target[0] - x[lo - 1] if lo > 0 else np.inf,
+                      x[hi] - target[0] if hi < n else np.inf)
+            if gap * gap >= kth or (lo == 0 and hi == n):
+                break
+            half *= 4
+
+        part = part[np.argsort(d[part])]
+        return np.sqrt(d[part]), self.order[lo + part]
+
+
+def build_index(points, kind=None):
+    """
+    Returns a KD-tree index when scipy is installed, else a BlockedIndex
+    """
+    if kind in (None, "kdtree"):
+        try:
+            return KDTreeIndex(points)
+        except ImportError:
+            if kind == "kdtree":
+                raise
+    return BlockedIndex(points)
+
+
+class TrackRecommender:
+    """
+    Recommends the catalog tracks nearest to an emotion's target point
+    """
+
+    def __init__(self, catalog, index=None):
+        self.catalog = catalog
+        self.index = index or build_index(catalog.points)
+
+    def nearest(self, probs, k=5):
+        """
+        Returns [(track_dict, distance)] for the k nearest tracks
+        """
+        dist, idx = self.index.query(emotion_target(probs), k)
+        return [(self.catalog.track(i), float(d)) for d, i in zip(dist, idx)]
+
+    def recommend(self, emotion, probs, base, k=5):
+        """
+        Returns a music_mapper-style recommendation (mood/message from
+        base) whose keywords and tracks come from the catalog
+        """
+        if probs is None:
+            labels = [label.lower() for label in LABELS]
+            if emotion.lower() not in labels:
+                return base
+            probs = np.eye(len(LABELS), dtype=np.float32)[labels.index(emotion.lower())]
+
+        tracks = []
+        for track, distance in self.nearest(probs, k):
+            track["distance"] = distance
+            tracks.append(track)
+
+        return {
+            "mood": base["mood"],
+            "message": base["message"],
+            "keywords": [f"{t['artist']} {t['title']}" for t in tracks] or base["keywords"],
+            "tracks": tracks,
+        }
+
+
+# ==========================
+# SYNTHETIC CATALOG + BENCHMARK
+# ==========================
+
+def synthesize_catalog(path, rows, seed=0):
+    """
+    Writes a random catalog CSV with rows tracks
+    """
+    rng = np.random.default_rng(seed)
+    genres = np.array(["pop", "rock", "lofi", "classical", "ambient", "hip hop", "jazz", "edm", "folk"])
+    valence = rng.beta(2, 2, rows)
+    energy = np.clip(valence * 0.5 + rng.beta(2, 2, rows) * 0.5, 0, 1)
+    tempo = np.clip(rng.normal(70 + 80 * energy, 15), 50, 200)
+    genre = genres[rng.integers(len(genres), size=rows)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CATALOG_COLUMNS)
+        for i in range(rows):
+            writer.writerow([f"t{i:07d}", f"Track {i}", f"Artist {i % 5000}", genre[i],
+                             f"{valence[i]:.4f}", f"{energy[i]:.4f}", f"{tempo[i]:.1f}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nearest-track lookup on a catalog")
+    parser.add_argument("catalog", help="Catalog .csv / .parquet")
+    parser.add_argument("--synthesize", type=int, default=None, metavar="ROWS",
+                        help="First write a random catalog with ROWS tracks to this path")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.synthesize:
+        synthesize_catalog(args.catalog, args.synthesize)
+        print(f"💾 Wrote {args.synthesize} synthetic tracks to {args.catalog}")
+
+    start = time.perf_counter()
+    catalog = load_catalog(args.catalog)
+    print(f"📂 Loaded {len(catalog)} tracks in {time.perf_counter() - start:.2f}s "
+          f"({os.path.getsize(args.catalog) / 1e6:.1f} MB)")
+
+    probs = np.random.default_rng(1).dirichlet(np.ones(len(LABELS)), size=args.queries).astype(np.float32)
+    for kind in ("kdtree", "blocked"):
+        try:
+            start = time.perf_counter()
+            index = build_index(catalog.points, kind)
+            built = time.perf_counter() - start
+        except ImportError as e:
+            print(f"⚠️ Skipping {kind}: {e}")
+            continue
+
+        recommender = TrackRecommender(catalog, index)
+        timings = np.empty(args.queries)
+        for i, p in enumerate(probs):
+            t = time.perf_counter()
+            recommender.nearest(p, args.k)
+            timings[i] = time.perf_counter() - t
+        ms = timings * 1e3
+        print(f"⚡ {kind:<8} build {built * 1e3:8.1f} ms   top-{args.k} query "
+              f"p50 {np.percentile(ms, 50):.3f} ms   p99 {np.percentile(ms, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
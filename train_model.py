@@ -1,23 +1,65 @@
 import os
+import argparse
 import tensorflow as tf
-from tensorflow.keras import layers, models
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
 
+from cpu_training import (BASE_BATCH_SIZE, BASE_LEARNING_RATE, compile_for_cpu, configure_cpu,
+                          enable_bf16, scaled_learning_rate)
+from data_pipeline import ThroughputCallback, packed_sequences, tfdata_datasets
+from dataset_manifest import load_manifest
+from emotion_model import build_emotion_cnn
+
+parser = argparse.ArgumentParser(description="Train the emotion CNN")
+parser.add_argument(
+    "--pipeline",
+    choices=["generator", "packed", "tfdata"],
+    default="generator",
+    help="generator: flow_from_directory on the JPEG folders, "
+         "packed: memory-mapped arrays from dataset_pack.py, "
+         "tfdata: parallel tf.data decode + cache + batch augmentation"
+)
+parser.add_argument("--cpu-optimized", action="store_true",
+                    help="Thread pools sized to the CPU cores")
+parser.add_argument("--xla", action="store_true",
+                    help="XLA-compile the train step (compare with bench_training.py first)")
+parser.add_argument("--bf16", action="store_true",
+                    help="bfloat16 mixed precision (only on CPUs with AVX512_BF16 / AMX)")
+parser.add_argument("--batch-size", type=int, default=BASE_BATCH_SIZE)
+parser.add_argument("--lr-scaling", choices=["sqrt", "linear", "none"], default="sqrt",
+                    help="How the Adam learning rate follows batch sizes above 64")
+parser.add_argument("--epochs", type=int, default=20)
+parser.add_argument("--rescan", action="store_true",
+                    help="Fully re-walk Dataset/ to refresh manifest.json (e.g. after overwriting images in place)")
+args = parser.parse_args()
+
 # ==========================
 # 1. BASIC INFO
 # ==========================
 print("✅ TensorFlow version:", tf.__version__)
 
+# Must run before TensorFlow executes its first op
+if args.cpu_optimized:
+    intra, inter = configure_cpu()
+    print(f"⚡ CPU-optimized: {intra} intra-op / {inter} inter-op threads")
+bf16 = args.bf16 and enable_bf16()
+if bf16:
+    print("⚡ Mixed precision: bfloat16")
+
 # ==========================
 # 2. DATASET PATH
 # ==========================
 DATASET_DIR = r"C:\Users\nidad\OneDrive\Desktop\emotion_music\Dataset"
+PACKED_DIR = os.path.join(DATASET_DIR, "packed")
+
+# Class counts from Dataset/manifest.json instead of a directory scan
+manifest = load_manifest(DATASET_DIR, rescan=args.rescan)
+for split in ("train", "test"):
+    print(f"🗂️ {split}: {manifest['splits'][split]['class_counts']}")
 
 IMG_SIZE = (48, 48)
-BATCH_SIZE = 64
-NUM_CLASSES = 4
-EPOCHS = 20
+BATCH_SIZE = args.batch_size
+EPOCHS = args.epochs
 
 # ==========================
 # 3. DATA GENERATORS
@@ -37,63 +79,67 @@ test_datagen = ImageDataGenerator(
     rescale=1.0 / 255.0
 )
 
-train_generator = train_datagen.flow_from_directory(
-    os.path.join(DATASET_DIR, "train"),
-    target_size=IMG_SIZE,
-    color_mode="grayscale",
-    batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    shuffle=True,
-    subset="training"
-)
-
-val_generator = train_datagen.flow_from_directory(
-    os.path.join(DATASET_DIR, "train"),
-    target_size=IMG_SIZE,
-    color_mode="grayscale",
-    batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    shuffle=False,
-    subset="validation"
-)
-
-test_generator = test_datagen.flow_from_directory(
-    os.path.join(DATASET_DIR, "test"),
-    target_size=IMG_SIZE,
-    color_mode="grayscale",
-    batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    shuffle=False
-)
+if args.pipeline == "packed":
+    # Same split and augmentation, but batches are sliced from the
+    # memory-mapped pack instead of decoding JPEGs every epoch
+    train_generator, val_generator, test_generator, class_indices = packed_sequences(
+        PACKED_DIR,
+        batch_size=BATCH_SIZE,
+        validation_split=0.2,
+        augmenter=train_datagen
+    )
+    print("✅ Packed dataset:", class_indices)
+    train_samples = train_generator.samples
+
+elif args.pipeline == "tfdata":
+    train_generator, val_generator, test_generator, class_indices, counts = tfdata_datasets(
+        DATASET_DIR,
+        batch_size=BATCH_SIZE,
+        validation_split=0.2
+    )
+    print("✅ tf.data dataset:", class_indices, counts)
+    train_samples = counts["train"]
+
+else:
+    train_generator = train_datagen.flow_from_directory(
+        os.path.join(DATASET_DIR, "train"),
+        target_size=IMG_SIZE,
+        color_mode="grayscale",
+        batch_size=BATCH_SIZE,
+        class_mode="categorical",
+        shuffle=True,
+        subset="training"
+    )
+
+    val_generator = train_datagen.flow_from_directory(
+        os.path.join(DATASET_DIR, "train"),
+        target_size=IMG_SIZE,
+        color_mode="grayscale",
+        batch_size=BATCH_SIZE,
+        class_mode="categorical",
+        shuffle=False,
+        subset="validation"
+    )
+
+    test_generator = test_datagen.flow_from_directory(
+        os.path.join(DATASET_DIR, "test"),
+        target_size=IMG_SIZE,
+        color_mode="grayscale",
+        batch_size=BATCH_SIZE,
+        class_mode="categorical",
+        shuffle=False
+    )
+    class_indices = train_generator.class_indices
+    train_samples = train_generator.samples
+
+# Output size follows the classes the selected pipeline actually yields
+NUM_CLASSES = len(class_indices)
 
 # ==========================
 # 4. CNN MODEL
 # ==========================
 
-model = models.Sequential([
-    layers.Conv2D(32, (3, 3), activation='relu', padding='same',
-                  input_shape=(48, 48, 1)),
-    layers.BatchNormalization(),
-    layers.MaxPooling2D(2, 2),
-    layers.Dropout(0.25),
-
-    layers.Conv2D(64, (3, 3), activation='relu', padding='same'),
-    layers.BatchNormalization(),
-    layers.MaxPooling2D(2, 2),
-    layers.Dropout(0.25),
-
-    layers.Conv2D(128, (3, 3), activation='relu', padding='same'),
-    layers.BatchNormalization(),
-    layers.MaxPooling2D(2, 2),
-    layers.Dropout(0.25),
-
-    layers.Flatten(),
-    layers.Dense(256, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.5),
-
-    layers.Dense(NUM_CLASSES, activation='softmax')
-])
+model = build_emotion_cnn(NUM_CLASSES)
 
 model.summary()
 
@@ -101,11 +147,20 @@ model.summary()
 # 5. COMPILE MODEL
 # ==========================
 
-model.compile(
-    optimizer='adam',
-    loss='categorical_crossentropy',
-    metrics=['accuracy']
-)
+if args.lr_scaling == "none":
+    learning_rate = BASE_LEARNING_RATE
+else:
+    learning_rate = scaled_learning_rate(BATCH_SIZE, rule=args.lr_scaling)
+
+if args.cpu_optimized or args.xla:
+    compile_for_cpu(model, learning_rate, jit_compile=args.xla)
+else:
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+print(f"✅ Batch size {BATCH_SIZE}, learning rate {learning_rate:.2e}")
 
 # ==========================
 # 6. CALLBACKS
@@ -126,6 +181,10 @@ early_stop = EarlyStopping(
     verbose=1
 )
 
+run_label = args.pipeline + ("+cpu" if args.cpu_optimized else "") + ("+xla" if args.xla else "") \
+    + ("+bf16" if bf16 else "")
+throughput = ThroughputCallback(train_samples, label=run_label)
+
 # ==========================
 # 7. TRAIN MODEL
 # ==========================
@@ -134,7 +193,7 @@ history = model.fit(
     train_generator,
     epochs=EPOCHS,
     validation_data=val_generator,
-    callbacks=[checkpoint, early_stop]
+    callbacks=[checkpoint, early_stop, throughput]
 )
 
 # ==========================
@@ -144,5 +203,9 @@ history = model.fit(
 test_loss, test_acc = model.evaluate(test_generator)
 print(f"\n🎯 Test Accuracy: {test_acc * 100:.2f}%")
 
+if throughput.history:
+    print(f"⚡ Mean training throughput ({run_label}): "
+          f"{sum(throughput.history) / len(throughput.history):.0f} images/sec")
+
 print("\n💾 Best model saved as: emotion_music_model.h5")
 print("🏁 Training completed successfully!")
@@ -1,10 +1,206 @@
-import webbrowser
+# youtube_player.py
+#
+# Music playback. play_on_youtube() opens the browser synchronously; the
+# front ends go through a PlaybackDispatcher instead, which launches
+# playback on a background worker so the frame loop / request thread
+# never waits, drops duplicate requests for a keyword that is already
+# queued and rate-limits relaunching the same keyword.
+#
+# PLAYBACK_BACKEND picks the backend for play_async():
+#   browser - YouTube search in the default web browser (default)
+#   player  - local media player command (PLAYER_COMMAND, default mpv)
+#   log     - only records/prints requests (tests, headless kiosks)
+
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
 import urllib.parse
+import webbrowser
+
+PLAYBACK_BACKEND = os.environ.get("PLAYBACK_BACKEND", "browser")
+PLAYER_COMMAND = os.environ.get("PLAYER_COMMAND", "mpv --no-video ytdl://ytsearch:{keyword}")
+
+
+def youtube_search_url(keyword):
+    query = urllib.parse.quote(keyword)
+    return f"https://www.youtube.com/results?search_query={query}"
+
 
 def play_on_youtube(keyword):
     """
     Opens YouTube search results for the given keyword
     """
-    query = urllib.parse.quote(keyword)
-    url = f"https://www.youtube.com/results?search_query={query}"
-    webbrowser.open(url)
+    webbrowser.open(youtube_search_url(keyword))
+
+
+# ==========================
+# PLAYBACK BACKENDS
+# ==========================
+# Every backend exposes play(keyword); it runs on the dispatcher thread.
+
+class BrowserBackend:
+    name = "browser"
+
+    def play(self, keyword):
+        play_on_youtube(keyword)
+
+
+class MediaPlayerBackend:
+    """
+    Starts a local player process; command is a template with {keyword}.
+    The previous track's process is stopped first.
+    """
+
+    name = "player"
+
+    def __init__(self, command=PLAYER_COMMAND):
+        self.command = command
+        self._process = None
+
+    def play(self, keyword):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+        args = [part.replace("{keyword}", keyword) for part in shlex.split(self.command)]
+        self._process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class LoggingBackend:
+    """
+    Records requests instead of playing them
+    """
+
+    name = "log"
+
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self.played = []
+
+    def play(self, keyword):
+        self.played.append((time.time(), keyword))
+        if self.verbose:
+            print(f"🎵 [playback] {keyword}")
+
+
+PLAYBACK_BACKENDS = {
+    "browser": BrowserBackend,
+    "player": MediaPlayerBackend,
+    "log": LoggingBackend,
+}
+
+
+def make_playback_backend(name):
+    if name not in PLAYBACK_BACKENDS:
+        raise ValueError(f"❌ Unknown playback backend: {name}")
+    return PLAYBACK_BACKENDS[name]()
+
+
+# ==========================
+# DISPATCHER
+# ==========================
+
+class PlaybackDispatcher:
+    """
+    Runs backend.play() on a daemon worker thread.
+
+    play(keyword) never blocks: it returns False without queueing when the
+    keyword is already waiting in the queue, was launched less than
+    min_interval seconds ago, or the queue is full (newest requests win:
+    the oldest waiting one is dropped).
+    """
+
+    def __init__(self, backend=None, min_interval=30.0, max_pending=4):
+        self.backend = backend or BrowserBackend()
+        self.min_interval = min_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last_played = {}
+        self.launched = 0
+        self.skipped = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+
+    def play(self, keyword):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_played.get(keyword)
+            if keyword in self._pending or (last is not None and now - last < self.min_interval):
+                self.skipped += 1
+                return False
+            self._pending.add(keyword)
+            # Reserve the slot now so a burst of requests is rate-limited too
+            self._last_played[keyword] = now
+
+            while True:
+                try:
+                    self._queue.put_nowait(keyword)
+                    break
+                except queue.Full:
+                    try:
+                        dropped = self._queue.get_nowait()
+                        self._pending.discard(dropped)
+                        self._last_played.pop(dropped, None)
+                        self.skipped += 1
+                    except queue.Empty:
+                        pass
+        return True
+
+    def _run(self):
+        while True:
+            keyword = self._queue.get()
+            if keyword is None:
+                break
+            try:
+                self.backend.play(keyword)
+                self.launched += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Playback failed for '{keyword}': {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(keyword)
+
+    def join(self, timeout=None):
+        """
+        Waits until every queued launch has run (for scripts and tests).
+        Returns False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._pending:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    Returns the process-wide dispatcher for PLAYBACK_BACKEND
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = PlaybackDispatcher(make_playback_backend(PLAYBACK_BACKEND))
+        return _dispatcher
+
+
+def play_async(keyword):
+    """
+    Queues playback of keyword without waiting for it.
+    Returns True if it was queued, False if de-duplicated / rate-limited
+    """
+    return get_dispatcher().play(keyword)